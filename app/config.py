@@ -7,5 +7,75 @@ class Settings(BaseSettings):
     port: int = 8000
     supabase_url: str = ""
     supabase_key: str = ""
+    # Lines cache (PostgREST) client tuning
+    supabase_timeout: float = 10.0
+    supabase_max_connections: int = 20
+    supabase_max_concurrency: int = 8
+    supabase_max_retries: int = 3
+    supabase_batch_size: int = 100
+    supabase_max_filter_bytes: int = 6000
+    # Local translation memory consulted before DeepL
+    translation_memory_path: str = "translation_memory.db"
+    translation_memory_fuzzy: bool = False
+    translation_memory_min_similarity: float = 0.9
+    # Also try spellings one kana edit away when resolving non-standard lyric spellings
+    dictionary_variant_edits: bool = False
+    # Number of built dictionary entries kept in memory and shared across requests
+    word_entry_cache_size: int = 50000
+    # Admission control: "heavy" = /process-lyrics and /sync-lyrics, "light" = /kanji and /word,
+    # "stream" = open /jobs/{id}/events streams (job_max_streams of them); a rate of 0 means unlimited
+    heavy_max_concurrency: int = 4
+    heavy_max_queue: int = 16
+    heavy_queue_timeout: float = 30.0
+    heavy_rate_per_minute: float = 30.0
+    heavy_rate_burst: int = 10
+    light_max_concurrency: int = 64
+    light_max_queue: int = 256
+    light_queue_timeout: float = 5.0
+    light_rate_per_minute: float = 600.0
+    light_rate_burst: int = 100
+    admission_retry_after: float = 2.0
+    # Key rate limits on X-Forwarded-For only behind proxies that set it; the client is the hop
+    # trusted_proxy_count entries from the right (earlier entries are whatever the client sent)
+    trust_forwarded_for: bool = False
+    trusted_proxy_count: int = 1
+    # Request size limits
+    max_lyrics_chars: int = 20000
+    max_lyrics_lines: int = 500
+    # Validate large responses against their pydantic schemas before sending (debug only)
+    strict_response_validation: bool = False
+    # Processed songs kept (encoded) for /songs/stats, and the largest batch it scores at once
+    song_stats_max_songs: int = 100000
+    song_stats_max_batch: int = 5000
+    # Local idseq/kanji -> lines index behind /search (journal is compacted at startup past the threshold)
+    line_index_path: str = "line_index.db"
+    line_index_compact_threshold: int = 100000
+    # Segment uploads with at least this many uncached lines on a process pool (0 workers disables it)
+    segmentation_workers: int = 0
+    segmentation_threshold: int = 200
+    # Read-only local snapshot of the lines table used as a warm cache (see scripts/lines_snapshot.py)
+    lines_snapshot_path: str = ""
+    # Background refresh of lines cached by an older dictionary/segmenter (0 lines/second disables it);
+    # one process per host runs it, the one holding the lock file
+    reprocess_rate: float = 20.0
+    reprocess_batch_size: int = 50
+    reprocess_interval: float = 600.0
+    reprocess_lock_path: str = "reprocessor.lock"
+    # Refuse to start when lines.pipeline_version is missing (otherwise cached rows are served unversioned)
+    lines_require_pipeline_version: bool = False
+    # Background jobs (/jobs): worker threads (0 disables), queue file, lines per progress chunk
+    job_workers: int = 2
+    job_queue_path: str = "jobs.db"
+    job_max_queued: int = 100
+    job_chunk_lines: int = 50
+    job_retention_hours: float = 24.0
+    job_max_lyrics_chars: int = 200000
+    job_max_lyrics_lines: int = 5000
+    job_event_interval: float = 0.5
+    job_max_streams: int = 32
+    # Garbage collector: generation thresholds ("" keeps 700,10,10) and freezing startup objects out of collections;
+    # interpreter defaults unless set (the Procfile and Dockerfile set 10000,50,1000 and freeze)
+    gc_thresholds: str = ""
+    gc_freeze: bool = False
 
 settings = Settings()
\ No newline at end of file
@@ -1,3 +1,11 @@
 class LyricsProcessingError(Exception):
     """Custom exception for lyrics processing errors."""
-    pass
\ No newline at end of file
+    pass
+
+class DataAccessError(Exception):
+    """Raised when the lines cache backend cannot be reached or rejects a request."""
+    pass
+
+class JobQueueFullError(Exception):
+    """Raised when a background job cannot be accepted (queue full or jobs disabled)."""
+    pass
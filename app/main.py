@@ -1,15 +1,43 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+import asyncio
 import logging
 from app.routers.lyrics import router
+from app.services.lyrics_service import (
+    check_lines_schema, job_queue, line_index, reprocessor, segmentation_pool, translation_memory,
+)
 from app.exceptions import LyricsProcessingError
+from app.config import settings
+from app.utils.admission import attach_loop
+from app.utils.gc_policy import apply_gc_policy
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # everything loaded so far lives for the whole process: freeze it before forking workers
+    apply_gc_policy(settings.gc_thresholds, settings.gc_freeze)
+    # fork segmentation workers before any request threads exist
+    segmentation_pool.start()
+    await run_in_threadpool(check_lines_schema)
+    reprocessor.start()
+    # running jobs take heavy admission slots on this loop
+    attach_loop(asyncio.get_running_loop())
+    job_queue.start()
+    yield
+    job_queue.close()
+    reprocessor.close()
+    segmentation_pool.close()
+    # writes are committed in batches
+    line_index.close()
+    translation_memory.close()
+
 # Initialize FastAPI app
-app = FastAPI(title="Japanese Lyrics Processor API", version="1.0.0")
+app = FastAPI(title="Japanese Lyrics Processor API", version="1.0.0", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -0,0 +1,65 @@
+"""Typed internal result objects.
+
+These mirror the pydantic schemas in ``app.models.schemas`` but are msgspec
+structs (slotted, immutable, untracked by the GC), so building them in the hot
+path is cheap and they encode straight to JSON bytes through a precompiled
+encoder without a validation pass.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import msgspec
+
+
+class DefinitionResult(msgspec.Struct, frozen=True, gc=False):
+    pos: List[str]
+    definition: List[str]
+
+
+class WordEntryResult(msgspec.Struct, frozen=True, gc=False):
+    idseq: Union[int, str]
+    word: str
+    furigana: str
+    definitions: List[DefinitionResult]
+
+
+class KanjiResult(msgspec.Struct, frozen=True, gc=False):
+    jlpt_new: Optional[int]
+    meanings: Tuple[str, ...]
+    readings_on: Tuple[str, ...]
+    readings_kun: Tuple[str, ...]
+    radicals: Optional[Tuple[str, ...]]
+
+
+class LyricsResult(msgspec.Struct):
+    song_id: str
+    lyrics_lines: List[List[str]]
+    word_map: Dict[str, Sequence[WordEntryResult]]
+    kanji_data: Dict[str, Optional[KanjiResult]]
+    translated_lines: List[Tuple[str, str]]
+    # per line, per word: (text, reading) ruby segments, reading empty when none is needed
+    ruby_lines: List[List[List[Tuple[str, str]]]]
+
+
+class LineResult(msgspec.Struct, frozen=True):
+    """A freshly processed (uncached) line, ready to merge into a song and persist."""
+    line: str
+    lyric_line: List[str]
+    word_map: Dict[str, Sequence[WordEntryResult]]
+    translation: str
+    tokens: List[Dict[str, Any]]
+    ruby: List[List[Tuple[str, str]]]
+
+
+class SongStatsResult(msgspec.Struct, frozen=True, gc=False):
+    song_id: str
+    lines: int
+    words: int
+    unique_words: int
+    unknown_word_ratio: float
+    kanji: int
+    kanji_density: float
+    kanji_jlpt: Dict[str, int]
+    word_jlpt: Dict[str, int]
+    mean_kanji_strokes: float
+    mean_kanji_frequency: float
+    difficulty: float
@@ -1,14 +1,37 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Dict, Any, Tuple, Optional
+from app.config import settings
+
+
+def check_line_count(lyrics: str) -> str:
+    if lyrics.count('\n') + 1 > settings.max_lyrics_lines:
+        raise ValueError(f"Lyrics cannot have more than {settings.max_lyrics_lines} lines")
+    return lyrics
+
+
+def check_job_line_count(lyrics: str) -> str:
+    if lyrics.count('\n') + 1 > settings.job_max_lyrics_lines:
+        raise ValueError(f"Lyrics cannot have more than {settings.job_max_lyrics_lines} lines")
+    return lyrics
 
 
 class LyricsRequest(BaseModel):
-    lyrics: str
+    lyrics: str = Field(max_length=settings.max_lyrics_chars)
+
+    _line_count = field_validator("lyrics")(check_line_count)
+
+
+class JobRequest(BaseModel):
+    lyrics: str = Field(max_length=settings.job_max_lyrics_chars)
+
+    _line_count = field_validator("lyrics")(check_job_line_count)
 
 
 class EditLyricsRequest(BaseModel):
-    original_lyrics: str
-    modified_lyrics: str
+    original_lyrics: str = Field(max_length=settings.max_lyrics_chars)
+    modified_lyrics: str = Field(max_length=settings.max_lyrics_chars)
+
+    _line_count = field_validator("original_lyrics", "modified_lyrics")(check_line_count)
 
 
 class UpdateLyricsResponse(BaseModel):
@@ -19,10 +42,66 @@ class UpdateLyricsResponse(BaseModel):
 
 
 class LyricsResponse(BaseModel):
+    song_id: str
     lyrics_lines: List[List[str]]
     word_map: Dict[str, Any]
     kanji_data: Dict[str, Any]
     translated_lines: List[Tuple[str, str]]
+    ruby_lines: List[List[List[Tuple[str, str]]]]
+
+
+class JobResponse(BaseModel):
+    id: str
+    status: str
+    done: int
+    total: int
+    error: Optional[str] = None
+    created: float
+    updated: float
+    # the lines finished so far while running, the whole song once done
+    result: Optional[LyricsResponse] = None
+
+
+class SongStatsRequest(BaseModel):
+    song_ids: List[str] = Field(max_length=settings.song_stats_max_batch)
+
+
+class SongStats(BaseModel):
+    song_id: str
+    lines: int
+    words: int
+    unique_words: int
+    unknown_word_ratio: float
+    kanji: int
+    kanji_density: float
+    kanji_jlpt: Dict[str, int]
+    word_jlpt: Dict[str, int]
+    mean_kanji_strokes: float
+    mean_kanji_frequency: float
+    difficulty: float
+
+
+class SongStatsResponse(BaseModel):
+    stats: List[SongStats]
+    missing: List[str]
+
+
+class SearchResponse(BaseModel):
+    total: int
+    lines: List[str]
+    songs: List[str]
+
+
+class RadicalsResponse(BaseModel):
+    radicals: List[str]
+
+
+class RadicalSearchResponse(BaseModel):
+    radicals: List[str]
+    total: int
+    kanji: List[str]
+    # radicals found in the matching kanji: the selection plus those that can be added without emptying the result
+    compatible: List[str]
 
 
 class KanjiData(BaseModel):
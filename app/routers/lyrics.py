@@ -1,13 +1,31 @@
-from fastapi import APIRouter, HTTPException, Request
+import asyncio
+import math
+from typing import Any, AsyncIterator, Dict, List, Optional
+import msgspec
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from app.models.schemas import (
     LyricsRequest,
     LyricsResponse,
     EditLyricsRequest,
-    UpdateLyricsResponse,
     KanjiResponse,
     WordResponse,
+    SongStats,
+    SongStatsRequest,
+    SongStatsResponse,
+    SearchResponse,
+    RadicalsResponse,
+    RadicalSearchResponse,
+    JobRequest,
+    JobResponse,
 )
-from app.services.lyrics_service import process_lyrics, get_kanji_data, get_word_info_from_idseqs, sync_lyrics_lines
+from app.config import settings
+from app.exceptions import JobQueueFullError
+from app.services.job_queue import DONE, FAILED, Job
+from app.services.lyrics_service import process_lyrics, get_kanji_data, get_word_info_from_idseqs, sync_lyrics_lines, get_song_stats, search_lines, submit_lyrics_job, get_job, get_job_with_partial, get_radicals, unknown_radicals, search_radicals
+from app.utils.admission import AdmissionGate, admit, admit_stream, admission_stats
+from app.utils.serialization import dump_json, result_response
 import logging
 
 router = APIRouter()
@@ -23,6 +41,14 @@ async def root():
             "/health": "GET - Health check",
             "/kanji/{kanji}": "GET - Lookup kanji data for a single kanji",
             "/word/{idseq}": "GET - Lookup word info by idseq",
+            "/songs/{song_id}/stats": "GET - Difficulty statistics for a processed song",
+            "/songs/stats": "POST - Difficulty statistics for a batch of processed songs",
+            "/search": "GET - Cached lines (and songs) containing a word (idseq) and/or kanji",
+            "/radicals": "GET - Radicals available for radical search",
+            "/radicals/search": "GET - Kanji containing every given radical",
+            "/jobs": "POST - Queue long lyrics for background processing, returns a job ID",
+            "/jobs/{job_id}": "GET - Job status with the partial or final result",
+            "/jobs/{job_id}/events": "GET - Server-sent job progress events",
             "/docs": "GET - Interactive API documentation"
         }
     }
@@ -30,41 +56,53 @@ async def root():
 @router.get("/health")
 async def health_check():
     from app.config import settings
-    from app.services.lyrics_service import get_kanji_count
+    from app.utils.gc_policy import gc_stats
+    from app.services.lyrics_service import (
+        get_kanji_count,
+        get_translation_memory_stats,
+        get_line_index_stats,
+        get_segmentation_pool_stats,
+        get_lines_snapshot_stats,
+        get_pipeline_stats,
+        get_job_queue_stats,
+    )
     return {
         "status": "healthy",
         "deepl_api": "connected" if settings.deepl_key else "missing",
         "jamdict": "loaded",
-        "kanji_data": f"{get_kanji_count()} kanji loaded"
+        "kanji_data": f"{get_kanji_count()} kanji loaded",
+        "translation_memory": get_translation_memory_stats(),
+        "line_index": get_line_index_stats(),
+        "segmentation_pool": get_segmentation_pool_stats(),
+        "lines_snapshot": get_lines_snapshot_stats(),
+        "pipeline": get_pipeline_stats(),
+        "jobs": get_job_queue_stats(),
+        "admission": admission_stats(),
+        "gc": gc_stats(),
     }
 
-@router.post("/process-lyrics", response_model=LyricsResponse)
+@router.post("/process-lyrics", response_model=LyricsResponse, dependencies=[Depends(admit("heavy"))])
 async def process_lyrics_endpoint(request: LyricsRequest):
     try:
         if not request.lyrics or not request.lyrics.strip():
             raise HTTPException(status_code=400, detail="Lyrics cannot be empty")
         
-        lyric_lines, word_map, kanji_data_dict, translated_lines = process_lyrics(request.lyrics)
-        
-        return {
-            "lyrics_lines": lyric_lines,
-            "word_map": word_map,
-            "kanji_data": kanji_data_dict,
-            "translated_lines": translated_lines
-        }
+        # run off the event loop so concurrent requests can overlap (and coalesce)
+        result = await run_in_threadpool(process_lyrics, request.lyrics)
+        return result_response(result, LyricsResponse)
     except Exception as e:
         logger.error(f"Error processing lyrics: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing lyrics: {str(e)}")
 
 
-@router.get("/kanji/{kanji}", response_model=KanjiResponse)
+@router.get("/kanji/{kanji}", response_model=KanjiResponse, dependencies=[Depends(admit("light"))])
 async def lookup_kanji(kanji: str):
     try:
         data = get_kanji_data(kanji)
         if not data:
             raise HTTPException(status_code=404, detail="Kanji not found")
         logger.debug(f"Kanji data for '{kanji}': {data}")
-        return {"kanji": kanji, "data": data}
+        return result_response({"kanji": kanji, "data": data}, KanjiResponse)
     except HTTPException:
         raise
     except Exception as e:
@@ -72,7 +110,7 @@ async def lookup_kanji(kanji: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/word/{idseq}", response_model=WordResponse)
+@router.get("/word/{idseq}", response_model=WordResponse, dependencies=[Depends(admit("light"))])
 async def lookup_word(idseq: int):
     try:
         word_info = get_word_info_from_idseqs([idseq])
@@ -80,7 +118,7 @@ async def lookup_word(idseq: int):
             raise HTTPException(status_code=404, detail="Word not found")
         # return the first matching entry reconstructed from idseq
         logger.debug(f"Word info for idseq '{idseq}': {word_info}")
-        return {"idseq": idseq, "word_info": word_info[0]}
+        return result_response({"idseq": idseq, "word_info": word_info[0]}, WordResponse)
     except HTTPException:
         raise
     except Exception as e:
@@ -88,21 +126,160 @@ async def lookup_word(idseq: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/sync-lyrics", response_model=LyricsResponse)
+@router.post("/sync-lyrics", response_model=LyricsResponse, dependencies=[Depends(admit("heavy"))])
 async def sync_lyrics_endpoint(request: EditLyricsRequest):
     try:
         if not request.original_lyrics and not request.modified_lyrics:
             raise HTTPException(status_code=400, detail="Both original and modified lyrics cannot be empty")
 
-        lyric_lines, word_map, kanji_data_dict, translated_lines = sync_lyrics_lines(request.original_lyrics or "", request.modified_lyrics or "")
-        return {
-            "lyrics_lines": lyric_lines,
-            "word_map": word_map,
-            "kanji_data": kanji_data_dict,
-            "translated_lines": translated_lines,
-        }
+        result = await run_in_threadpool(sync_lyrics_lines, request.original_lyrics or "", request.modified_lyrics or "")
+        return result_response(result, LyricsResponse)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error syncing lyrics: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/songs/{song_id}/stats", response_model=SongStats, dependencies=[Depends(admit("light"))])
+async def song_stats(song_id: str):
+    stats = get_song_stats([song_id])[0]
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Song not found (process it first)")
+    return result_response(stats, SongStats)
+
+
+@router.post("/songs/stats", response_model=SongStatsResponse, dependencies=[Depends(admit("light"))])
+async def song_stats_batch(request: SongStatsRequest):
+    try:
+        results = get_song_stats(request.song_ids)
+        return result_response(
+            {
+                "stats": [stats for stats in results if stats is not None],
+                "missing": [song for song, stats in zip(request.song_ids, results) if stats is None],
+            },
+            SongStatsResponse,
+        )
+    except Exception as e:
+        logger.error(f"Error scoring songs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/search", response_model=SearchResponse, dependencies=[Depends(admit("light"))])
+async def search(
+    idseq: List[int] = Query(default=[]),
+    kanji: str = Query(default="", max_length=20),
+    limit: int = Query(default=20, ge=1, le=200),
+    offset: int = Query(default=0, ge=0),
+):
+    if not idseq and not kanji:
+        raise HTTPException(status_code=400, detail="Give at least one idseq or kanji")
+    total, lines, songs = search_lines(idseq, kanji, limit, offset)
+    return result_response({"total": total, "lines": lines, "songs": songs}, SearchResponse)
+
+
+@router.get("/radicals", response_model=RadicalsResponse, dependencies=[Depends(admit("light"))])
+async def radicals():
+    return result_response({"radicals": get_radicals()}, RadicalsResponse)
+
+
+@router.get("/radicals/search", response_model=RadicalSearchResponse, dependencies=[Depends(admit("light"))])
+async def radical_search(
+    radicals: str = Query(min_length=1, max_length=20, description="Radicals to combine, one character each"),
+    limit: int = Query(default=500, ge=1, le=5000),
+):
+    selected = list(dict.fromkeys(radicals))
+    unknown = unknown_radicals(selected)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown radicals: {''.join(unknown)}")
+    total, kanji, compatible = search_radicals(selected, limit)
+    return result_response(
+        {"radicals": selected, "total": total, "kanji": kanji, "compatible": compatible}, RadicalSearchResponse
+    )
+
+
+def job_content(job: Job, result: Optional[bytes] = None, done: Optional[int] = None) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "done": job.done if done is None else done,
+        "total": job.total,
+        "error": job.error,
+        "created": job.created,
+        "updated": job.updated,
+        # results are stored encoded; splice them in as-is
+        "result": msgspec.Raw(result) if result else None,
+    }
+
+
+@router.post("/jobs", response_model=JobResponse, status_code=202, dependencies=[Depends(admit("heavy"))])
+async def create_job(request: JobRequest):
+    if not request.lyrics.strip():
+        raise HTTPException(status_code=400, detail="Lyrics cannot be empty")
+    try:
+        job = await run_in_threadpool(submit_lyrics_job, request.lyrics)
+    except JobQueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server busy ({e}), retry later",
+            headers={"Retry-After": str(math.ceil(settings.admission_retry_after))},
+        )
+    return result_response(job_content(job, job.result), JobResponse, status_code=202)
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse, dependencies=[Depends(admit("light"))])
+async def job_status(job_id: str):
+    job = await run_in_threadpool(get_job_with_partial, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return result_response(job_content(job, job.result), JobResponse)
+
+
+def sse_event(event: str, content: Dict[str, Any]) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dump_json(content) + b"\n\n"
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request, gate: AdmissionGate = Depends(admit_stream)):
+    """Server-sent events: ``progress`` with the lines of every finished chunk, then ``done`` (with the result) or ``failed``."""
+    if await run_in_threadpool(get_job, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def job_stream() -> AsyncIterator[bytes]:
+        sent = 0  # chunks already streamed
+        status = None
+        idle = 0.0
+        while not await request.is_disconnected():
+            job = await run_in_threadpool(get_job, job_id)
+            if job is None:
+                return
+            if job.status in (DONE, FAILED):
+                yield sse_event(job.status, job_content(job, job.result))
+                return
+            new = job.chunks[sent:]
+            if new or job.status != status:
+                idle = 0.0
+                status = job.status
+                sent = len(job.chunks)
+                for done, chunk in new:
+                    yield sse_event("progress", job_content(job, chunk, done))
+                if not new:
+                    yield sse_event("progress", job_content(job))
+            elif idle >= 15:
+                # keep proxies from closing a quiet stream
+                idle = 0.0
+                yield b": keepalive\n\n"
+            await asyncio.sleep(settings.job_event_interval)
+            idle += settings.job_event_interval
+
+    async def events() -> AsyncIterator[bytes]:
+        # the slot is held while the body streams, released when it ends or the client goes away
+        try:
+            async with gate.slot():
+                async for event in job_stream():
+                    yield event
+        except HTTPException as e:
+            # another stream took the last slot since admit_stream checked
+            yield sse_event("busy", {"detail": e.detail})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
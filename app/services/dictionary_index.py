@@ -0,0 +1,327 @@
+"""In-memory lookup index over the jamdict JMdict tables.
+
+``get_word_info`` used to run ``jam.lookup`` for every token and then filter,
+rank and truncate the returned ORM entries in Python. The index does that work
+once at startup: every kanji/kana spelling maps to a pre-ranked, pre-truncated
+tuple of idseqs for both the "word" and "particle" lookup modes, so request
+time is a single dict probe.
+
+Two more maps resolve the non-standard spellings common in lyrics with a
+probe per tier instead of a string of failed lookups: first by ``fold_script``
+(katakana for hiragana words, small kana, full-width Latin), and only if that
+misses by ``normalize_variant`` (elongated vowels).
+
+Each spelling also carries a word-class bitmask (ichidan, godan, kuru, suru,
+i-adjective) so conjugated token runs can be resolved by validating the
+candidates from ``app.utils.deinflect`` in memory.
+
+``version`` fingerprints the dictionary data (release metadata and table
+sizes), so results cached under an older dictionary can be told apart.
+"""
+import hashlib
+import logging
+import sqlite3
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from app.utils.deinflect import VS, Deinflection, deinflect, pos_class
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = 4
+PARTICLE_POS = ("particle", "conjunction")
+COMMON_PRIORITY = "news1"
+
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(ord("ァ"), ord("ヶ") + 1)}
+_SMALL_TO_LARGE = str.maketrans("ぁぃぅぇぉゕゖゃゅょゎ", "あいうえおかけやゆよわ")
+_ELONGATION_MARKS = "ー〜~"
+_SMALL_KANA = set("ぁぃぅぇぉゕゖゃゅょゎっ")
+_VOWEL_ROWS = {
+    "a": "あかさたなはまやらわがざだばぱ",
+    "i": "いきしちにひみりぎじぢびぴ",
+    "u": "うくすつぬふむゆるぐずづぶぷ",
+    "e": "えけせてねへめれげぜでべぺ",
+    "o": "おこそとのほもよろをごぞどぼぽ",
+}
+_VOWEL_OF = {kana: vowel for vowel, row in _VOWEL_ROWS.items() for kana in row}
+# vowel kana that only lengthen the preceding mora: same vowel, plus えい and おう
+_EXTENDS = {"あ": "a", "い": "ie", "う": "uo", "え": "e", "お": "o"}
+# kana used to generate edit-distance-1 candidates
+_EDIT_ALPHABET = [chr(code) for code in range(ord("ぁ"), ord("ゖ") + 1)]
+
+
+def _fold_width(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).lower().translate(_KATAKANA_TO_HIRAGANA)
+
+
+def fold_script(text: str) -> str:
+    """First-tier variant key: NFKC width folding, lower case, katakana to
+    hiragana and small kana to full size. Nothing is dropped, so real long
+    vowels and doubled syllables survive: "コウコウ" -> "こうこう"."""
+    return _fold_width(text).translate(_SMALL_TO_LARGE)
+
+
+def normalize_variant(text: str) -> str:
+    """Second-tier variant key: ``fold_script`` plus lyric elongation removed.
+
+    Long-vowel marks and tildes are dropped. A vowel kana that only lengthens
+    the previous mora, or a repeat of the previous character, is dropped only
+    right after a mark or as a small kana (and then after each character so
+    dropped), and a trailing emphatic small tsu is removed: "スキーー",
+    "すきぃ", "すきーいい" and "すきっ" all fold to "すき", while "とおり" and
+    "いい" are left alone.
+    """
+    folded: List[str] = []
+    stretched = False
+    for char in _fold_width(text):
+        if char in _ELONGATION_MARKS:
+            stretched = True
+            continue
+        large = char.translate(_SMALL_TO_LARGE)
+        if folded and (stretched or char in _SMALL_KANA):
+            vowel = _VOWEL_OF.get(folded[-1])
+            if large == folded[-1] or (vowel is not None and vowel in _EXTENDS.get(large, "")):
+                stretched = True
+                continue
+        folded.append(large)
+        stretched = False
+    text = "".join(folded)
+    return text.rstrip("っ") or text
+
+
+VARIANT_FOLDS = (fold_script, normalize_variant)
+
+
+def is_elongation(text: str) -> bool:
+    """True for text made only of long-vowel marks, tildes and small kana ("ーー", "ぃ", "っ")."""
+    folded = _fold_width(text)
+    return bool(folded) and all(char in _ELONGATION_MARKS or char in _SMALL_KANA for char in folded)
+
+
+def edit_candidates(key: str) -> List[str]:
+    """Spellings one deletion, substitution or insertion (of a kana) away from ``key``."""
+    splits = [(key[:i], key[i:]) for i in range(len(key) + 1)]
+    deletes = [left + right[1:] for left, right in splits if right]
+    substitutes = [left + c + right[1:] for left, right in splits if right for c in _EDIT_ALPHABET if c != right[0]]
+    inserts = [left + c + right for left, right in splits for c in _EDIT_ALPHABET]
+    return list(dict.fromkeys(deletes + substitutes + inserts))
+
+
+def dictionary_version(conn: sqlite3.Connection) -> str:
+    """Short fingerprint of a jamdict database: its ``meta`` rows plus table sizes."""
+    fingerprint = hashlib.sha1()
+    for key, value in conn.execute("SELECT key, value FROM meta ORDER BY key"):
+        fingerprint.update(f"{key}={value}\n".encode("utf-8"))
+    for table in ("Entry", "Kanji", "Kana", "Sense", "SenseGloss"):
+        (count,) = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+        fingerprint.update(f"{table}={count}\n".encode("utf-8"))
+    (max_idseq,) = conn.execute("SELECT MAX(idseq) FROM Entry").fetchone()
+    fingerprint.update(f"max_idseq={max_idseq}".encode("utf-8"))
+    return fingerprint.hexdigest()[:12]
+
+
+def rank_idseqs(idseqs: Iterable[int], common: Set[int]) -> Tuple[int, ...]:
+    """Order idseqs the way ``get_word_info`` always has.
+
+    Entries with a ``news1`` kanji form matching the key are moved to the front
+    (each one inserted at position 0, so later commons come first), the rest keep
+    dictionary order, and the list is truncated to ``MAX_ENTRIES``.
+    """
+    ranked: List[int] = []
+    for idseq in idseqs:
+        if idseq in common:
+            ranked.insert(0, idseq)
+        else:
+            ranked.append(idseq)
+    return tuple(ranked[:MAX_ENTRIES])
+
+
+class DictionaryIndex:
+    """Pre-ranked spelling -> idseqs index for the "word" and "particle" modes."""
+
+    def __init__(
+        self,
+        word: Dict[str, Tuple[int, ...]],
+        particle: Dict[str, Tuple[int, ...]],
+        variants: Sequence[Dict[str, str]],
+        word_classes: Optional[Dict[str, int]] = None,
+        min_edit_length: int = 3,
+        version: str = "",
+    ):
+        self._modes: Dict[str, Dict[str, Tuple[int, ...]]] = {"word": word, "particle": particle}
+        # per fold tier (fold_script, normalize_variant): folded spelling -> preferred original spelling
+        self._variants = variants
+        # spelling -> OR of the deinflect word classes of its entries (inflectable spellings only)
+        self._word_classes = word_classes or {}
+        self.min_edit_length = min_edit_length
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self._modes["word"])
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._modes["word"]
+
+    def lookup(self, key: str, mode: str = "word") -> Tuple[int, ...]:
+        return self._modes[mode].get(key, ())
+
+    def resolve_variant(self, key: str, edits: bool = False) -> str | None:
+        """Dictionary spelling for a non-standard ``key``, or None.
+
+        The ``fold_script`` key is tried first and the ``normalize_variant`` key
+        only if that misses. With ``edits`` the latter may also be one kana edit
+        away from a dictionary spelling (keys shorter than ``min_edit_length``
+        are skipped; they are too ambiguous).
+        """
+        normalized = key
+        for fold, variants in zip(VARIANT_FOLDS, self._variants):
+            normalized = fold(key)
+            spelling = self._variant(normalized, variants)
+            if spelling is not None:
+                return spelling
+        if not edits or len(normalized) < self.min_edit_length:
+            return None
+        for candidate in edit_candidates(normalized):
+            spelling = self._variant(candidate, self._variants[-1])
+            if spelling is not None:
+                return spelling
+        return None
+
+    def _variant(self, normalized: str, variants: Dict[str, str]) -> str | None:
+        return normalized if normalized in self._modes["word"] else variants.get(normalized)
+
+    def lookup_variant(self, key: str, mode: str = "word", edits: bool = False) -> Tuple[int, ...]:
+        """Like ``lookup``, falling back to the variant maps when ``key`` is not a dictionary spelling."""
+        exact = self._modes[mode].get(key)
+        if exact is not None:
+            return exact
+        spelling = self.resolve_variant(key, edits)
+        return self._modes[mode].get(spelling, ()) if spelling is not None else ()
+
+    def word_class(self, key: str) -> int:
+        return self._word_classes.get(key, 0)
+
+    def _validate(self, candidate: Deinflection) -> str | None:
+        if self.word_class(candidate.word) & candidate.word_class:
+            return candidate.word
+        # suru-nouns are listed without する: 勉強した -> 勉強する -> 勉強
+        if candidate.word_class & VS and len(candidate.word) > 2 and candidate.word.endswith("する"):
+            stem = candidate.word[:-2]
+            if self.word_class(stem) & VS:
+                return stem
+        return None
+
+    def resolve_inflection(self, surface: str, preferred: str | None = None) -> str | None:
+        """Dictionary spelling that the conjugated ``surface`` deinflects to, or None.
+
+        Candidates are tried shortest rule chain first; ``preferred`` (the
+        tokenizer's base form for the head token) wins when it is among the
+        valid ones, which settles ambiguous cases like いった (言う / 行く).
+        """
+        found = None
+        for candidate in deinflect(surface)[1:]:
+            spelling = self._validate(candidate)
+            if spelling is None:
+                continue
+            if preferred is None or spelling == preferred:
+                return spelling
+            if found is None:
+                found = spelling
+        return found
+
+    @classmethod
+    def build(cls, db_path: Path | str, min_edit_length: int = 3) -> "DictionaryIndex":
+        started = time.perf_counter()
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            version = dictionary_version(conn)
+            # spelling -> idseqs (in Entry order) and the subset marked common for that spelling
+            spellings: Dict[str, List[int]] = {}
+            common: Dict[str, Set[int]] = {}
+            kanji_rows = conn.execute(
+                "SELECT k.text, k.idseq, EXISTS(SELECT 1 FROM KJP p WHERE p.kid = k.ID AND p.text = ?) "
+                "FROM Kanji k",
+                (COMMON_PRIORITY,),
+            )
+            for text, idseq, is_common in kanji_rows:
+                spellings.setdefault(text, []).append(idseq)
+                if is_common:
+                    common.setdefault(text, set()).add(idseq)
+            for text, idseq in conn.execute("SELECT text, idseq FROM Kana"):
+                spellings.setdefault(text, []).append(idseq)
+
+            # entries whose first sense is a particle or conjunction
+            particle_idseqs: Set[int] = {
+                idseq
+                for (idseq,) in conn.execute(
+                    "SELECT s.idseq FROM pos p "
+                    "JOIN (SELECT idseq, MIN(ID) AS sid FROM Sense GROUP BY idseq) s ON s.sid = p.sid "
+                    f"WHERE p.text IN ({','.join('?' * len(PARTICLE_POS))})",
+                    PARTICLE_POS,
+                )
+            }
+
+            # idseq -> word classes over all senses
+            entry_classes: Dict[int, int] = {}
+            pos_classes: Dict[str, int] = {}
+            for idseq, pos in conn.execute("SELECT s.idseq, p.text FROM pos p JOIN Sense s ON s.ID = p.sid"):
+                if pos not in pos_classes:
+                    pos_classes[pos] = pos_class(pos)
+                if pos_classes[pos]:
+                    entry_classes[idseq] = entry_classes.get(idseq, 0) | pos_classes[pos]
+        finally:
+            conn.close()
+        index = cls.from_spellings(spellings, common, particle_idseqs, entry_classes, min_edit_length, version)
+        logger.info(
+            "Dictionary index built (version %s): %d spellings, %d particle spellings, %s variant keys, "
+            "%d inflectable spellings in %.2fs",
+            version, len(index._modes["word"]), len(index._modes["particle"]),
+            "+".join(str(len(variants)) for variants in index._variants), len(index._word_classes),
+            time.perf_counter() - started,
+        )
+        return index
+
+    @classmethod
+    def from_spellings(
+        cls,
+        spellings: Dict[str, List[int]],
+        common: Optional[Dict[str, Set[int]]] = None,
+        particle_idseqs: Optional[Set[int]] = None,
+        entry_classes: Optional[Dict[int, int]] = None,
+        min_edit_length: int = 3,
+        version: str = "",
+    ) -> "DictionaryIndex":
+        """Index spelling -> idseqs rows (in Entry order); ``common`` holds the news1 idseqs per spelling."""
+        common = common or {}
+        particle_idseqs = particle_idseqs or set()
+        entry_classes = entry_classes or {}
+        word: Dict[str, Tuple[int, ...]] = {}
+        particle: Dict[str, Tuple[int, ...]] = {}
+        variants: List[Dict[str, str]] = [{} for _ in VARIANT_FOLDS]
+        variant_rank: List[Dict[str, Tuple[bool, int, str]]] = [{} for _ in VARIANT_FOLDS]
+        word_classes: Dict[str, int] = {}
+        no_common: Set[int] = set()
+        for text, idseqs in spellings.items():
+            ordered = sorted(set(idseqs))
+            classes = 0
+            for idseq in ordered:
+                classes |= entry_classes.get(idseq, 0)
+            if classes:
+                word_classes[text] = classes
+            key_common = common.get(text, no_common)
+            word[text] = rank_idseqs(ordered, key_common)
+            particles = [idseq for idseq in ordered if idseq in particle_idseqs]
+            if particles:
+                particle[text] = rank_idseqs(particles, key_common)
+            # when several spellings fold together, prefer common ones, then the shortest
+            rank = (not key_common, len(text), text)
+            for fold, tier_variants, tier_rank in zip(VARIANT_FOLDS, variants, variant_rank):
+                normalized = fold(text)
+                if normalized == text:
+                    continue  # found by the word map itself
+                if normalized not in tier_rank or rank < tier_rank[normalized]:
+                    tier_rank[normalized] = rank
+                    tier_variants[normalized] = text
+        return cls(word, particle, variants, word_classes, min_edit_length, version)
@@ -0,0 +1,215 @@
+"""Persistent background job queue for long lyric processing.
+
+``POST /jobs`` stores the lyrics in a local SQLite file and returns at once;
+a small pool of worker threads takes queued jobs in submission order and runs
+them outside the request path, so a long song neither holds a connection nor
+runs into the server timeout. While a job runs, each finished chunk of lines
+is kept in memory as reported (so progress costs nothing per line already
+done); the final result or error is written back to the file.
+
+Each worker holds a ``slot`` (a context manager; the app passes a heavy
+admission slot) while it runs a job, so jobs share the heavy concurrency limit
+with requests instead of adding to it.
+
+Jobs left ``running`` by a stopped server are queued again at startup, and
+finished jobs are dropped after ``retention`` seconds. The file belongs to one
+server process.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, List, NamedTuple, Optional, Tuple
+
+from app.exceptions import JobQueueFullError
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# process(payload, report) -> encoded result; report(done, total, encoded result of the lines just finished)
+Report = Callable[[int, int, bytes], None]
+Process = Callable[[str, Report], bytes]
+
+
+class Job(NamedTuple):
+    id: str
+    status: str
+    done: int
+    total: int
+    result: Optional[bytes]  # final once done
+    error: Optional[str]
+    created: float
+    updated: float
+    # while running: (done, encoded result of that chunk's lines) for every finished chunk
+    chunks: Tuple[Tuple[int, bytes], ...] = ()
+
+
+class _Progress:
+    __slots__ = ("done", "total", "chunks", "updated")
+
+    def __init__(self) -> None:
+        self.done = 0
+        self.total = 0
+        self.chunks: List[Tuple[int, bytes]] = []
+        self.updated = time.time()
+
+
+class JobQueue:
+    def __init__(
+        self,
+        path: str,
+        process: Process,
+        workers: int = 2,
+        max_queued: int = 100,
+        retention: float = 86400.0,
+        slot: Callable[[], ContextManager[None]] = nullcontext,
+    ):
+        self.process = process
+        self.slot = slot
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention = retention
+        self.completed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT NOT NULL, done INTEGER NOT NULL DEFAULT 0, "
+            "total INTEGER NOT NULL DEFAULT 0, result BLOB, error TEXT, created REAL NOT NULL, updated REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);"
+        )
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._running: Dict[str, _Progress] = {}
+        self._threads: List[threading.Thread] = []
+        with self._lock:
+            self._prune()
+            recovered = self._conn.execute(
+                "UPDATE jobs SET status = ?, done = 0 WHERE status = ?", (QUEUED, RUNNING)
+            ).rowcount
+            self._conn.commit()
+            queued = [job_id for (job_id,) in self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created", (QUEUED,)
+            )]
+        for job_id in queued:
+            self._queue.put(job_id)
+        if queued:
+            logger.info(f"Job queue: {len(queued)} queued jobs ({recovered} interrupted) from {path}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def start(self) -> None:
+        if not self.enabled or self._threads:
+            return
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, payload: str) -> Job:
+        if not self.enabled:
+            raise JobQueueFullError("Background jobs are disabled")
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFullError(f"{self.max_queued} jobs already queued")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, payload, created, updated) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, payload, now, now),
+            )
+            self._conn.commit()
+        self._queue.put(job_id)
+        return Job(job_id, QUEUED, 0, 0, None, None, now, now)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, done, total, result, error, created, updated FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            progress = self._running.get(job_id)
+            if progress is not None:
+                running = (progress.done, progress.total, progress.updated, tuple(progress.chunks))
+        if row is None:
+            return None
+        status, done, total, result, error, created, updated = row
+        if progress is not None and status == RUNNING:
+            done, total, updated, chunks = running
+            return Job(job_id, status, done, total, None, None, created, updated, chunks)
+        return Job(job_id, status, done, total, result, error, created, updated)
+
+    def _work(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            with self.slot():
+                self._run(job_id)
+
+    def _run(self, job_id: str) -> None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM jobs WHERE id = ? AND status = ?", (job_id, QUEUED)
+            ).fetchone()
+            if row is None:
+                return
+            progress = self._running[job_id] = _Progress()
+            self._conn.execute("UPDATE jobs SET status = ?, updated = ? WHERE id = ?", (RUNNING, time.time(), job_id))
+            self._conn.commit()
+
+        def report(done: int, total: int, chunk: bytes) -> None:
+            with self._lock:
+                progress.chunks.append((done, chunk))
+                progress.done, progress.total = done, total
+                progress.updated = time.time()
+
+        started = time.perf_counter()
+        try:
+            result = self.process(row[0], report)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self._finish(job_id, FAILED, None, str(e))
+            self.failed += 1
+            return
+        self._finish(job_id, DONE, result, None)
+        self.completed += 1
+        logger.info(f"Job {job_id} done in {time.perf_counter() - started:.1f}s")
+
+    def _finish(self, job_id: str, status: str, result: Optional[bytes], error: Optional[str]) -> None:
+        with self._lock:
+            progress = self._running.pop(job_id)
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, done = ?, total = ?, result = ?, error = ?, updated = ? WHERE id = ?",
+                (status, progress.done, progress.total, result, error, time.time(), job_id),
+            )
+            self._prune()
+            self._conn.commit()
+
+    def _prune(self) -> None:
+        self._conn.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?", (DONE, FAILED, time.time() - self.retention)
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": len(self._threads),
+            "queued": self._queue.qsize(),
+            "running": len(self._running),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    def close(self) -> None:
+        # running jobs stay "running" in the file and are queued again at the next start
+        for _ in self._threads:
+            self._queue.put(None)
+        self._threads = []
@@ -0,0 +1,92 @@
+"""Compact in-memory kanji table built from ``kanji.json``.
+
+The file carries many fields the API never serves (old JLPT levels, WaniKani
+data, ...). ``KanjiTable.load`` decodes only the used fields straight into
+msgspec structs, so the rest is skipped by the parser instead of becoming
+dicts and lists. Each kanji then gets one prebuilt, immutable ``KanjiResult``
+(served as-is by ``/kanji`` and inside song results) whose strings are interned
+and whose reading/meaning/radical tuples are shared between kanji that have
+the same ones. Numeric attributes live in NumPy columns addressed by row, for
+song statistics.
+
+``scripts/kanji_memory.py`` compares its footprint with the plain parsed JSON.
+"""
+import sys
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import msgspec
+import numpy as np
+
+from app.models.results import KanjiResult
+
+
+class KanjiEntry(msgspec.Struct, gc=False):
+    """The ``kanji.json`` fields that are served or scored; others are skipped while decoding."""
+    strokes: Optional[int] = None
+    grade: Optional[int] = None
+    freq: Optional[int] = None
+    jlpt_new: Optional[int] = None
+    meanings: Optional[List[str]] = None
+    readings_on: Optional[List[str]] = None
+    readings_kun: Optional[List[str]] = None
+
+
+_decoder = msgspec.json.Decoder(Dict[str, KanjiEntry])
+
+
+class KanjiTable:
+    def __init__(
+        self,
+        entries: Dict[str, KanjiEntry],
+        radicals: Callable[[str], Optional[Sequence[str]]] = lambda kanji: None,
+    ):
+        shared: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+        def intern_all(values: Optional[Sequence[str]]) -> Tuple[str, ...]:
+            key = tuple(sys.intern(value) for value in values or ())
+            return shared.setdefault(key, key)
+
+        self.results: Dict[str, KanjiResult] = {}
+        for kanji, entry in entries.items():
+            kanji_radicals = radicals(kanji)
+            self.results[sys.intern(kanji)] = KanjiResult(
+                jlpt_new=entry.jlpt_new,
+                meanings=intern_all(entry.meanings),
+                readings_on=intern_all(entry.readings_on),
+                readings_kun=intern_all(entry.readings_kun),
+                radicals=intern_all(kanji_radicals) if kanji_radicals is not None else None,
+            )
+        self.rows: Dict[str, int] = {kanji: row for row, kanji in enumerate(self.results)}
+        values = list(entries.values())
+        self.jlpt = np.array([entry.jlpt_new or 0 for entry in values], dtype=np.int8)
+        self.strokes = np.array([entry.strokes or 0 for entry in values], dtype=np.int16)
+        self.freq = np.array([entry.freq or 0 for entry in values], dtype=np.int32)
+        self.grade = np.array([entry.grade or 0 for entry in values], dtype=np.int8)
+
+    @classmethod
+    def load(cls, path: str, radicals: Callable[[str], Optional[Sequence[str]]] = lambda kanji: None) -> "KanjiTable":
+        with open(path, "rb") as f:
+            return cls(_decoder.decode(f.read()), radicals)
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def __contains__(self, kanji: str) -> bool:
+        return kanji in self.results
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.results)
+
+    def get(self, kanji: str) -> Optional[KanjiResult]:
+        return self.results.get(kanji)
+
+    def sort_key(self, kanji: str) -> Tuple[int, str]:
+        """Dictionary order: stroke count (unknown last), then code point."""
+        row = self.rows.get(kanji)
+        strokes = int(self.strokes[row]) if row is not None else 0
+        return (strokes or 1000, kanji)
+
+    def level_of(self, text: str) -> int:
+        """JLPT level (``jlpt_new``) of the hardest kanji in ``text`` (0 if it has none with a level)."""
+        levels = [int(self.jlpt[self.rows[c]]) for c in text if c in self.rows and self.jlpt[self.rows[c]]]
+        return min(levels) if levels else 0
@@ -0,0 +1,282 @@
+"""Local inverted index from dictionary entries and kanji to cached lines.
+
+Every line written to the lines cache gets a small integer ID; posting lists map
+each idseq (from the line's tokens) and each kanji (from its text) to the sorted
+IDs of the lines that contain it, and each line remembers the songs it was
+processed in. Lists are held in memory as ``array('I')`` (new IDs only ever
+append, so they stay sorted) and persisted in SQLite: compacted lists as
+delta-encoded blobs, plus an append-only journal of postings added since the
+last compaction. Deleted lines are tombstoned (a sorted array, filtered out of
+search results) and dropped on compaction, which runs once either the journal or
+the tombstones reach ``compact_threshold``. Reprocessed lines are re-indexed
+under their existing ID, rewriting just the posting lists whose terms changed.
+Writes are committed at most every ``commit_interval`` seconds and on close; a
+crash loses only those, and the file can always be rebuilt.
+
+``scripts/rebuild_line_index.py`` rebuilds the file from the ``lines`` table.
+"""
+import bisect
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+import numpy as np
+
+from app.utils.text_processing import CONST_KANJI, extract_unicode_block
+
+logger = logging.getLogger(__name__)
+
+WORD = "w"
+KANJI = "k"
+_DELTA_TYPES = (np.uint8, np.uint16, np.uint32)
+
+
+def encode_postings(ids: array) -> bytes:
+    """Sorted IDs as deltas in the narrowest unsigned type, prefixed with its width."""
+    deltas = np.diff(np.frombuffer(ids, dtype=np.uint32), prepend=np.uint32(0))
+    peak = int(deltas.max()) if len(deltas) else 0
+    for dtype in _DELTA_TYPES:
+        if peak <= np.iinfo(dtype).max:
+            return bytes([np.dtype(dtype).itemsize]) + deltas.astype(dtype).tobytes()
+    raise ValueError("line ID out of range")
+
+
+def decode_postings(blob: bytes) -> array:
+    dtype = {np.dtype(t).itemsize: t for t in _DELTA_TYPES}[blob[0]]
+    ids = np.cumsum(np.frombuffer(blob, dtype=dtype, offset=1), dtype=np.uint32)
+    return array("I", ids.tobytes())
+
+
+def line_terms(line: str, tokens: List[Dict[str, Any]]) -> Set[Tuple[str, str]]:
+    terms = {(KANJI, kanji) for kanji in extract_unicode_block(CONST_KANJI, line)}
+    for token in tokens:
+        for idseq in token.get("idseqs") or []:
+            if str(idseq).isdigit():
+                terms.add((WORD, str(int(idseq))))
+    return terms
+
+
+class LineIndex:
+    def __init__(self, path: str, compact_threshold: int = 100000, commit_interval: float = 1.0):
+        self.compact_threshold = compact_threshold
+        self.commit_interval = commit_interval
+        self._last_commit = time.monotonic()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS lines (id INTEGER PRIMARY KEY, line TEXT NOT NULL, deleted INTEGER NOT NULL DEFAULT 0);"
+            "CREATE TABLE IF NOT EXISTS postings (kind TEXT NOT NULL, term TEXT NOT NULL, ids BLOB NOT NULL, PRIMARY KEY (kind, term));"
+            "CREATE TABLE IF NOT EXISTS journal (kind TEXT NOT NULL, term TEXT NOT NULL, line_id INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS journal_term ON journal (kind, term);"
+            "CREATE TABLE IF NOT EXISTS song_lines (song_id TEXT NOT NULL, line_id INTEGER NOT NULL, PRIMARY KEY (song_id, line_id));"
+        )
+        started = time.perf_counter()
+        self._ids: Dict[str, int] = {}
+        self._lines: Dict[int, str] = {}
+        self._deleted: Set[int] = set()
+        # the same IDs sorted, for filtering search results
+        self._tombstones = np.zeros(0, dtype=np.uint32)
+        # a line deleted and cached again has a tombstoned row and a newer live one
+        for line_id, line, deleted in self._conn.execute("SELECT id, line, deleted FROM lines ORDER BY id"):
+            self._ids[line] = line_id
+            self._lines[line_id] = line
+            if deleted:
+                self._deleted.add(line_id)
+        self._postings: Dict[Tuple[str, str], array] = {
+            (kind, term): decode_postings(blob) for kind, term, blob in self._conn.execute("SELECT kind, term, ids FROM postings")
+        }
+        journaled = 0
+        for kind, term, line_id in self._conn.execute("SELECT kind, term, line_id FROM journal ORDER BY line_id"):
+            self._postings.setdefault((kind, term), array("I")).append(line_id)
+            journaled += 1
+        self._line_songs: Dict[int, List[str]] = {}
+        for song_id, line_id in self._conn.execute("SELECT song_id, line_id FROM song_lines"):
+            self._line_songs.setdefault(line_id, []).append(song_id)
+        self._journaled = journaled
+        self._tombstones = np.array(sorted(self._deleted), dtype=np.uint32)
+        self._compact_if_needed()
+        logger.info(
+            f"Line index loaded: {len(self._ids) - len(self._deleted)} lines, {len(self._postings)} terms "
+            f"from {path} in {time.perf_counter() - started:.2f}s"
+        )
+
+    def __len__(self) -> int:
+        return len(self._ids) - len(self._deleted)
+
+    def __contains__(self, line: str) -> bool:
+        line_id = self._ids.get(line)
+        return line_id is not None and line_id not in self._deleted
+
+    def add_lines(self, rows: Iterable[Dict[str, Any]], song_id: Optional[str] = None) -> int:
+        """Index ``{'line', 'tokens'}`` rows not indexed yet (and tie them to ``song_id``); returns lines added."""
+        added = 0
+        with self._lock:
+            for row in rows:
+                line = row["line"]
+                line_id = self._ids.get(line)
+                if line_id is None or line_id in self._deleted:
+                    # new IDs are always the largest, so appending keeps postings sorted
+                    cursor = self._conn.execute("INSERT INTO lines (line) VALUES (?)", (line,))
+                    line_id = int(cursor.lastrowid)  # type: ignore
+                    self._ids[line] = line_id
+                    self._lines[line_id] = line
+                    terms = sorted(line_terms(line, row.get("tokens") or []))
+                    for term in terms:
+                        self._postings.setdefault(term, array("I")).append(line_id)
+                    self._conn.executemany(
+                        "INSERT INTO journal (kind, term, line_id) VALUES (?, ?, ?)",
+                        [(kind, term, line_id) for kind, term in terms],
+                    )
+                    self._journaled += len(terms)
+                    added += 1
+                if song_id is not None:
+                    songs = self._line_songs.setdefault(line_id, [])
+                    if song_id not in songs:
+                        songs.append(song_id)
+                        self._conn.execute("INSERT OR IGNORE INTO song_lines (song_id, line_id) VALUES (?, ?)", (song_id, line_id))
+            self._commit()
+        self._compact_if_needed()
+        return added
+
+    def reindex_lines(self, rows: Iterable[Dict[str, Any]], previous: Mapping[str, List[Dict[str, Any]]]) -> int:
+        """Re-index ``{'line', 'tokens'}`` rows whose tokens changed from ``previous[line]``, keeping their IDs (and
+        so their songs); lines not indexed yet are added. Returns the lines re-indexed."""
+        reindexed = 0
+        new_rows: List[Dict[str, Any]] = []
+        with self._lock:
+            touched: Set[Tuple[str, str]] = set()
+            for row in rows:
+                line = row["line"]
+                line_id = self._ids.get(line)
+                if line_id is None or line_id in self._deleted:
+                    new_rows.append(row)
+                    continue
+                old_terms = line_terms(line, previous.get(line) or [])
+                new_terms = line_terms(line, row.get("tokens") or [])
+                for term in old_terms - new_terms:
+                    ids = self._postings.get(term)
+                    at = bisect.bisect_left(ids, line_id) if ids is not None else 0
+                    if ids is not None and at < len(ids) and ids[at] == line_id:
+                        del ids[at]
+                        touched.add(term)
+                for term in new_terms - old_terms:
+                    ids = self._postings.setdefault(term, array("I"))
+                    at = bisect.bisect_left(ids, line_id)
+                    if at == len(ids) or ids[at] != line_id:
+                        ids.insert(at, line_id)
+                        touched.add(term)
+                reindexed += 1
+            # an ID inserted mid-list can't go to the append-only journal: store the whole list instead
+            for kind, term in touched:
+                cleared = self._conn.execute("DELETE FROM journal WHERE kind = ? AND term = ?", (kind, term)).rowcount
+                self._journaled -= max(cleared, 0)
+                ids = self._postings[(kind, term)]
+                if ids:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO postings (kind, term, ids) VALUES (?, ?, ?)", (kind, term, encode_postings(ids))
+                    )
+                else:
+                    del self._postings[(kind, term)]
+                    self._conn.execute("DELETE FROM postings WHERE kind = ? AND term = ?", (kind, term))
+            self._commit()
+        if new_rows:
+            reindexed += self.add_lines(new_rows)
+        return reindexed
+
+    def remove_lines(self, lines: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            for line in lines:
+                line_id = self._ids.get(line)
+                if line_id is None or line_id in self._deleted:
+                    continue
+                self._deleted.add(line_id)
+                self._conn.execute("UPDATE lines SET deleted = 1 WHERE id = ?", (line_id,))
+                removed += 1
+            if removed:
+                self._tombstones = np.array(sorted(self._deleted), dtype=np.uint32)
+            self._commit()
+        self._compact_if_needed()
+        return removed
+
+    def _commit(self, force: bool = False) -> None:
+        # called with the lock held
+        now = time.monotonic()
+        if force or now - self._last_commit >= self.commit_interval:
+            self._conn.commit()
+            self._last_commit = now
+
+    def _compact_if_needed(self) -> None:
+        if self._journaled >= self.compact_threshold or len(self._deleted) >= self.compact_threshold:
+            self.compact()
+
+    def search(
+        self, idseqs: Iterable[int] = (), kanji: str = "", limit: int = 20, offset: int = 0
+    ) -> Tuple[int, List[str], List[str]]:
+        """Lines containing every given idseq and kanji, newest first: (total, lines, songs of those lines)."""
+        terms = [(WORD, str(idseq)) for idseq in idseqs] + [(KANJI, k) for k in dict.fromkeys(kanji)]
+        if not terms:
+            return 0, [], []
+        with self._lock:
+            postings = sorted((self._postings.get(term, array("I")) for term in terms), key=len)
+            # intersect starting from the shortest list; copies, so the arrays can keep growing
+            matches = np.frombuffer(postings[0], dtype=np.uint32).copy()
+            for ids in postings[1:]:
+                if not len(matches):
+                    break
+                other = np.frombuffer(ids, dtype=np.uint32).copy()
+                found = np.searchsorted(other, matches).clip(max=max(len(other) - 1, 0))
+                matches = matches[other[found] == matches] if len(other) else matches[:0]
+            tombstones = self._tombstones
+            if len(tombstones) and len(matches):
+                found = np.searchsorted(tombstones, matches).clip(max=len(tombstones) - 1)
+                matches = matches[tombstones[found] != matches]
+            page = matches[::-1][offset:offset + limit].tolist()
+            songs = list(dict.fromkeys(song for line_id in page for song in self._line_songs.get(line_id, ())))
+            return len(matches), [self._lines[line_id] for line_id in page], songs
+
+    def compact(self) -> None:
+        """Fold the journal into the posting blobs and drop deleted lines."""
+        with self._lock:
+            started = time.perf_counter()
+            if self._deleted:
+                for term, ids in list(self._postings.items()):
+                    kept = array("I", (line_id for line_id in ids if line_id not in self._deleted))
+                    if kept:
+                        self._postings[term] = kept
+                    else:
+                        del self._postings[term]
+                for line_id in self._deleted:
+                    line = self._lines.pop(line_id)
+                    if self._ids.get(line) == line_id:
+                        del self._ids[line]
+                    self._line_songs.pop(line_id, None)
+                self._conn.execute("DELETE FROM song_lines WHERE line_id IN (SELECT id FROM lines WHERE deleted = 1)")
+                self._conn.execute("DELETE FROM lines WHERE deleted = 1")
+                self._deleted.clear()
+                self._tombstones = np.zeros(0, dtype=np.uint32)
+            self._conn.execute("DELETE FROM postings")
+            self._conn.executemany(
+                "INSERT INTO postings (kind, term, ids) VALUES (?, ?, ?)",
+                [(kind, term, encode_postings(ids)) for (kind, term), ids in self._postings.items()],
+            )
+            self._conn.execute("DELETE FROM journal")
+            self._commit(force=True)
+            self._journaled = 0
+            logger.info(f"Line index compacted: {len(self._postings)} terms in {time.perf_counter() - started:.2f}s")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "lines": len(self),
+            "terms": len(self._postings),
+            "journaled": self._journaled,
+            "deleted": len(self._deleted),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._commit(force=True)
+            self._conn.close()
@@ -0,0 +1,245 @@
+"""Data access for the Supabase ``lines`` cache table.
+
+Talks to PostgREST directly over a pooled HTTP/2 ``httpx.Client`` instead of the
+single serial supabase client: lookups, inserts and deletes are batched with
+``in.(...)`` filters, large batches are fanned out over a bounded thread pool,
+and transient failures are retried with jittered exponential backoff. Pass
+``base_url`` (and optionally ``transport``) to point it at a local
+PostgREST-compatible stub.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+from urllib.parse import quote
+
+import httpx
+import msgspec
+
+from app.config import settings
+from app.exceptions import DataAccessError
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+LINE_COLUMNS = "line,translation,tokens,pipeline_version"
+# tables not yet migrated for lines cache versioning
+UNVERSIONED_LINE_COLUMNS = "line,translation,tokens"
+
+
+def quote_filter_value(value: str) -> str:
+    """Quote a value for a PostgREST ``in.(...)`` list."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def in_filter(values: Iterable[str]) -> str:
+    return "in.(" + ",".join(quote_filter_value(v) for v in values) + ")"
+
+
+def chunked(values: Sequence[Any], size: int) -> List[Sequence[Any]]:
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def chunked_filter(values: Sequence[str], max_bytes: int, max_items: int) -> List[Sequence[str]]:
+    """Split ``values`` so each ``in.(...)`` filter stays within ``max_bytes`` once URL-encoded
+    (and ``max_items`` values); a single value longer than that still gets its own batch."""
+    batches: List[Sequence[str]] = []
+    start = 0
+    size = len("in.()")
+    for i, value in enumerate(values):
+        # percent-encoded value plus its encoded comma separator
+        cost = len(quote(quote_filter_value(value), safe="")) + 3
+        if i > start and (size + cost > max_bytes or i - start >= max_items):
+            batches.append(values[start:i])
+            start = i
+            size = len("in.()")
+        size += cost
+    if start < len(values):
+        batches.append(values[start:])
+    return batches
+
+
+class LinesRepository:
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        *,
+        table: str = "lines",
+        timeout: float = 10.0,
+        max_connections: int = 20,
+        max_concurrency: int = 8,
+        max_retries: int = 3,
+        backoff_base: float = 0.1,
+        backoff_max: float = 2.0,
+        batch_size: int = 100,
+        max_filter_bytes: int = 6000,
+        transport: Optional[httpx.BaseTransport] = None,
+    ):
+        self.table = table
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.batch_size = batch_size
+        # False once ``detect_versioning`` finds no pipeline_version column: rows are read and written without it
+        self.versioned = True
+        self.columns = LINE_COLUMNS
+        # line filters travel in the URL; gateways reject URLs much past 8 KB
+        self.max_filter_bytes = max_filter_bytes
+        self._client = httpx.Client(
+            base_url=base_url.rstrip("/") + "/rest/v1",
+            headers={"apikey": api_key, "Authorization": f"Bearer {api_key}"},
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            http2=transport is None,
+            transport=transport,
+        )
+        # bounds in-flight requests across all request threads, not just one fan-out
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="lines-repo")
+
+    @classmethod
+    def from_settings(cls) -> "LinesRepository":
+        return cls(
+            settings.supabase_url,
+            settings.supabase_key,
+            timeout=settings.supabase_timeout,
+            max_connections=settings.supabase_max_connections,
+            max_concurrency=settings.supabase_max_concurrency,
+            max_retries=settings.supabase_max_retries,
+            batch_size=settings.supabase_batch_size,
+            max_filter_bytes=settings.supabase_max_filter_bytes,
+        )
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+        self._client.close()
+
+    def _backoff(self, attempt: int) -> float:
+        # "full jitter": uniform over [0, capped exponential]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _request(self, method: str, *, params: Dict[str, str], json: Any = None, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                with self._slots:
+                    response = self._client.request(method, f"/{self.table}", params=params, json=json, headers=headers)
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                error: Exception = DataAccessError(f"{method} {self.table} failed with HTTP {response.status_code}: {response.text}")
+            except httpx.TransportError as e:
+                error = e
+            if attempt >= self.max_retries:
+                raise DataAccessError(f"{method} {self.table} failed after {attempt + 1} attempts: {error}") from error
+            delay = self._backoff(attempt)
+            logger.warning(f"Retrying {method} {self.table} in {delay:.2f}s after: {error}")
+            time.sleep(delay)
+            attempt += 1
+        if response.is_error:
+            raise DataAccessError(f"{method} {self.table} failed with HTTP {response.status_code}: {response.text}")
+        return response
+
+    def _fan_out(self, fn: Callable[[Sequence[Any]], Any], values: Sequence[Any]) -> List[Any]:
+        return self._run_batches(fn, chunked(values, self.batch_size))
+
+    def _fan_out_filter(self, fn: Callable[[Sequence[str]], Any], lines: Sequence[str]) -> List[Any]:
+        """Like ``_fan_out`` for requests that put ``lines`` in an ``in.(...)`` URL filter."""
+        return self._run_batches(fn, chunked_filter(lines, self.max_filter_bytes, self.batch_size))
+
+    def _run_batches(self, fn: Callable[[Sequence[Any]], Any], batches: List[Sequence[Any]]) -> List[Any]:
+        if len(batches) <= 1:
+            return [fn(batch) for batch in batches]
+        return list(self._pool.map(fn, batches))
+
+    def has_column(self, column: str) -> bool:
+        """Whether the table has ``column`` (False on Postgres' undefined-column error, 42703)."""
+        try:
+            self._request("GET", params={"select": column, "limit": "1"})
+        except DataAccessError as e:
+            if "42703" in str(e):
+                return False
+            raise
+        return True
+
+    def detect_versioning(self) -> bool:
+        """Check whether the table has ``pipeline_version`` and read and write rows accordingly."""
+        self.versioned = self.has_column("pipeline_version")
+        self.columns = LINE_COLUMNS if self.versioned else UNVERSIONED_LINE_COLUMNS
+        return self.versioned
+
+    def _writable(self, rows: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.versioned:
+            return list(rows)
+        return [{key: value for key, value in row.items() if key != "pipeline_version"} for row in rows]
+
+    def get_line(self, line: str) -> Optional[Dict[str, Any]]:
+        return self.get_lines([line]).get(line)
+
+    def get_lines(self, lines: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch cached rows for ``lines``, keyed by line text (missing lines are absent)."""
+        unique = list(dict.fromkeys(lines))
+
+        def fetch(batch: Sequence[str]) -> List[Dict[str, Any]]:
+            response = self._request("GET", params={"select": self.columns, "line": in_filter(batch)})
+            # msgspec reuses decoded key strings across rows (stdlib json allocates them per row)
+            return msgspec.json.decode(response.content)
+
+        rows: Dict[str, Dict[str, Any]] = {}
+        for batch_rows in self._fan_out_filter(fetch, unique):
+            for row in batch_rows:
+                rows.setdefault(row["line"], row)
+        return rows
+
+    def iter_lines(self, page_size: int = 1000, filters: Optional[Dict[str, str]] = None) -> Iterator[Dict[str, Any]]:
+        """Every cached row (matching the PostgREST ``filters``), in line order, paging with ``line=gt.<last line>``."""
+        last: Optional[str] = None
+        while True:
+            params = {"select": self.columns, "order": "line.asc", "limit": str(page_size), **(filters or {})}
+            if last is not None:
+                params["line"] = f"gt.{last}"
+            rows = self._request("GET", params=params).json()
+            yield from rows
+            if len(rows) < page_size:
+                return
+            last = rows[-1]["line"]
+
+    def insert_lines(self, rows: Sequence[Dict[str, Any]]) -> None:
+        """Insert rows, ignoring lines another request already inserted."""
+        def insert(batch: Sequence[Dict[str, Any]]) -> None:
+            self._request(
+                "POST",
+                params={"on_conflict": "line"},
+                json=self._writable(batch),
+                headers={"Prefer": "resolution=ignore-duplicates,return=minimal"},
+            )
+
+        self._fan_out(insert, rows)
+
+    def upsert_lines(self, rows: Sequence[Dict[str, Any]]) -> None:
+        """Insert rows, replacing the cached rows of lines that already exist."""
+        def upsert(batch: Sequence[Dict[str, Any]]) -> None:
+            self._request(
+                "POST",
+                params={"on_conflict": "line"},
+                json=self._writable(batch),
+                headers={"Prefer": "resolution=merge-duplicates,return=minimal"},
+            )
+
+        self._fan_out(upsert, rows)
+
+    def delete_lines(self, lines: Iterable[str]) -> int:
+        """Delete rows for ``lines`` with one ``in.(...)`` filter per batch; returns rows deleted."""
+        unique = list(dict.fromkeys(lines))
+
+        def delete(batch: Sequence[str]) -> int:
+            response = self._request(
+                "DELETE",
+                params={"line": in_filter(batch), "select": "line"},
+                headers={"Prefer": "return=representation"},
+            )
+            return len(response.json())
+
+        return sum(self._fan_out_filter(delete, unique))
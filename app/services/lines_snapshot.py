@@ -0,0 +1,317 @@
+"""Compact local snapshot of the ``lines`` cache.
+
+The data file is a header followed by append-only blocks; each block is a
+zlib-compressed msgpack list of ``[line, row]`` pairs, framed by its compressed
+length and CRC32. ``row`` is the msgpack encoding of
+``[translation, tokens, pipeline_version]``, kept as bytes so a lookup only decodes the row it needs. A sidecar ``.idx``
+file holds the sorted 64-bit hashes of every line with the offset of the block
+containing it, plus the data size it covers; opening checks only the last
+indexed frame and whether another one follows it, so an appended or truncated
+data file is re-indexed without scanning the whole file on every start. Lines
+deleted or replaced remotely are recorded in an append-only ``.invalidated``
+sidecar of line hashes (shared by every process serving the snapshot, and kept
+across restarts until the snapshot is exported again).
+
+``LinesSnapshot`` memory-maps both files read-only and serves lookups with a
+binary search over the hashes and a small cache of decompressed blocks; it sits
+in front of the remote table as a warm cache. ``scripts/lines_snapshot.py``
+exports, appends and imports snapshots.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import msgspec
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"GKLS"
+INDEX_MAGIC = b"GKLI"
+VERSION = 2
+HEADER = struct.Struct("<4sI")
+FRAME = struct.Struct("<II")
+INDEX_HEADER = struct.Struct("<4sIQQ")
+BLOCK_ROWS = 64
+
+_encoder = msgspec.msgpack.Encoder()
+_block_decoder = msgspec.msgpack.Decoder(List[Tuple[str, bytes]])
+_row_decoder = msgspec.msgpack.Decoder(Tuple[str, List[Dict[str, Any]], str])
+
+
+def line_hash(line: str) -> int:
+    return int.from_bytes(hashlib.blake2b(line.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def index_path(path: str) -> str:
+    return path + ".idx"
+
+
+def invalidated_path(path: str) -> str:
+    return path + ".invalidated"
+
+
+def _frames(data: bytes | mmap.mmap, start: int = HEADER.size) -> Iterator[Tuple[int, bytes]]:
+    """(offset, compressed payload) of every complete, intact block from ``start``."""
+    offset = start
+    while offset + FRAME.size <= len(data):
+        length, crc = FRAME.unpack_from(data, offset)
+        payload = data[offset + FRAME.size:offset + FRAME.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            logger.warning(f"Lines snapshot: ignoring damaged tail at offset {offset}")
+            return
+        yield offset, payload
+        offset += FRAME.size + length
+
+
+def _decode_block(payload: bytes) -> List[Tuple[str, bytes]]:
+    return _block_decoder.decode(zlib.decompress(payload))
+
+
+def write_index(path: str) -> int:
+    """Scan the data file and write its index; returns the number of rows."""
+    with open(path, "rb") as f:
+        data = f.read()
+    hashes: List[int] = []
+    offsets: List[int] = []
+    end = HEADER.size
+    for offset, payload in _frames(data):
+        for line, _ in _decode_block(payload):
+            hashes.append(line_hash(line))
+            offsets.append(offset)
+        end = offset + FRAME.size + len(payload)
+    order = np.argsort(np.array(hashes, dtype=np.uint64), kind="stable")
+    sorted_hashes = np.array(hashes, dtype=np.uint64)[order]
+    sorted_offsets = np.array(offsets, dtype=np.uint64)[order]
+    tmp = index_path(path) + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, VERSION, len(hashes), end))
+        f.write(sorted_hashes.tobytes())
+        f.write(sorted_offsets.tobytes())
+    os.replace(tmp, index_path(path))
+    return len(hashes)
+
+
+def write_snapshot(path: str, rows: Iterable[Dict[str, Any]], append: bool = False, block_rows: int = BLOCK_ROWS) -> int:
+    """Write ``{'line', 'translation', 'tokens', 'pipeline_version'}`` rows; with ``append``, skip lines already in the file.
+
+    Returns the number of rows written. The index is rebuilt afterwards.
+    """
+    existing: Set[int] = set()
+    if append and os.path.exists(path):
+        snapshot = LinesSnapshot(path)
+        existing = set(snapshot.hashes.tolist())
+        snapshot.close()
+        # drop a damaged tail so new blocks follow the last intact one
+        with open(path, "r+b") as f:
+            data = f.read()
+            end = HEADER.size
+            for offset, payload in _frames(data):
+                end = offset + FRAME.size + len(payload)
+            f.truncate(end)
+        mode = "ab"
+    else:
+        mode = "wb"
+        # a fresh export supersedes earlier invalidations
+        if os.path.exists(invalidated_path(path)):
+            os.remove(invalidated_path(path))
+
+    written = 0
+    with open(path, mode) as f:
+        if mode == "wb":
+            f.write(HEADER.pack(MAGIC, VERSION))
+        block: List[Tuple[str, bytes]] = []
+
+        def flush() -> None:
+            payload = zlib.compress(_encoder.encode(block), 6)
+            f.write(FRAME.pack(len(payload), zlib.crc32(payload)))
+            f.write(payload)
+            block.clear()
+
+        for row in rows:
+            key = line_hash(row["line"])
+            if key in existing:
+                continue
+            existing.add(key)
+            row_bytes = _encoder.encode((row.get("translation") or "", row.get("tokens") or [], row.get("pipeline_version") or ""))
+            block.append((row["line"], row_bytes))
+            written += 1
+            if len(block) >= block_rows:
+                flush()
+        if block:
+            flush()
+    write_index(path)
+    return written
+
+
+def iter_snapshot(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        data = f.read()
+    _check_header(data, path)
+    for _, payload in _frames(data):
+        for line, row in _decode_block(payload):
+            translation, tokens, version = _row_decoder.decode(row)
+            yield {"line": line, "translation": translation, "tokens": tokens, "pipeline_version": version}
+
+
+def _check_header(data: bytes | mmap.mmap, path: str) -> None:
+    if len(data) < HEADER.size or HEADER.unpack_from(data, 0) != (MAGIC, VERSION):
+        raise ValueError(f"{path} is not a version {VERSION} lines snapshot")
+
+
+class LinesSnapshot:
+    """Read-only, memory-mapped view of a snapshot file."""
+
+    def __init__(self, path: str, block_cache_size: int = 256):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "rb")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        _check_header(self._data, path)
+        self._index_file, self._index = self._open_index()
+        count = INDEX_HEADER.unpack_from(self._index, 0)[2]
+        self.hashes = np.frombuffer(self._index, dtype=np.uint64, count=count, offset=INDEX_HEADER.size)
+        self.offsets = np.frombuffer(self._index, dtype=np.uint64, count=count, offset=INDEX_HEADER.size + 8 * count)
+        self._block = lru_cache(maxsize=block_cache_size)(self._load_block)
+        # hashes of invalidated lines, read from the sidecar up to _invalidated_size
+        self._invalidated: Set[int] = set()
+        self._invalidated_size = 0
+        self._invalidated_file: Optional[Any] = None
+        self._read_invalidated()
+        logger.info(f"Lines snapshot mapped: {count} lines from {path}")
+
+    def _open_index(self) -> Tuple[Any, mmap.mmap]:
+        idx = index_path(self.path)
+        for attempt in range(2):
+            if os.path.exists(idx):
+                f = open(idx, "rb")
+                index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, version, count, covered = INDEX_HEADER.unpack_from(index, 0)
+                if (magic, version) == (INDEX_MAGIC, VERSION) and self._covers(index, count, covered):
+                    return f, index
+                index.close()
+                f.close()
+            if attempt == 0:
+                logger.info(f"Lines snapshot index missing or stale, rebuilding {idx}")
+                write_index(self.path)
+        raise ValueError(f"Could not build an index for {self.path}")
+
+    def _covers(self, index: mmap.mmap, count: int, covered: int) -> bool:
+        """Whether an index of ``count`` rows covering ``covered`` bytes matches the data file."""
+        if covered > len(self._data) or len(index) < INDEX_HEADER.size + 16 * count:
+            return False
+        if count:
+            # the last indexed block must be intact and end where the index says
+            last = int(np.frombuffer(index, dtype=np.uint64, count=count, offset=INDEX_HEADER.size + 8 * count).max())
+            frame = next(_frames(self._data, last), None)
+            if frame is None or last + FRAME.size + len(frame[1]) != covered:
+                return False
+        elif covered != HEADER.size:
+            return False
+        # anything intact after it was appended since
+        return next(_frames(self._data, covered), None) is None
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def _load_block(self, offset: int) -> Dict[str, bytes]:
+        length, _ = FRAME.unpack_from(self._data, offset)
+        return dict(_decode_block(self._data[offset + FRAME.size:offset + FRAME.size + length]))
+
+    def get_lines(self, lines: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Rows for the ``lines`` present in the snapshot, shaped like ``LinesRepository.get_lines``."""
+        self._read_invalidated()
+        hashed = [(line, line_hash(line)) for line in dict.fromkeys(lines)]
+        hashed = [(line, key) for line, key in hashed if key not in self._invalidated]
+        if not hashed:
+            return {}
+        unique = [line for line, _ in hashed]
+        keys = np.array([key for _, key in hashed], dtype=np.uint64)
+        starts = np.searchsorted(self.hashes, keys, side="left")
+        ends = np.searchsorted(self.hashes, keys, side="right")
+        rows: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for line, start, end in zip(unique, starts.tolist(), ends.tolist()):
+                # a hash collision puts several blocks in range; the block checks the full line
+                for offset in self.offsets[start:end].tolist():
+                    found = self._block(offset).get(line)
+                    if found is not None:
+                        translation, tokens, version = _row_decoder.decode(found)
+                        rows[line] = {"line": line, "translation": translation, "tokens": tokens, "pipeline_version": version}
+                        break
+            self.hits += len(rows)
+            self.misses += len(unique) - len(rows)
+        return rows
+
+    def _read_invalidated(self) -> None:
+        """Pick up invalidations appended to the sidecar (by this or another process) since the last read."""
+        with self._lock:
+            if self._invalidated_file is None:
+                if not os.path.exists(invalidated_path(self.path)):
+                    return
+                self._open_invalidated()
+            size = os.fstat(self._invalidated_file.fileno()).st_size
+            if size - self._invalidated_size < 8:
+                return
+            self._invalidated_file.seek(self._invalidated_size)
+            data = self._invalidated_file.read((size - self._invalidated_size) // 8 * 8)
+            self._invalidated.update(np.frombuffer(data, dtype="<u8").tolist())
+            self._invalidated_size += len(data)
+
+    def invalidate(self, lines: Iterable[str]) -> None:
+        """Stop serving ``lines`` (they were deleted or replaced remotely), now and after a restart."""
+        keys = [line_hash(line) for line in lines]
+        if not keys:
+            return
+        with self._lock:
+            self._invalidated.update(keys)
+            try:
+                if self._invalidated_file is None:
+                    self._open_invalidated()
+                # one append per call; "a" mode writes at the end even with other processes appending
+                self._invalidated_file.write(np.array(keys, dtype="<u8").tobytes())
+                self._invalidated_file.flush()
+            except OSError as e:
+                logger.error(f"Lines snapshot: could not record {len(keys)} invalidated lines, they may be served after a restart: {e}")
+
+    def _open_invalidated(self) -> None:
+        try:
+            self._invalidated_file = open(invalidated_path(self.path), "a+b")
+        except OSError:
+            # read-only deploy: still honour what was recorded
+            self._invalidated_file = open(invalidated_path(self.path), "rb")
+
+    def stats(self) -> Dict[str, int]:
+        return {"lines": len(self), "hits": self.hits, "misses": self.misses, "invalidated": len(self._invalidated)}
+
+    def close(self) -> None:
+        self._block.cache_clear()
+        del self.hashes, self.offsets
+        self._index.close()
+        self._index_file.close()
+        self._data.close()
+        self._file.close()
+        if self._invalidated_file is not None:
+            self._invalidated_file.close()
+
+
+def open_snapshot(path: Optional[str]) -> Optional[LinesSnapshot]:
+    if not path:
+        return None
+    if not os.path.exists(path):
+        logger.warning(f"Lines snapshot {path} not found, starting without a warm cache")
+        return None
+    try:
+        return LinesSnapshot(path)
+    except ValueError as e:
+        # e.g. a snapshot written by an older release; re-export it
+        logger.warning(f"Lines snapshot unusable, starting without a warm cache: {e}")
+        return None
@@ -1,13 +1,33 @@
 from pathlib import Path
+from functools import lru_cache
 import os
 import logging
 import deepl
+import msgspec
 from jamdict import Jamdict
 from janome.tokenizer import Tokenizer
-from typing import List, Dict, Any, Tuple, cast
-from supabase import create_client, Client
+from typing import List, Dict, Any, Callable, Optional, Tuple, cast
 from app.config import settings
-from app.utils.text_processing import load_kanji_data, extract_unicode_block, CONST_KANJI, is_japanese
+from app.models.results import DefinitionResult, WordEntryResult, KanjiResult, LyricsResult, LineResult, SongStatsResult
+from app.exceptions import DataAccessError
+from app.services.dictionary_index import DictionaryIndex, is_elongation
+from app.services.job_queue import Job, JobQueue, Report
+from app.services.kanji_table import KanjiTable
+from app.services.line_index import LineIndex
+from app.services.lines_repository import LinesRepository
+from app.services.lines_snapshot import open_snapshot
+from app.services.radical_index import RadicalIndex
+from app.services.reprocessor import Reprocessor
+from app.services.segmentation_pool import Segmentation, SegmentationPool
+from app.services.song_stats import SongStatsIndex, song_id
+from app.services.translation_memory import TranslationMemory
+from app.utils.admission import background_heavy_slot, heavy_busy
+from app.utils.furigana import FuriganaAligner, Segment, build_kanji_readings
+from app.utils.serialization import dump_json
+from app.utils.singleflight import SingleFlight
+from app.utils.text_processing import extract_unicode_block, CONST_KANJI, is_japanese
+
+logger = logging.getLogger(__name__)
 
 # Initialize expensive resources
 deepl_client = deepl.DeepLClient(settings.deepl_key)
@@ -25,29 +45,60 @@ else:
 
 jam = Jamdict(db_file=str(db_path))
 print(f"\n✓ Jamdict initialized successfully with: {db_path}", flush=True)
+dictionary_index = DictionaryIndex.build(db_path)
 t = Tokenizer()
-supabase_client: Client = create_client(settings.supabase_url, settings.supabase_key)
-
-# Load kanji data
-kanji_data: Dict[str, Any] = load_kanji_data('kanji.json')
-
-def get_kanji_data(kanji: str) -> Any:
-    if kanji in kanji_data:
-        data = kanji_data[kanji]
-        radicals = jam.krad[kanji]
-        sending_data = {
-            "jlpt_new": data["jlpt_new"],
-            "meanings": data["meanings"],
-            "readings_on": data["readings_on"],
-            "readings_kun": data["readings_kun"],
-            "radicals": radicals
-        }
-        return sending_data
-    else:
-        return None
-
-def get_all_kanji_data(kanji_list: List[str]) -> Dict[str, Any]:
-    all_kanji_data: Dict[str, Any] = {}
+lines_repository = LinesRepository.from_settings()
+lines_snapshot = open_snapshot(settings.lines_snapshot_path)
+line_index = LineIndex(settings.line_index_path, settings.line_index_compact_threshold)
+translation_memory = TranslationMemory(
+    settings.translation_memory_path,
+    fuzzy=settings.translation_memory_fuzzy,
+    min_similarity=settings.translation_memory_min_similarity,
+)
+
+segmentation_pool = SegmentationPool(settings.segmentation_workers, settings.segmentation_threshold)
+
+song_flights: SingleFlight[LyricsResult] = SingleFlight()
+line_flights: SingleFlight[LineResult] = SingleFlight()
+
+# longest token run considered for one (conjugated) word
+MAX_RUN_TOKENS = 6
+
+# bump whenever segmentation, token or ruby output changes; together with the dictionary
+# fingerprint it stamps every cached line, and lines from other versions are recomputed
+SEGMENTER_VERSION = 2
+PIPELINE_VERSION = f"{SEGMENTER_VERSION}-{dictionary_index.version}"
+reprocessor = Reprocessor(
+    lines_repository,
+    PIPELINE_VERSION,
+    lambda rows: refresh_lines(rows),
+    rate=settings.reprocess_rate,
+    batch_size=settings.reprocess_batch_size,
+    interval=settings.reprocess_interval,
+    busy=heavy_busy,
+    lock_path=settings.reprocess_lock_path,
+)
+job_queue = JobQueue(
+    settings.job_queue_path,
+    lambda lyrics, report: run_lyrics_job(lyrics, report),
+    workers=settings.job_workers,
+    max_queued=settings.job_max_queued,
+    retention=settings.job_retention_hours * 3600,
+    slot=background_heavy_slot,
+)
+
+# Load kanji data (served fields only, one shared result per kanji)
+kanji_table = KanjiTable.load('kanji.json', jam.krad.get)
+furigana = FuriganaAligner(build_kanji_readings(kanji_table.results))
+song_stats = SongStatsIndex(kanji_table, settings.song_stats_max_songs)
+# kradfile compiled to radical bitmasks per kanji and kanji bitmaps per radical
+radical_index = RadicalIndex(jam.krad, kanji_table.sort_key)
+
+def get_kanji_data(kanji: str) -> KanjiResult | None:
+    return kanji_table.get(kanji)
+
+def get_all_kanji_data(kanji_list: List[str]) -> Dict[str, KanjiResult | None]:
+    all_kanji_data: Dict[str, KanjiResult | None] = {}
     for kanji in kanji_list:
         data = get_kanji_data(kanji)
         all_kanji_data[kanji] = data
@@ -57,65 +108,52 @@ def tokenize_line(line: str) -> List[Tuple[str, Any]]:
     tokens = t.tokenize(line)
     result: List[Tuple[str, Any]] = []
     for token in tokens:
-        base_form = token.base_form # type: ignore
-        if base_form == '*':
-            base_form = token.surface # type: ignore
         result.append((token.surface, token)) # type: ignore
     return result
 
-def get_word_info(word: str, type: str = "word") -> List[Dict[str, Any]]:
+def get_word_info(word: str, type: str = "word", variants: bool = False) -> List[WordEntryResult]:
     if type == "not_japanese":
-        word_info: List[Dict[str, Any]] = []
-        entry_result = {
-            "idseq": "",
-            "word": word,
-            "furigana": "",
-            "definitions": [{"pos": ["Not Japanese"], "definition": ["Not a Japanese word"]}]
-        }
+        word_info: List[WordEntryResult] = []
+        entry_result = WordEntryResult(
+            idseq="",
+            word=word,
+            furigana="",
+            definitions=[DefinitionResult(pos=["Not Japanese"], definition=["Not a Japanese word"])]
+        )
         word_info.append(entry_result)
         return word_info
     
-    try:
-        result = jam.lookup(word)
-    except Exception:
-        return []
-    word_info: List[Dict[str, Any]] = []
-    for entry in result.entries: 
-        common = False
-        if type == "particle" and not ("conjunction" in entry.senses[0].pos or "particle" in entry.senses[0].pos):
-            continue
-        for kanji in entry.kanji_forms:
-            if kanji.text == word and kanji.pri and "news1" in kanji.pri:
-                common = True
-                break
-        idseq = entry.idseq
-        if entry.kanji_forms:
-            word_text = entry.kanji_forms[0].text
-        else:
-            word_text = entry.kana_forms[0].text
-        furigana = entry.kana_forms[0].text
-        word_properties: List[Dict[str, Any]] = []
-        
-        for sense in entry.senses[:3]:
-            pos = sense.pos
-            definition = [sense_gloss.text for sense_gloss in sense.gloss]
-            word_properties.append({
-                "pos": pos,
-                "definition": definition
-            })
-
-        entry_result = {
-            "idseq": idseq,
-            "word": word_text,
-            "furigana": furigana,
-            "definitions": word_properties
-        }
-        
-        if common:
-            word_info.insert(0, entry_result)
-        else:
-            word_info.append(entry_result)
-    return word_info[:4]
+    if variants:
+        idseqs = dictionary_index.lookup_variant(word, type, edits=settings.dictionary_variant_edits)
+    else:
+        idseqs = dictionary_index.lookup(word, type)
+    return [get_word_entry(idseq) for idseq in idseqs]
+
+def entry_to_result(entry: Any) -> WordEntryResult:
+    if entry.kanji_forms:
+        word_text = entry.kanji_forms[0].text
+    else:
+        word_text = entry.kana_forms[0].text
+    furigana = entry.kana_forms[0].text
+    word_properties: List[DefinitionResult] = []
+    for sense in entry.senses[:3]:
+        pos = sense.pos
+        definition = [sense_gloss.text for sense_gloss in sense.gloss]
+        word_properties.append(DefinitionResult(pos=pos, definition=definition))
+    return WordEntryResult(
+        idseq=entry.idseq,
+        word=word_text,
+        furigana=furigana,
+        definitions=word_properties
+    )
+
+@lru_cache(maxsize=settings.word_entry_cache_size)
+def get_word_entry(idseq: int) -> WordEntryResult:
+    """Build (once) the shared, immutable result for a JMdict entry."""
+    entry = jam.get_entry(idseq)
+    if not entry.kana_forms:
+        raise LookupError(f"No JMdict entry with idseq {idseq}")
+    return entry_to_result(entry)
 
 def process_tokenized_line(line: List[Tuple[str, Any]], word_map: Dict[str, Any]) -> List[str]:
     lyric_line: List[str] = []
@@ -146,27 +184,41 @@ def process_tokenized_line(line: List[Tuple[str, Any]], word_map: Dict[str, Any]
 
         combined_surface = surface
         word_info = get_word_info(token.base_form)
-        j = i + 1
-
-        while j < len(line):
-            next_surface, next_token = line[j]
+        if not word_info:
+            # non-standard lyric spellings: elongated vowels, katakana for hiragana words, ...
+            word_info = get_word_info(surface, variants=True)
+
+        # the run of following tokens that may belong to this word: auxiliaries,
+        # non-independent verbs and conjunctive particles (て, で, ば, ...)
+        run_end = i + 1
+        while run_end < len(line) and run_end - i < MAX_RUN_TOKENS:
+            next_surface, next_token = line[run_end]
             if not is_japanese(next_surface):
                 break
-            
-            # consider the case where the next token is a particle
-            if next_token and "助詞" in next_token.part_of_speech:
+            if next_token and "助詞" in next_token.part_of_speech and "接続助詞" not in next_token.part_of_speech:
                 break
+            run_end += 1
 
-            net_surface = combined_surface + next_surface
-            next_word_info = get_word_info(net_surface)
-
-            if next_word_info:
-                word_info = next_word_info
-                combined_surface = net_surface
-                j += 1
+        # longest run that is a dictionary word or deinflects to one
+        j = i + 1
+        for end in range(run_end, i + 1, -1):
+            net_surface = "".join(s for s, _ in line[i:end])
+            if net_surface in dictionary_index:
+                dictionary_form = net_surface
             else:
+                dictionary_form = dictionary_index.resolve_inflection(net_surface, preferred=token.base_form)
+            if dictionary_form is not None:
+                word_info = get_word_info(dictionary_form)
+                combined_surface = net_surface
+                j = end
                 break
 
+        # following tokens that only elongate this one ("すき" + "ーー", "すき" + "っ"); vowel kana
+        # and repeated syllables are words of their own
+        while word_info and j < len(line) and is_elongation(line[j][0]):
+            combined_surface += line[j][0]
+            j += 1
+
         lyric_line.append(combined_surface)
 
         if combined_surface not in word_map:
@@ -176,6 +228,13 @@ def process_tokenized_line(line: List[Tuple[str, Any]], word_map: Dict[str, Any]
                 
     return lyric_line
 
+def deepl_translate(line: str) -> str:
+    result = deepl_client.translate_text(line, source_lang="JA", target_lang="EN-US")
+    return result.text  # type: ignore
+
+def translate_line(line: str) -> str:
+    return translation_memory.translate(line, deepl_translate)
+
 def translate_lyrics_lines(lyric_lines: List[List[str]]) -> List[Tuple[str, str]]:
     print("Translating lyrics...")
     translated_lines: List[Tuple[str, str]] = []
@@ -188,74 +247,323 @@ def translate_lyrics_lines(lyric_lines: List[List[str]]) -> List[Tuple[str, str]
         if joined_line in [pair[0] for pair in translated_lines]:
             translated_lines.append(next(pair for pair in translated_lines if pair[0] == joined_line))
             continue
-        result = deepl_client.translate_text(joined_line, source_lang="JA", target_lang="EN-US")
-        translated_lines.append((joined_line, result.text)) # type: ignore
+        translated_lines.append((joined_line, translate_line(joined_line)))
     return translated_lines
 
-def process_lyrics(lyrics: str) -> Tuple[List[List[str]], Dict[str, Any], Dict[str, Any], List[Tuple[str, str]]]:
+def segment_line(tokenized_line: List[Tuple[str, Any]]) -> Segmentation:
+    """Words, per-line word map and ruby for a tokenized line (the CPU-bound part of a new line)."""
+    line_word_map: Dict[str, Any] = {}
+    lyric_line = process_tokenized_line(tokenized_line, line_word_map)
+    return lyric_line, line_word_map, furigana.align_line(tokenized_line, lyric_line)
+
+def process_new_line(
+    joined_line: str,
+    tokenized_line: List[Tuple[str, Any]],
+    segmentation: Segmentation | None = None,
+    translation: Optional[str] = None,
+) -> LineResult:
+    """Segment (unless already segmented) and translate (unless ``translation`` is kept from a stale row) a line."""
+    lyric_line, line_word_map, ruby = segmentation or segment_line(tokenized_line)
+    if translation is None:
+        if not lyric_line or not is_japanese(joined_line):
+            translation = joined_line
+        else:
+            translation = translate_line(joined_line)
+    return LineResult(
+        line=joined_line,
+        lyric_line=lyric_line,
+        word_map=line_word_map,
+        translation=translation,
+        tokens=build_tokens_list(lyric_line, line_word_map, ruby),
+        ruby=ruby,
+    )
+
+def process_lyrics(lyrics: str) -> LyricsResult:
+    # identical lyrics submitted concurrently (a trending song) are processed once
+    result, _ = song_flights.do(lyrics, lambda: _process_lyrics(lyrics))
+    return result
+
+def _process_lyrics(lyrics: str) -> LyricsResult:
+    result = empty_lyrics_result(lyrics)
+    index_rows = process_lines_into(result, lyrics.split('\n'))
+    return finish_lyrics(result, index_rows)
+
+def empty_lyrics_result(lyrics: str) -> LyricsResult:
+    return LyricsResult(
+        song_id=song_id(lyrics),
+        lyrics_lines=[],
+        word_map={},
+        kanji_data={},
+        translated_lines=[],
+        ruby_lines=[],
+    )
+
+def process_lines_into(result: LyricsResult, raw_lines: List[str], offload: bool = False) -> List[Dict[str, Any]]:
+    """Process ``raw_lines`` and append them to ``result``; returns their rows for the line index.
+
+    With ``offload`` (background jobs) any uncached lines are segmented on the pool, off the web process' GIL.
+    """
     from app.utils.text_processing import dakuten_check  # import here to avoid circular
-    lines = lyrics.split('\n')
-    lines = dakuten_check(lines)
-    tokenized_lines = [tokenize_line(line) for line in lines]
+    lines = dakuten_check(raw_lines)
+    # repeated lines (choruses) are tokenized once and share the token list
+    tokenized = {line: tokenize_line(line) for line in dict.fromkeys(lines)}
+    tokenized_lines = [tokenized[line] for line in lines]
+    joined = {line: ''.join([surface for surface, _ in tokens]) for line, tokens in tokenized.items()}
+    joined_lines = [joined[line] for line in lines]
+    cached_lines = get_lines_from_db(joined_lines)
+    # lines cached by another dictionary or segmenter version are recomputed (keeping their translation)
+    # (an unmigrated table has no versions: everything cached counts as current)
+    current = {
+        line: row for line, row in cached_lines.items()
+        if row[2] == PIPELINE_VERSION or not lines_repository.versioned
+    }
     
-    word_map: Dict[str, Any] = {}
-    lyric_lines: List[List[str]] = []
-    translated_lines: List[Tuple[str, str]] = []
-    for i, (line, tokenized_line) in enumerate(zip(lines, tokenized_lines)):
-        joined_line = ''.join([surface for surface, _ in tokenized_line])
-        db_data = get_line_from_db(joined_line)
+    # large uploads: segment the uncached lines across the process pool up front
+    segmented: Dict[str, Segmentation] = {}
+    uncached = {joined: line for joined, line in zip(joined_lines, lines) if joined not in current}
+    if segmentation_pool.should_use(len(uncached), 1 if offload else None):
+        results = segmentation_pool.segment(list(uncached.values()))
+        if results is not None:
+            segmented = dict(zip(uncached, results))
+
+    word_map = result.word_map
+    lyric_lines = result.lyrics_lines
+    translated_lines = result.translated_lines
+    ruby_lines = result.ruby_lines
+    processed: Dict[str, LineResult] = {}
+    new_rows: List[Dict[str, Any]] = []
+    refreshed_rows: List[Dict[str, Any]] = []
+    index_rows: List[Dict[str, Any]] = []
+    for joined_line, tokenized_line in zip(joined_lines, tokenized_lines):
+        db_data = current.get(joined_line)
         if db_data:
-            translation, tokens_list = db_data
+            translation, tokens_list, _ = db_data
+            index_rows.append({'line': joined_line, 'tokens': tokens_list})
             translated_lines.append((joined_line, translation))
             lyric_line = [token['token'] for token in tokens_list]
             lyric_lines.append(lyric_line)
+            ruby = [token.get('ruby') for token in tokens_list]
+            if None in ruby:
+                # rows cached before readings were stored
+                ruby = furigana.align_line(tokenized_line, lyric_line)
+            ruby_lines.append(ruby)
             for token in tokens_list:
-                word = token['token']
-                idseqs = token['idseqs']
-                word_info = get_word_info_from_idseqs(idseqs)
-                word_map[word] = word_info
-        else:
-            lyric_line = process_tokenized_line(tokenized_line, word_map)
-            lyric_lines.append(lyric_line)
-            if not lyric_line or not is_japanese(joined_line):
-                translation = joined_line
-            else:
-                result = deepl_client.translate_text(joined_line, source_lang="JA", target_lang="EN-US")
-                translation = result.text  # type: ignore
-            translated_lines.append((joined_line, translation))
-            # prepare tokens_list
-            tokens_list = []
-            for word in lyric_line:
-                if word in word_map and word_map[word]:
-                    # filter out empty/None idseq values and normalize to strings
-                    idseqs = [str(entry.get('idseq')).strip() for entry in word_map[word] if str(entry.get('idseq')).strip()]
-                    tokens_list.append({'token': word, 'idseqs': idseqs})
-            # insert
-            supabase_client.table('lines').insert({'line': joined_line, 'translation': translation, 'tokens': tokens_list}).execute()
+                word_map[token['token']] = word_entries(tuple(token['idseqs']))
+            continue
+
+        # repeated lines (choruses) reuse the first result; concurrent requests share one computation
+        line_result = processed.get(joined_line)
+        if line_result is None:
+            stale = cached_lines.get(joined_line)
+            kept_translation = stale[0] if stale else None
+            line_result, leader = line_flights.do(
+                joined_line,
+                lambda: process_new_line(joined_line, tokenized_line, segmented.get(joined_line), kept_translation),
+            )
+            processed[joined_line] = line_result
+            if leader:
+                (refreshed_rows if stale else new_rows).append(line_row(line_result))
+        index_rows.append({'line': joined_line, 'tokens': line_result.tokens})
+        lyric_lines.append(line_result.lyric_line)
+        ruby_lines.append(line_result.ruby)
+        translated_lines.append((joined_line, line_result.translation))
+        for word, word_info in line_result.word_map.items():
+            word_map.setdefault(word, word_info)
     
-    kanji_list = extract_unicode_block(CONST_KANJI, lyrics)
-    kanji_list = list(set(kanji_list))
-    kanji_data_dict = get_all_kanji_data(kanji_list)
+    if new_rows:
+        try:
+            lines_repository.insert_lines(new_rows)
+        except DataAccessError as e:
+            # the response is already computed; a failed cache write only costs a recompute later
+            logger.error(f"Failed to cache {len(new_rows)} processed lines: {e}")
+    if refreshed_rows:
+        try:
+            save_refreshed_lines(refreshed_rows, {row['line']: cached_lines[row['line']][1] for row in refreshed_rows})
+        except DataAccessError as e:
+            logger.error(f"Failed to update {len(refreshed_rows)} stale cached lines: {e}")
     
-    return lyric_lines, word_map, kanji_data_dict, translated_lines
+    kanji_list = extract_unicode_block(CONST_KANJI, '\n'.join(raw_lines))
+    kanji_list = [kanji for kanji in set(kanji_list) if kanji not in result.kanji_data]
+    result.kanji_data.update(get_all_kanji_data(kanji_list))
+    return index_rows
+
+def finish_lyrics(result: LyricsResult, index_rows: List[Dict[str, Any]]) -> LyricsResult:
+    """Register a fully processed song with the stats and line indexes."""
+    song_stats.add(result.song_id, result)
+    line_index.add_lines(index_rows, song_id=result.song_id)
+    return result
 
-def get_kanji_count() -> int:
-    return len(kanji_data)
+def lines_since(result: LyricsResult, start: int, raw_lines: List[str]) -> LyricsResult:
+    """The part of ``result`` covering its lines from ``start`` on (``raw_lines``), with just their words and kanji."""
+    lyrics_lines = result.lyrics_lines[start:]
+    kanji = extract_unicode_block(CONST_KANJI, '\n'.join(raw_lines))
+    return LyricsResult(
+        song_id=result.song_id,
+        lyrics_lines=lyrics_lines,
+        word_map={word: result.word_map[word] for line in lyrics_lines for word in line if word in result.word_map},
+        kanji_data={k: result.kanji_data[k] for k in kanji if k in result.kanji_data},
+        translated_lines=result.translated_lines[start:],
+        ruby_lines=result.ruby_lines[start:],
+    )
+
+def process_lyrics_job(lyrics: str, report: Callable[[int, int, LyricsResult], None]) -> LyricsResult:
+    """Process lyrics ``settings.job_chunk_lines`` lines at a time, reporting each finished chunk on its own."""
+    lines = lyrics.split('\n')
+    result = empty_lyrics_result(lyrics)
+    index_rows: List[Dict[str, Any]] = []
+    for start in range(0, len(lines), settings.job_chunk_lines):
+        chunk = lines[start:start + settings.job_chunk_lines]
+        before = len(result.lyrics_lines)
+        index_rows.extend(process_lines_into(result, chunk, offload=True))
+        report(start + len(chunk), len(lines), lines_since(result, before, chunk))
+    return finish_lyrics(result, index_rows)
+
+def run_lyrics_job(lyrics: str, report: Report) -> bytes:
+    # only the new chunk is encoded each time, so progress costs O(lines) over the whole job
+    result = process_lyrics_job(lyrics, lambda done, total, chunk: report(done, total, dump_json(chunk)))
+    return dump_json(result)
+
+def submit_lyrics_job(lyrics: str) -> Job:
+    return job_queue.submit(lyrics)
+
+def get_job(job_id: str) -> Job | None:
+    return job_queue.get(job_id)
+
+def get_job_with_partial(job_id: str) -> Job | None:
+    """``get_job``, with the chunks a running job has finished so far joined into one result."""
+    job = job_queue.get(job_id)
+    if job is None or not job.chunks:
+        return job
+    chunks = [msgspec.json.decode(chunk, type=LyricsResult) for _, chunk in job.chunks]
+    partial = LyricsResult(
+        song_id=chunks[0].song_id, lyrics_lines=[], word_map={}, kanji_data={}, translated_lines=[], ruby_lines=[]
+    )
+    for chunk in chunks:
+        partial.lyrics_lines.extend(chunk.lyrics_lines)
+        partial.word_map.update(chunk.word_map)
+        partial.kanji_data.update(chunk.kanji_data)
+        partial.translated_lines.extend(chunk.translated_lines)
+        partial.ruby_lines.extend(chunk.ruby_lines)
+    return job._replace(result=dump_json(partial))
+
+def get_job_queue_stats() -> Dict[str, int]:
+    return job_queue.stats()
 
-def get_line_from_db(line: str) -> Tuple[str, List[Dict[str, Any]]] | None:
-    response = supabase_client.table('lines').select('translation, tokens').eq('line', line).execute()
-    if response.data:
-        data = cast(Dict[str, Any], response.data[0])
-        translation = cast(str, data['translation'])
-        tokens = cast(List[Dict[str, Any]], data['tokens'])
-        return translation, tokens
-    return None
+def get_kanji_count() -> int:
+    return len(kanji_table)
+
+def get_translation_memory_stats() -> Dict[str, int]:
+    return translation_memory.stats()
+
+def search_lines(idseqs: List[int], kanji: str, limit: int, offset: int) -> Tuple[int, List[str], List[str]]:
+    return line_index.search(idseqs, kanji, limit, offset)
+
+def get_radicals() -> List[str]:
+    return radical_index.radicals
+
+def unknown_radicals(radicals: List[str]) -> List[str]:
+    return radical_index.unknown(radicals)
+
+def search_radicals(radicals: List[str], limit: int) -> Tuple[int, List[str], List[str]]:
+    return radical_index.search(radicals, limit)
+
+def get_segmentation_pool_stats() -> Dict[str, int]:
+    return segmentation_pool.stats()
+
+def get_lines_snapshot_stats() -> Dict[str, int] | None:
+    return lines_snapshot.stats() if lines_snapshot is not None else None
+
+def get_line_index_stats() -> Dict[str, int]:
+    return line_index.stats()
+
+def get_pipeline_stats() -> Dict[str, Any]:
+    return {"version": PIPELINE_VERSION, "reprocessor": reprocessor.stats()}
+
+def get_song_stats(song_ids: List[str]) -> List[SongStatsResult | None]:
+    return song_stats.score(song_ids)
+
+def build_tokens_list(
+    lyric_line: List[str], word_map: Dict[str, Any], ruby: List[List[Segment]] | None = None
+) -> List[Dict[str, Any]]:
+    tokens_list: List[Dict[str, Any]] = []
+    for index, word in enumerate(lyric_line):
+        if word in word_map and word_map[word]:
+            # filter out empty/None idseq values and normalize to strings
+            idseqs = [str(entry.idseq).strip() for entry in word_map[word] if str(entry.idseq).strip()]
+            token: Dict[str, Any] = {'token': word, 'idseqs': idseqs}
+            if ruby is not None:
+                token['ruby'] = ruby[index]
+            tokens_list.append(token)
+    return tokens_list
+
+def line_row(line_result: LineResult) -> Dict[str, Any]:
+    """The lines cache row for a processed line, stamped with the current pipeline version."""
+    return {
+        'line': line_result.line,
+        'translation': line_result.translation,
+        'tokens': line_result.tokens,
+        'pipeline_version': PIPELINE_VERSION,
+    }
+
+def save_refreshed_lines(rows: List[Dict[str, Any]], previous: Dict[str, List[Dict[str, Any]]]) -> None:
+    """Replace stale cached rows (whose old tokens are ``previous``) and the local copies derived from them."""
+    lines_repository.upsert_lines(rows)
+    lines = [row['line'] for row in rows]
+    if lines_snapshot is not None:
+        lines_snapshot.invalidate(lines)
+    # re-index under the new tokens, keeping line IDs and song links
+    line_index.reindex_lines(rows, previous)
+
+def refresh_lines(rows: List[Dict[str, Any]]) -> None:
+    """Re-segment cached rows from another pipeline version, keeping their translations (background job)."""
+    refreshed: List[Dict[str, Any]] = []
+    for row in rows:
+        line = row['line']
+        line_result, _ = line_flights.do(
+            line, lambda: process_new_line(line, tokenize_line(line), translation=row['translation'] or line)
+        )
+        refreshed.append(line_row(line_result))
+    save_refreshed_lines(refreshed, {row['line']: row['tokens'] or [] for row in rows})
+
+def check_lines_schema() -> None:
+    """Run at startup: without ``lines.pipeline_version`` serve cached rows unversioned, or refuse to start."""
+    try:
+        versioned = lines_repository.detect_versioning()
+    except DataAccessError as e:
+        logger.error(f"Could not check the lines table for pipeline_version, assuming it exists: {e}")
+        return
+    if versioned:
+        return
+    message = "lines.pipeline_version does not exist (see 'Lines Cache Versioning' in the readme)"
+    if settings.lines_require_pipeline_version:
+        raise RuntimeError(message)
+    logger.warning(
+        f"{message}: cached lines are served as current and never reprocessed until the migration runs"
+    )
+
+def get_line_from_db(line: str) -> Tuple[str, List[Dict[str, Any]], str | None] | None:
+    return get_lines_from_db([line]).get(line)
+
+def get_lines_from_db(lines: List[str]) -> Dict[str, Tuple[str, List[Dict[str, Any]], str | None]]:
+    """Cached ``(translation, tokens, pipeline_version)`` for each line found in the snapshot or the table."""
+    rows = lines_snapshot.get_lines(lines) if lines_snapshot is not None else {}
+    missing = [line for line in lines if line not in rows]
+    if missing:
+        try:
+            rows.update(lines_repository.get_lines(missing))
+        except DataAccessError as e:
+            # the cache is an optimisation: treat an unreachable table as a miss and process from scratch
+            logger.error(f"Failed to read {len(missing)} cached lines: {e}")
+    return {
+        line: (cast(str, row['translation']), cast(List[Dict[str, Any]], row['tokens']), row.get('pipeline_version'))
+        for line, row in rows.items()
+    }
 
 
-def sync_lyrics_lines(original_lyrics: str, modified_lyrics: str) -> Tuple[List[List[str]], Dict[str, Any], Dict[str, Any], List[Tuple[str, str]]]:
+def sync_lyrics_lines(original_lyrics: str, modified_lyrics: str) -> LyricsResult:
     """Compare original and modified lyrics line-by-line and apply deletes/inserts to Supabase.
 
-    This implementation performs client-side delete+insert operations. It assumes `line` is
+    Removed lines are deleted in bulk and new lines inserted in bulk. It assumes `line` is
     the primary key in the `lines` table.
     """
     from app.utils.text_processing import dakuten_check
@@ -271,88 +579,64 @@ def sync_lyrics_lines(original_lyrics: str, modified_lyrics: str) -> Tuple[List[
     orig_lines = dakuten_check(orig_lines)
     mod_lines = dakuten_check(mod_lines)
 
+    removed_lines: List[str] = []
+    added_lines: List[str] = []
     matcher = difflib.SequenceMatcher(None, orig_lines, mod_lines)
     for tag, i1, i2, j1, j2 in matcher.get_opcodes():
         # delete/replace -> remove old lines
         if tag in ("delete", "replace"):
-            for old_line in orig_lines[i1:i2]:
-                try:
-                    supabase_client.table('lines').delete().eq('line', old_line).execute()
-                    deleted += 1
-                except Exception as e:
-                    failed += 1
-                    details.append({"op": "delete", "line": old_line, "error": str(e)})
-
+            removed_lines.extend(orig_lines[i1:i2])
         # insert/replace -> insert new lines
         if tag in ("insert", "replace"):
-            for new_line in mod_lines[j1:j2]:
-                try:
-                    # if it already exists, skip
-                    if get_line_from_db(new_line):
-                        continue
-
-                    tokenized = tokenize_line(new_line)
-                    word_map: Dict[str, Any] = {}
-                    lyric_line = process_tokenized_line(tokenized, word_map)
-                    joined_line = ''.join([surface for surface, _ in tokenized])
-
-                    if not lyric_line or not is_japanese(joined_line):
-                        translation = joined_line
-                    else:
-                        result = deepl_client.translate_text(joined_line, source_lang="JA", target_lang="EN-US")
-                        translation = result.text  # type: ignore
-
-                    tokens_list: List[Dict[str, Any]] = []
-                    for word in lyric_line:
-                        if word in word_map and word_map[word]:
-                            idseqs = [str(entry.get('idseq')).strip() for entry in word_map[word] if str(entry.get('idseq')).strip()]
-                            tokens_list.append({'token': word, 'idseqs': idseqs})
-
-                    supabase_client.table('lines').insert({'line': joined_line, 'translation': translation, 'tokens': tokens_list}).execute()
-                    inserted += 1
-                except Exception as e:
-                    failed += 1
-                    details.append({"op": "insert", "line": new_line, "error": str(e)})
+            added_lines.extend(mod_lines[j1:j2])
+
+    if removed_lines:
+        try:
+            deleted = lines_repository.delete_lines(removed_lines)
+            line_index.remove_lines(removed_lines)
+            if lines_snapshot is not None:
+                lines_snapshot.invalidate(removed_lines)
+        except DataAccessError as e:
+            failed += len(removed_lines)
+            details.append({"op": "delete", "lines": removed_lines, "error": str(e)})
+
+    # skip lines that already exist
+    existing = get_lines_from_db(added_lines) if added_lines else {}
+    new_rows: List[Dict[str, Any]] = []
+    for new_line in dict.fromkeys(added_lines):
+        if new_line in existing:
+            continue
+        try:
+            tokenized = tokenize_line(new_line)
+            joined_line = ''.join([surface for surface, _ in tokenized])
+            line_result, leader = line_flights.do(joined_line, lambda: process_new_line(joined_line, tokenized))
+            if leader:
+                new_rows.append(line_row(line_result))
+        except Exception as e:
+            failed += 1
+            details.append({"op": "insert", "line": new_line, "error": str(e)})
+
+    if new_rows:
+        try:
+            lines_repository.insert_lines(new_rows)
+            inserted += len(new_rows)
+            line_index.add_lines(new_rows)
+        except DataAccessError as e:
+            failed += len(new_rows)
+            details.append({"op": "insert", "lines": [row['line'] for row in new_rows], "error": str(e)})
+
+    logger.info(f"Synced lyrics lines: deleted={deleted} inserted={inserted} failed={failed}")
 
     # After applying DB changes, return the processed representation of the modified lyrics
-    lyric_lines, word_map, kanji_data_dict, translated_lines = process_lyrics(modified_lyrics)
-    return lyric_lines, word_map, kanji_data_dict, translated_lines
-
-def get_word_info_from_idseq(idseq: str) -> Dict[str, Any] | None:
-    result = jam.lookup(idseq)
-    for entry in result.entries:
-        common = False
-        for kanji in entry.kanji_forms:
-            if kanji.pri and "news1" in kanji.pri:
-                common = True
-                break
-        idseq_val = entry.idseq
-        if entry.kanji_forms:
-            word_text = entry.kanji_forms[0].text
-        else:
-            word_text = entry.kana_forms[0].text
-        furigana = entry.kana_forms[0].text
-        word_properties = []
-        for sense in entry.senses[:3]:
-            pos = sense.pos
-            definition = [sense_gloss.text for sense_gloss in sense.gloss]
-            word_properties.append({
-                "pos": pos,
-                "definition": definition
-            })
-        entry_result = {
-            "idseq": idseq_val,
-            "word": word_text,
-            "furigana": furigana,
-            "definitions": word_properties
-        }
-        return entry_result
-    return None
-
-
-
-def get_word_info_from_idseqs(idseqs: List[int]) -> List[Dict[str, Any]]:
-    word_info = []
+    return process_lyrics(modified_lyrics)
+
+@lru_cache(maxsize=settings.word_entry_cache_size)
+def word_entries(idseqs: Tuple[Any, ...]) -> Tuple[WordEntryResult, ...]:
+    """Shared, immutable ``get_word_info_from_idseqs`` result for a cached token's idseqs."""
+    return tuple(get_word_info_from_idseqs(list(idseqs)))
+
+def get_word_info_from_idseqs(idseqs: List[int]) -> List[WordEntryResult]:
+    word_info: List[WordEntryResult] = []
     for idseq in idseqs:
         # Ensure we don't pass empty or invalid idseq values to jam.lookup
         if idseq is None:
@@ -360,12 +644,10 @@ def get_word_info_from_idseqs(idseqs: List[int]) -> List[Dict[str, Any]]:
         idseq_str = str(idseq).strip()
         if not idseq_str:
             continue
-        id = "id#" + idseq_str
         try:
-            entry_result = get_word_info_from_idseq(id)
-        except ValueError:
-            # jam.lookup or downstream code may raise ValueError when id is malformed
+            entry_result = get_word_entry(int(idseq_str))
+        except (ValueError, LookupError):
+            # malformed ids, or ids that are no longer in the dictionary
             continue
-        if entry_result:
-            word_info.append(entry_result)
+        word_info.append(entry_result)
     return word_info[:4] 
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""Radical decomposition and reverse radical search, compiled to bitsets.
+
+Built once at startup from jamdict's kradfile (kanji -> radicals; the radkfile
+is the same relation inverted). Kanji are numbered in dictionary order (stroke
+count first) and radicals by code point, so that:
+
+- each kanji maps to a radical bitmask (``masks``, one bit per radical);
+- each radical maps to a kanji bitmap (a row of ``bitmaps``, one bit per kanji),
+  so the kanji containing every selected radical are the AND of a few rows and
+  come out already ordered;
+- the radicals still selectable after a selection are the OR of the matching
+  kanji's masks, or for large results the radical rows sharing a bit with the
+  result (one vectorised AND over all radicals, whatever the result size).
+"""
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def _pack(matrix: np.ndarray) -> np.ndarray:
+    """Boolean matrix -> rows of little-endian uint64 words (bit ``i`` of a row is column ``i``)."""
+    return np.packbits(matrix, axis=1, bitorder="little").view("<u8")
+
+
+def _bits(words: np.ndarray) -> np.ndarray:
+    """Indices of the set bits in a packed row."""
+    return np.flatnonzero(np.unpackbits(words.view(np.uint8), bitorder="little"))
+
+
+class RadicalIndex:
+    # results up to this size OR their kanji masks; larger ones test every radical row instead
+    mask_or_limit = 512
+
+    def __init__(self, krad: Mapping[str, Sequence[str]], order: Optional[Callable[[str], Any]] = None):
+        self.kanji: List[str] = sorted(krad, key=order)
+        self.radicals: List[str] = sorted({radical for radicals in krad.values() for radical in radicals})
+        self.radical_bits: Dict[str, int] = {radical: bit for bit, radical in enumerate(self.radicals)}
+        radical_bits = self.radical_bits
+        self.decomposition: Dict[str, Tuple[str, ...]] = {kanji: tuple(krad[kanji]) for kanji in self.kanji}
+        self.masks: Dict[str, int] = {
+            kanji: sum(1 << radical_bits[radical] for radical in set(radicals))
+            for kanji, radicals in self.decomposition.items()
+        }
+        self._mask_list = list(self.masks.values())  # by kanji bit
+
+        # padded to whole 64-bit words
+        bitmaps = np.zeros((len(self.radicals), -(-len(self.kanji) // 64) * 64), dtype=bool)
+        for bit, kanji in enumerate(self.kanji):
+            for radical in self.decomposition[kanji]:
+                bitmaps[radical_bits[radical], bit] = True
+        self.bitmaps = _pack(bitmaps)
+
+    def __len__(self) -> int:
+        return len(self.kanji)
+
+    def unknown(self, radicals: Iterable[str]) -> List[str]:
+        return [radical for radical in radicals if radical not in self.radical_bits]
+
+    def search(self, radicals: Iterable[str], limit: Optional[int] = None) -> Tuple[int, List[str], List[str]]:
+        """(number of kanji containing every radical, the first ``limit`` of them, radicals those kanji also contain)."""
+        rows = [self.radical_bits[radical] for radical in dict.fromkeys(radicals)]
+        if not rows:
+            raise ValueError("Give at least one radical")
+        hits = np.bitwise_and.reduce(self.bitmaps[rows], axis=0)
+        found = _bits(hits)
+        if not len(found):
+            return 0, [], []
+        if len(found) <= self.mask_or_limit:
+            mask = 0
+            for bit in found.tolist():
+                mask |= self._mask_list[bit]
+            compatible = [self.radicals[bit] for bit, flag in enumerate(reversed(bin(mask)[2:])) if flag == "1"]
+        else:
+            compatible = [self.radicals[bit] for bit in np.flatnonzero((self.bitmaps & hits).any(axis=1)).tolist()]
+        return len(found), [self.kanji[bit] for bit in found[:limit].tolist()], compatible
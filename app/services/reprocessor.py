@@ -0,0 +1,178 @@
+"""Background refresh of lines cached by an older processing pipeline.
+
+Every cached line is stamped with the pipeline version (segmenter version plus
+dictionary fingerprint) it was processed with. Requests recompute stale lines
+they touch; this worker drains the rest so that a dictionary or segmenter
+upgrade does not leave the whole cache to be recomputed on the request path.
+
+It pages through stale rows (``pipeline_version`` null or different), hands
+them to ``refresh`` in small batches and throttles itself: at most ``rate``
+lines per second, and it waits while ``busy()`` reports foreground load.
+Translations are kept, so refreshing never calls DeepL.
+
+Only one process per host runs it: ``start`` takes a non-blocking lock on
+``lock_path`` and the other worker processes stay on standby. If the table
+has no ``pipeline_version`` column yet, it disables itself once with a
+warning instead of failing every pass.
+"""
+import logging
+import threading
+import time
+from typing import IO, Any, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: local development only, nothing to coordinate
+    fcntl = None  # type: ignore[assignment]
+
+from app.exceptions import DataAccessError
+from app.services.lines_repository import LinesRepository
+
+logger = logging.getLogger(__name__)
+
+Rows = List[Dict[str, Any]]
+
+
+class Reprocessor:
+    def __init__(
+        self,
+        repository: LinesRepository,
+        version: str,
+        refresh: Callable[[Rows], Any],
+        *,
+        rate: float = 20.0,
+        batch_size: int = 50,
+        interval: float = 600.0,
+        busy: Optional[Callable[[], bool]] = None,
+        busy_wait: float = 1.0,
+        lock_path: str = "",
+    ):
+        self.repository = repository
+        self.version = version
+        self.refresh = refresh
+        self.rate = rate
+        self.batch_size = batch_size
+        self.interval = interval
+        self.busy = busy or (lambda: False)
+        self.busy_wait = busy_wait
+        self.lock_path = lock_path
+        self.state = "stopped"
+        self.passes = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.paused = 0.0
+        self.last_pass: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock: Optional[IO[str]] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        if not self._acquire_lock():
+            self.state = "standby"
+            logger.info(f"Reprocessor already running in another process ({self.lock_path} is locked)")
+            return
+        self._stop.clear()
+        self.state = "running"
+        self._thread = threading.Thread(target=self._run, name="lines-reprocessor", daemon=True)
+        self._thread.start()
+
+    def _acquire_lock(self) -> bool:
+        if not self.lock_path or fcntl is None:
+            return True
+        handle = open(self.lock_path, "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._lock = handle
+        return True
+
+    def _run(self) -> None:
+        checked = False
+        # repeat: instances still running the old version may cache stale lines during a rollout
+        while not self._stop.is_set():
+            try:
+                if not checked:
+                    if not self.repository.detect_versioning():
+                        self.state = "disabled: lines.pipeline_version column missing"
+                        logger.warning(
+                            "lines.pipeline_version does not exist (see 'Lines Cache Versioning' in the readme); "
+                            "background reprocessing disabled"
+                        )
+                        return
+                    checked = True
+                self.run_pass()
+            except DataAccessError as e:
+                logger.error(f"Reprocessing pass aborted: {e}")
+            self._stop.wait(self.interval)
+
+    def _stale_filters(self) -> List[Dict[str, str]]:
+        # PostgREST's neq never matches null, so rows from before versioning need their own query
+        return [{"pipeline_version": "is.null"}, {"pipeline_version": f"neq.{self.version}"}]
+
+    def run_pass(self) -> int:
+        """Refresh every stale row once; returns the number refreshed."""
+        refreshed = 0
+        for filters in self._stale_filters():
+            batch: Rows = []
+            for row in self.repository.iter_lines(self.batch_size, filters):
+                if self._stop.is_set():
+                    return refreshed
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    refreshed += self._refresh_batch(batch)
+                    batch = []
+            if batch:
+                refreshed += self._refresh_batch(batch)
+        self.passes += 1
+        self.last_pass = time.time()
+        if refreshed:
+            logger.info(f"Reprocessing pass refreshed {refreshed} lines to pipeline {self.version}")
+        return refreshed
+
+    def _refresh_batch(self, batch: Rows) -> int:
+        while self.busy() and not self._stop.is_set():
+            self.paused += self.busy_wait
+            self._stop.wait(self.busy_wait)
+        if self._stop.is_set():
+            return 0
+        started = time.monotonic()
+        try:
+            self.refresh(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Failed to refresh {len(batch)} stale lines: {e}")
+            return 0
+        self.refreshed += len(batch)
+        # spread the batches out to stay under `rate` lines per second
+        self._stop.wait(max(0.0, len(batch) / self.rate - (time.monotonic() - started)))
+        return len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "state": self.state,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "passes": self.passes,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "paused_seconds": round(self.paused, 1),
+            "last_pass": self.last_pass,
+        }
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+        self.state = "stopped"
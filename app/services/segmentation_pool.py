@@ -0,0 +1,121 @@
+"""Process pool for segmenting the uncached lines of very large uploads.
+
+Tokenizing and segmenting is CPU-bound Python, so a pasted album keeps one core
+busy for the whole request. Above a size threshold the uncached lines are split
+into chunks and segmented on a bounded pool of worker processes. Workers are
+forked at startup (``start``), before the server has spawned any threads, so
+they inherit the loaded tokenizer, dictionary index and kanji tables
+copy-on-write instead of building their own. Workers only segment; translation
+and caching stay in the parent, and chunk results come back in input order so
+the merged song is identical to sequential processing.
+
+The pool is never re-forked once the server runs threads (a fork can inherit a
+lock held by another thread and deadlock): if it breaks, large uploads are
+segmented in-process until the next restart.
+"""
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Segmentation = Tuple[List[str], Dict[str, Any], List[List[Tuple[str, str]]]]
+
+
+def _init_worker() -> None:
+    # a no-op for forked workers; loads tokenizer and dictionaries where fork is unavailable
+    from app.services import lyrics_service  # noqa: F401
+
+
+def _ready(_: int) -> int:
+    return os.getpid()
+
+
+def _segment_chunk(lines: List[str]) -> List[Segmentation]:
+    from app.services import lyrics_service
+    return [lyrics_service.segment_line(lyrics_service.tokenize_line(line)) for line in lines]
+
+
+class SegmentationPool:
+    def __init__(self, workers: int, threshold: int, min_chunk: int = 16):
+        self.workers = max(0, min(workers, os.cpu_count() or 1)) if workers else 0
+        self.threshold = threshold
+        self.min_chunk = min_chunk
+        self.batches = 0
+        self.failures = 0
+        self.broken = False
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def should_use(self, line_count: int, threshold: Optional[int] = None) -> bool:
+        # only once started, and until it breaks
+        return self._executor is not None and line_count >= (self.threshold if threshold is None else threshold)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(method),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def start(self) -> None:
+        """Fork the workers now, while the process is still single-threaded, and wait for them."""
+        if not self.enabled:
+            return
+        executor = self._get_executor()
+        # segment() only uses this executor, so no fork ever happens after startup
+        try:
+            pids = set(executor.map(_ready, range(self.workers)))
+        except BrokenProcessPool as e:
+            self._break(e)
+            return
+        logger.info(f"Segmentation pool ready: {len(pids)} workers")
+
+    def segment(self, lines: List[str]) -> List[Segmentation] | None:
+        """Segment ``lines`` across the pool, in order; None if the pool failed (caller falls back)."""
+        executor = self._executor
+        if executor is None:
+            return None
+        size = max(self.min_chunk, math.ceil(len(lines) / self.workers))
+        chunks = [lines[i:i + size] for i in range(0, len(lines), size)]
+        try:
+            results = list(executor.map(_segment_chunk, chunks))
+        except BrokenProcessPool as e:
+            self._break(e)
+            return None
+        self.batches += 1
+        return [segmentation for chunk in results for segmentation in chunk]
+
+    def _break(self, error: Exception) -> None:
+        self.failures += 1
+        self.broken = True
+        logger.error(f"Segmentation pool broke, segmenting in-process until restart: {error}")
+        self.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "threshold": self.threshold,
+            "batches": self.batches,
+            "failures": self.failures,
+            "broken": int(self.broken),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
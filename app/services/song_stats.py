@@ -0,0 +1,176 @@
+"""Song-level difficulty statistics over a columnar kanji/word index.
+
+Kanji attributes (JLPT level, strokes, frequency, grade) come from the
+columns of the ``KanjiTable``; word attributes (JLPT level of the hardest kanji in the headword) live in
+NumPy columns addressed by integer row IDs. Every processed song is encoded
+once into small integer arrays of kanji and word rows, so scoring a batch of
+songs is a handful of gathers and ``np.bincount`` histograms instead of walking
+``word_map``/``kanji_data`` dicts per request.
+
+JLPT levels are stored as ``jlpt_new`` (1 = N1 ... 5 = N5), with 0 meaning no
+level.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from app.models.results import LyricsResult, SongStatsResult
+from app.services.kanji_table import KanjiTable
+from app.utils.text_processing import is_japanese
+
+JLPT_LEVELS = 6
+LEVEL_NAMES = ("none", "N1", "N2", "N3", "N4", "N5")
+
+
+def song_id(lyrics: str) -> str:
+    return hashlib.sha1(lyrics.encode("utf-8")).hexdigest()[:16]
+
+
+class WordColumns:
+    """Columns for dictionary entries, keyed by idseq and grown as songs introduce them."""
+
+    def __init__(self, kanji: KanjiTable, capacity: int = 4096):
+        self._kanji = kanji
+        self.rows: Dict[int, int] = {}
+        self.level = np.zeros(capacity, dtype=np.int8)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def row(self, idseq: int, headword: str) -> int:
+        row = self.rows.get(idseq)
+        if row is not None:
+            return row
+        with self._lock:
+            row = self.rows.get(idseq)
+            if row is None:
+                row = len(self.rows)
+                if row == len(self.level):
+                    self.level = np.concatenate([self.level, np.zeros_like(self.level)])
+                self.level[row] = self._kanji.level_of(headword)
+                self.rows[idseq] = row
+        return row
+
+
+class SongVector(NamedTuple):
+    kanji_rows: np.ndarray  # distinct kanji of the song
+    word_rows: np.ndarray  # one per Japanese word token, -1 when the word is not in the dictionary
+    lines: int
+    unique_words: int
+    japanese_chars: int
+    kanji_chars: int
+
+
+class SongStatsIndex:
+    """Bounded store of encoded songs, scored in vectorized batches."""
+
+    def __init__(self, kanji: KanjiTable, max_songs: int = 100000):
+        self.kanji = kanji
+        self.words = WordColumns(self.kanji)
+        self.max_songs = max_songs
+        self._songs: "OrderedDict[str, SongVector]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._songs)
+
+    def encode(self, result: LyricsResult) -> SongVector:
+        word_rows: List[int] = []
+        japanese_chars = 0
+        kanji_chars = 0
+        for line in result.lyrics_lines:
+            for word in line:
+                if not is_japanese(word):
+                    continue
+                japanese_chars += len(word)
+                kanji_chars += sum(1 for c in word if c in self.kanji.rows)
+                entries = result.word_map.get(word)
+                if entries and str(entries[0].idseq).isdigit():
+                    word_rows.append(self.words.row(int(entries[0].idseq), entries[0].word))
+                else:
+                    word_rows.append(-1)
+        kanji_rows = sorted(self.kanji.rows[k] for k in result.kanji_data if k in self.kanji.rows)
+        return SongVector(
+            kanji_rows=np.array(kanji_rows, dtype=np.int32),
+            word_rows=np.array(word_rows, dtype=np.int32),
+            lines=len(result.lyrics_lines),
+            unique_words=len(set(word_rows) - {-1}),
+            japanese_chars=japanese_chars,
+            kanji_chars=kanji_chars,
+        )
+
+    def add(self, song: str, result: LyricsResult) -> None:
+        vector = self.encode(result)
+        with self._lock:
+            self._songs[song] = vector
+            self._songs.move_to_end(song)
+            while len(self._songs) > self.max_songs:
+                self._songs.popitem(last=False)
+
+    def get(self, song: str) -> Optional[SongVector]:
+        return self._songs.get(song)
+
+    def score(self, songs: Sequence[str]) -> List[Optional[SongStatsResult]]:
+        """Stats for each song ID, None for songs that have not been processed (or were evicted)."""
+        found = [(i, self._songs.get(song)) for i, song in enumerate(songs)]
+        found = [(i, vector) for i, vector in found if vector is not None]
+        results: List[Optional[SongStatsResult]] = [None] * len(songs)
+        if not found:
+            return results
+        vectors = [vector for _, vector in found]
+        n = len(vectors)
+        word_level = self.words.level
+
+        # kanji: gather per-row attributes, then per-song histograms and sums
+        kanji_counts = np.array([len(v.kanji_rows) for v in vectors])
+        kanji_rows = np.concatenate([v.kanji_rows for v in vectors])
+        kanji_song = np.repeat(np.arange(n), kanji_counts)
+        kanji_jlpt = np.bincount(
+            kanji_song * JLPT_LEVELS + self.kanji.jlpt[kanji_rows], minlength=n * JLPT_LEVELS
+        ).reshape(n, JLPT_LEVELS)
+        strokes = np.bincount(kanji_song, weights=self.kanji.strokes[kanji_rows], minlength=n)
+        kanji_freq = self.kanji.freq[kanji_rows]
+        freq_sum = np.bincount(kanji_song, weights=kanji_freq, minlength=n)
+        freq_count = np.bincount(kanji_song, weights=kanji_freq > 0, minlength=n)
+
+        # words: unknown tokens count separately, known ones by level
+        word_counts = np.array([len(v.word_rows) for v in vectors])
+        word_rows = np.concatenate([v.word_rows for v in vectors])
+        word_song = np.repeat(np.arange(n), word_counts)
+        known = word_rows >= 0
+        levels = word_level[word_rows[known]]
+        known_song = word_song[known]
+        word_jlpt = np.bincount(
+            known_song * JLPT_LEVELS + levels, minlength=n * JLPT_LEVELS
+        ).reshape(n, JLPT_LEVELS)
+        unknown = np.bincount(word_song[~known], minlength=n)
+        # difficulty: mean of 6 - level over words that have a level (N5 -> 1 ... N1 -> 5)
+        leveled = levels > 0
+        hardness = np.bincount(known_song[leveled], weights=JLPT_LEVELS - levels[leveled], minlength=n)
+        leveled_count = np.bincount(known_song[leveled], minlength=n)
+
+        for k, (i, vector) in enumerate(found):
+            words = int(word_counts[k])
+            kanji_count = int(kanji_counts[k])
+            results[i] = SongStatsResult(
+                song_id=songs[i],
+                lines=vector.lines,
+                words=words,
+                unique_words=vector.unique_words,
+                unknown_word_ratio=float(unknown[k] / words) if words else 0.0,
+                kanji=kanji_count,
+                kanji_density=vector.kanji_chars / vector.japanese_chars if vector.japanese_chars else 0.0,
+                kanji_jlpt=dict(zip(LEVEL_NAMES, kanji_jlpt[k].tolist())),
+                word_jlpt=dict(zip(LEVEL_NAMES, word_jlpt[k].tolist())),
+                mean_kanji_strokes=float(strokes[k] / kanji_count) if kanji_count else 0.0,
+                mean_kanji_frequency=float(freq_sum[k] / freq_count[k]) if freq_count[k] else 0.0,
+                difficulty=float(hardness[k] / leveled_count[k]) if leveled_count[k] else 0.0,
+            )
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        return {"songs": len(self._songs), "kanji": len(self.kanji), "words": len(self.words)}
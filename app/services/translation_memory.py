@@ -0,0 +1,149 @@
+"""Local translation memory in front of DeepL.
+
+Translations are stored in a small SQLite file keyed on a normalized form of the
+line (width-folded, punctuation and spacing removed, repeated interjections
+collapsed), so near-identical lyric lines reuse an earlier translation instead
+of spending DeepL quota. An optional character n-gram similarity search reuses
+translations of lines that are merely close.
+
+The file uses WAL with ``synchronous=NORMAL``: every translation is committed
+(and survives the process dying) without request threads queueing behind a disk
+sync each. A failed write is logged and the translation is still kept in memory:
+it has already been paid for.
+"""
+import logging
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+from typing import Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+INTERJECTIONS = (
+    "ああ", "あぁ", "ねえ", "ねぇ", "ねー", "おお", "おぉ", "ええ", "うう", "はあ", "はぁ",
+    "ほら", "さあ", "やあ", "oh", "ah", "yeah", "la", "na",
+)
+_REPEATED_INTERJECTION = re.compile("(" + "|".join(map(re.escape, INTERJECTIONS)) + r")\1+")
+_REPEATED_CHAR = re.compile(r"(.)\1{2,}")
+NGRAM = 3
+
+
+def normalize_line(text: str) -> str:
+    """Key used to decide whether two lines should share a translation."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(c for c in text if not unicodedata.category(c).startswith(("P", "S", "Z", "C")))
+    text = _REPEATED_CHAR.sub(r"\1\1", text)
+    return _REPEATED_INTERJECTION.sub(r"\1", text)
+
+
+def ngrams(key: str) -> Set[str]:
+    if len(key) <= NGRAM:
+        return {key}
+    return {key[i:i + NGRAM] for i in range(len(key) - NGRAM + 1)}
+
+
+class TranslationMemory:
+    def __init__(self, path: str, *, fuzzy: bool = False, min_similarity: float = 0.9):
+        self.fuzzy = fuzzy
+        self.min_similarity = min_similarity
+        self.store_errors = 0
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.chars_saved = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # commits reach the OS without an fsync each; only an OS crash can lose the last few
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "key TEXT PRIMARY KEY, source TEXT NOT NULL, translation TEXT NOT NULL)"
+        )
+        self._memory: Dict[str, str] = dict(self._conn.execute("SELECT key, translation FROM translations"))
+        self._grams: Dict[str, Set[str]] = {}
+        if fuzzy:
+            for key in self._memory:
+                self._index(key)
+        logger.info(f"Translation memory loaded: {len(self._memory)} entries from {path}")
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _index(self, key: str) -> None:
+        for gram in ngrams(key):
+            self._grams.setdefault(gram, set()).add(key)
+
+    def _nearest(self, key: str) -> Optional[Tuple[str, float]]:
+        grams = ngrams(key)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._grams.get(gram, ()))
+        best: Optional[Tuple[str, float]] = None
+        for candidate, overlap in shared.items():
+            # Dice coefficient over n-gram sets
+            score = 2 * overlap / (len(grams) + len(ngrams(candidate)))
+            if score >= self.min_similarity and (best is None or score > best[1]):
+                best = (candidate, score)
+        return best
+
+    def lookup(self, line: str) -> Optional[str]:
+        key = normalize_line(line)
+        if not key:
+            return None
+        with self._lock:
+            translation = self._memory.get(key)
+            if translation is not None:
+                self.hits += 1
+                self.chars_saved += len(line)
+                return translation
+            if self.fuzzy:
+                nearest = self._nearest(key)
+                if nearest:
+                    self.fuzzy_hits += 1
+                    self.chars_saved += len(line)
+                    return self._memory[nearest[0]]
+            self.misses += 1
+        return None
+
+    def store(self, line: str, translation: str) -> None:
+        key = normalize_line(line)
+        if not key:
+            return
+        with self._lock:
+            if key not in self._memory and self.fuzzy:
+                self._index(key)
+            self._memory[key] = translation
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (key, source, translation) VALUES (?, ?, ?)",
+                (key, line, translation),
+            )
+            self._conn.commit()
+
+    def translate(self, line: str, translate_fn: Callable[[str], str]) -> str:
+        translation = self.lookup(line)
+        if translation is None:
+            translation = translate_fn(line)
+            try:
+                self.store(line, translation)
+            except sqlite3.Error as e:
+                # e.g. "database is locked": still serve (and remember in memory) what DeepL returned
+                self.store_errors += 1
+                logger.error(f"Failed to persist a translation: {e}")
+        return translation
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+            "chars_saved": self.chars_saved,
+            "store_errors": self.store_errors,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,235 @@
+"""Admission control for expensive endpoints.
+
+Each endpoint class ("heavy" lyrics processing, "light" lookups, "stream" job
+event streams) gets its own concurrency limit and bounded wait queue, plus a
+per-client token bucket.
+Requests over either limit are rejected immediately with 429/503 and a
+``Retry-After`` header instead of piling up behind the single worker.
+Background jobs hold a heavy slot while they run (``background_heavy_slot``),
+so they count against the same limit as heavy requests.
+"""
+import asyncio
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from app.config import settings
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """Take one token; returns 0 on success, otherwise seconds until one is available."""
+        # ``now`` may predate a bucket created just after it was read
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(now, self.updated)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-client token buckets, with idle buckets dropped once ``max_clients`` is hit."""
+
+    def __init__(self, per_minute: float, burst: int, max_clients: int = 10000):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def check(self, client: str) -> float:
+        if self.rate <= 0:
+            # a rate of 0 means unlimited
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                if len(self._buckets) >= self.max_clients:
+                    self._evict(now)
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+            return bucket.take(now)
+
+    def _evict(self, now: float) -> None:
+        # a bucket that has refilled completely carries no state worth keeping
+        full = self.burst / self.rate
+        for client, bucket in list(self._buckets.items()):
+            if now - bucket.updated >= full:
+                del self._buckets[client]
+        if len(self._buckets) >= self.max_clients:
+            self._buckets.clear()
+
+
+class AdmissionGate:
+    """Concurrency limit with a bounded queue; excess requests fail fast."""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _reject(self, reason: str) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(
+            status_code=503,
+            detail=f"Server busy ({reason}), retry later",
+            headers={"Retry-After": str(math.ceil(settings.admission_retry_after))},
+        )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if not self._semaphore.locked():
+            # uncontended: acquiring completes without suspending
+            await self._semaphore.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                raise self._reject(f"{self.name} queue full")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._reject(f"{self.name} queue timeout")
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def ensure_free(self) -> None:
+        """Reject now (503) if a ``slot()`` taken next would have to wait and the queue is full."""
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise self._reject(f"{self.name} queue full")
+
+    async def acquire_background(self) -> None:
+        # background work waits as long as it takes and is not counted as a queued request
+        await self._semaphore.acquire()
+        self.active += 1
+
+    def release_background(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+def client_id(request: Request) -> str:
+    if settings.trust_forwarded_for and settings.trusted_proxy_count > 0:
+        forwarded = request.headers.get("x-forwarded-for")
+        hops = [hop.strip() for hop in forwarded.split(",")] if forwarded else []
+        # each trusted proxy appends the address it was connected from; anything left of those is client-supplied
+        if len(hops) >= settings.trusted_proxy_count and hops[-settings.trusted_proxy_count]:
+            return hops[-settings.trusted_proxy_count]
+    return request.client.host if request.client else "unknown"
+
+
+ENDPOINT_CLASSES: Dict[str, Tuple[AdmissionGate, RateLimiter]] = {
+    "heavy": (
+        AdmissionGate("heavy", settings.heavy_max_concurrency, settings.heavy_max_queue, settings.heavy_queue_timeout),
+        RateLimiter(settings.heavy_rate_per_minute, settings.heavy_rate_burst),
+    ),
+    "light": (
+        AdmissionGate("light", settings.light_max_concurrency, settings.light_max_queue, settings.light_queue_timeout),
+        RateLimiter(settings.light_rate_per_minute, settings.light_rate_burst),
+    ),
+}
+# a stream holds its slot until the client disconnects, so it never waits for one and counts against the light rate
+ENDPOINT_CLASSES["stream"] = (
+    AdmissionGate("stream", settings.job_max_streams, 0, 0.0),
+    ENDPOINT_CLASSES["light"][1],
+)
+
+
+def _check_rate(limiter: RateLimiter, request: Request) -> None:
+    wait = limiter.check(client_id(request))
+    if wait:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+
+def admit(endpoint_class: str) -> Callable[[Request], AsyncIterator[None]]:
+    """FastAPI dependency enforcing the rate limit and concurrency gate for ``endpoint_class``."""
+    gate, limiter = ENDPOINT_CLASSES[endpoint_class]
+
+    async def dependency(request: Request) -> AsyncIterator[None]:
+        _check_rate(limiter, request)
+        async with gate.slot():
+            yield
+
+    return dependency
+
+
+def admit_stream(request: Request) -> AdmissionGate:
+    """FastAPI dependency for streaming routes: checks the rate limit and that a stream slot is free.
+
+    The route takes the slot itself with ``gate.slot()`` inside its body generator. Depending on the FastAPI
+    version, a yield dependency may exit before a streamed body is sent, so the slot can't be held there.
+    """
+    gate, limiter = ENDPOINT_CLASSES["stream"]
+    _check_rate(limiter, request)
+    gate.ensure_free()
+    return gate
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def attach_loop(loop: asyncio.AbstractEventLoop) -> None:
+    """Let worker threads take slots on the server's event loop (call at startup)."""
+    global _loop
+    _loop = loop
+
+
+@contextmanager
+def background_heavy_slot() -> Iterator[None]:
+    """Hold a heavy slot from a worker thread while background work runs (a no-op without a server loop)."""
+    gate, _ = ENDPOINT_CLASSES["heavy"]
+    loop = _loop
+    if loop is None or loop.is_closed():
+        yield
+        return
+    asyncio.run_coroutine_threadsafe(gate.acquire_background(), loop).result()
+    try:
+        yield
+    finally:
+        loop.call_soon_threadsafe(gate.release_background)
+
+
+def admission_stats() -> Dict[str, Dict[str, int]]:
+    return {name: gate.stats() for name, (gate, _) in ENDPOINT_CLASSES.items()}
+
+
+def heavy_busy() -> bool:
+    """True while a heavy request or job is running, or a request is queued (background work should yield)."""
+    gate, _ = ENDPOINT_CLASSES["heavy"]
+    return gate.active > 0 or gate.waiting > 0
@@ -0,0 +1,204 @@
+"""Rule-based deinflection of Japanese verbs and adjectives.
+
+Maps an inflected surface ("覚めたら", "食べさせられなかった", "高くない") to
+candidate dictionary forms without touching the dictionary. Each rule strips an
+inflected suffix and restores the dictionary ending; rules carry an input mask
+(which word classes the inflected form may belong to) and an output class, so
+they chain: "食べなかった" -> "食べない" (adj-i) -> "食べる" (ichidan).
+
+Candidates still have to be validated against the dictionary index, with the
+word class recorded there (see ``pos_class``).
+"""
+from typing import Dict, List, NamedTuple, Tuple
+
+# word classes; TE is internal (a bare te-form) and never appears in the dictionary
+V1 = 1 << 0
+V5 = 1 << 1
+VK = 1 << 2
+VS = 1 << 3
+ADJ_I = 1 << 4
+TE = 1 << 5
+DICTIONARY_CLASSES = V1 | V5 | VK | VS | ADJ_I
+ANY = DICTIONARY_CLASSES | TE
+
+MAX_DEPTH = 6
+
+
+def pos_class(pos: str) -> int:
+    """Word class bit for a JMdict part-of-speech description (0 if not inflectable)."""
+    if pos.startswith("Ichidan verb"):
+        return V1
+    if pos.startswith("Godan verb"):
+        return V5
+    if pos.startswith("Kuru verb"):
+        return VK
+    if pos.startswith("suru verb") or "takes the aux. verb suru" in pos:
+        return VS
+    if pos.startswith("adjective (keiyoushi)"):
+        return ADJ_I
+    return 0
+
+
+class Rule(NamedTuple):
+    suffix: str
+    ending: str
+    in_mask: int
+    out_class: int
+    reason: str
+
+
+class Deinflection(NamedTuple):
+    word: str
+    word_class: int
+    reasons: Tuple[str, ...]
+
+
+# godan dictionary ending -> (a-stem, i-stem, e-stem, o-stem, te-form, ta-form)
+GODAN = {
+    "う": ("わ", "い", "え", "お", "って", "った"),
+    "く": ("か", "き", "け", "こ", "いて", "いた"),
+    "ぐ": ("が", "ぎ", "げ", "ご", "いで", "いだ"),
+    "す": ("さ", "し", "せ", "そ", "して", "した"),
+    "つ": ("た", "ち", "て", "と", "って", "った"),
+    "ぬ": ("な", "に", "ね", "の", "んで", "んだ"),
+    "ぶ": ("ば", "び", "べ", "ぼ", "んで", "んだ"),
+    "む": ("ま", "み", "め", "も", "んで", "んだ"),
+    "る": ("ら", "り", "れ", "ろ", "って", "った"),
+}
+POLITE = ("ます", "ました", "ません", "ませんでした", "ましょう", "まして")
+
+
+def _verb_rules(ending: str, cls: int, a: str, i: str, e: str, o: str, te: str, ta: str,
+                potential: str, passive: str, causative: str, imperatives: Tuple[str, ...],
+                volitional: str, conditional: str) -> List[Rule]:
+    rules = [
+        Rule(ta, ending, ANY, cls, "past"),
+        Rule(te, ending, ANY, cls, "te"),
+        Rule(ta + "ら", ending, ANY, cls, "-tara"),
+        Rule(ta + "り", ending, ANY, cls, "-tari"),
+        Rule(a + "ない", ending, ADJ_I, cls, "negative"),
+        Rule(a + "ず", ending, ANY, cls, "-zu"),
+        Rule(a + "ずに", ending, ANY, cls, "-zuni"),
+        Rule(a + "ん", ending, ANY, cls, "negative (colloquial)"),
+        Rule(i + "たい", ending, ADJ_I, cls, "-tai"),
+        Rule(i + "ながら", ending, ANY, cls, "-nagara"),
+        Rule(volitional, ending, ANY, cls, "volitional"),
+        Rule(conditional, ending, ANY, cls, "-ba"),
+        Rule(potential, ending, V1, cls, "potential"),
+        Rule(passive, ending, V1, cls, "passive"),
+        Rule(causative, ending, V1, cls, "causative"),
+    ]
+    rules += [Rule(i + polite, ending, ANY, cls, "polite") for polite in POLITE]
+    rules += [Rule(imperative, ending, ANY, cls, "imperative") for imperative in imperatives]
+    return rules
+
+
+def _build_rules() -> List[Rule]:
+    rules: List[Rule] = []
+    # ichidan: stem + ending
+    rules += _verb_rules(
+        "る", V1, "", "", "", "", "て", "た",
+        potential="られる", passive="られる", causative="させる", imperatives=("ろ", "よ"),
+        volitional="よう", conditional="れば",
+    )
+    rules.append(Rule("れる", "る", V1, V1, "potential (colloquial)"))
+    # godan
+    for ending, (a, i, e, o, te, ta) in GODAN.items():
+        rules += _verb_rules(
+            ending, V5, a, i, e, o, te, ta,
+            potential=e + "る", passive=a + "れる", causative=a + "せる", imperatives=(e,),
+            volitional=o + "う", conditional=e + "ば",
+        )
+    # 行く / いく take って/った
+    for stem in ("行", "い", "ゆ"):
+        rules += [
+            Rule(stem + "って", stem + "く", ANY, V5, "te"),
+            Rule(stem + "った", stem + "く", ANY, V5, "past"),
+            Rule(stem + "ったら", stem + "く", ANY, V5, "-tara"),
+        ]
+    # 来る / くる
+    for dictionary, i, neg, cond in (("来る", "来", "来", "来れ"), ("くる", "き", "こ", "くれ")):
+        rules += _verb_rules(
+            dictionary, VK, neg, i, "", neg, i + "て", i + "た",
+            potential=neg + "られる", passive=neg + "られる", causative=neg + "させる",
+            imperatives=(neg + "い",), volitional=neg + "よう", conditional=cond + "ば",
+        )
+        rules.append(Rule(neg + "れる", dictionary, V1, VK, "potential (colloquial)"))
+    # する, also as the tail of suru-nouns (勉強する); its -zu and colloquial negative use せ, not し
+    suru = _verb_rules(
+        "する", VS, "し", "し", "", "し", "して", "した",
+        potential="できる", passive="される", causative="させる", imperatives=("しろ", "せよ"),
+        volitional="しよう", conditional="すれば",
+    )
+    rules += [rule for rule in suru if rule.suffix not in ("しず", "しずに", "しん")]
+    rules += [
+        Rule("せず", "する", ANY, VS, "-zu"),
+        Rule("せずに", "する", ANY, VS, "-zuni"),
+        Rule("せん", "する", ANY, VS, "negative (colloquial)"),
+    ]
+    # i-adjectives
+    rules += [
+        Rule("かった", "い", ANY, ADJ_I, "past"),
+        Rule("かったら", "い", ANY, ADJ_I, "-tara"),
+        Rule("くない", "い", ADJ_I, ADJ_I, "negative"),
+        Rule("くて", "い", ANY, ADJ_I, "te"),
+        Rule("ければ", "い", ANY, ADJ_I, "-ba"),
+        Rule("く", "い", ANY, ADJ_I, "adverbial"),
+        Rule("さ", "い", ANY, ADJ_I, "noun"),
+        Rule("そう", "い", ANY, ADJ_I, "-sou"),
+    ]
+    # auxiliaries that attach to the te-form; they reduce to a bare te-form
+    for te in ("て", "で"):
+        contracted = "ちゃ" if te == "て" else "じゃ"
+        rules += [
+            Rule(te + "いる", te, V1, TE, "-te iru"),
+            Rule(te + "る", te, V1, TE, "-te iru (colloquial)"),
+            Rule(te + "しまう", te, V5, TE, "-te shimau"),
+            Rule(contracted + "う", te, V5, TE, "-te shimau (colloquial)"),
+            Rule(te + "おく", te, V5, TE, "-te oku"),
+            Rule(("と" if te == "て" else "ど") + "く", te, V5, TE, "-te oku (colloquial)"),
+            Rule(te + "いく", te, V5, TE, "-te iku"),
+            Rule(te + "く", te, V5, TE, "-te iku (colloquial)"),
+            Rule(te + "くる", te, VK, TE, "-te kuru"),
+            Rule(te + "ほしい", te, ADJ_I, TE, "-te hoshii"),
+            Rule(te + "も", te, ANY, TE, "-te mo"),
+        ]
+    return rules
+
+
+def compile_rules(rules: List[Rule]) -> Tuple[Dict[str, Tuple[Rule, ...]], Tuple[int, ...]]:
+    """Group rules by suffix, and list suffix lengths longest first."""
+    table: Dict[str, List[Rule]] = {}
+    for rule in rules:
+        bucket = table.setdefault(rule.suffix, [])
+        if rule not in bucket:
+            bucket.append(rule)
+    lengths = tuple(sorted({len(suffix) for suffix in table}, reverse=True))
+    return {suffix: tuple(bucket) for suffix, bucket in table.items()}, lengths
+
+
+RULES, SUFFIX_LENGTHS = compile_rules(_build_rules())
+
+
+def deinflect(word: str) -> List[Deinflection]:
+    """All candidate dictionary forms of ``word`` (including itself), shortest chain first."""
+    results = [Deinflection(word, ANY, ())]
+    seen = {(word, ANY)}
+    i = 0
+    while i < len(results):
+        current = results[i]
+        i += 1
+        if len(current.reasons) >= MAX_DEPTH:
+            continue
+        for length in SUFFIX_LENGTHS:
+            if length > len(current.word):
+                continue
+            for rule in RULES.get(current.word[-length:], ()):
+                if not current.word_class & rule.in_mask:
+                    continue
+                candidate = current.word[:-length] + rule.ending
+                if (candidate, rule.out_class) in seen:
+                    continue
+                seen.add((candidate, rule.out_class))
+                results.append(Deinflection(candidate, rule.out_class, current.reasons + (rule.reason,)))
+    return results
@@ -0,0 +1,148 @@
+"""Reading (furigana) alignment for tokenized lines.
+
+Janome gives every token its reading in katakana, but not which part of the
+reading belongs to which character. ``FuriganaAligner`` splits a token into
+ruby segments: okurigana and other kana are matched literally against the
+reading, and each remaining kanji run receives the rest. Multi-kanji runs are
+split further per character when the kanji table's on/kun readings (with
+rendaku and small-tsu variants) account for the whole run reading.
+
+Segments are ``(text, reading)`` pairs; the reading is empty for text that needs
+no ruby, so the word "覚めたら" aligns to ``[("覚", "さ"), ("めたら", "")]``.
+"""
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence, Set, Tuple
+
+from app.models.results import KanjiResult
+from app.utils.text_processing import CONST_KANJI, DAKUTEN_MAP, HANDAKUTEN_MAP
+
+Segment = Tuple[str, str]
+
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(ord("ァ"), ord("ヶ") + 1)}
+# kanji plus the iteration/abbreviation marks that take ruby like kanji
+_KANJI_RUN = re.compile(f"(?:{CONST_KANJI}|[々〆ヵヶ])+")
+_GEMINATE = ("つ", "ち", "く", "き")
+
+
+def to_hiragana(text: str) -> str:
+    return text.translate(_KATAKANA_TO_HIRAGANA)
+
+
+def reading_variants(reading: str) -> Set[str]:
+    """A table reading as it may appear inside a compound: rendaku and small-tsu forms."""
+    # "-め" marks a suffix reading, "さ.める" separates the okurigana
+    reading = to_hiragana(reading.strip("-").split(".")[0])
+    if not reading:
+        return set()
+    variants = {reading}
+    first = reading[0]
+    for voiced in (DAKUTEN_MAP.get(first), HANDAKUTEN_MAP.get(first)):
+        if voiced:
+            variants.add(voiced + reading[1:])
+    if len(reading) > 1 and reading[-1] in _GEMINATE:
+        variants.update({variant[:-1] + "っ" for variant in list(variants)})
+    return variants
+
+
+def build_kanji_readings(kanji_data: Dict[str, KanjiResult]) -> Dict[str, Tuple[str, ...]]:
+    """Kanji -> candidate readings (longest first) from the kanji table."""
+    readings: Dict[str, Tuple[str, ...]] = {}
+    for kanji, data in kanji_data.items():
+        candidates: Set[str] = set()
+        for reading in data.readings_on + data.readings_kun:
+            candidates |= reading_variants(reading)
+        if candidates:
+            readings[kanji] = tuple(sorted(candidates, key=len, reverse=True))
+    return readings
+
+
+class FuriganaAligner:
+    """Memoized per-token reading alignment against a kanji reading table."""
+
+    def __init__(self, kanji_readings: Dict[str, Tuple[str, ...]], cache_size: int = 50000):
+        self.kanji_readings = kanji_readings
+        self.align = lru_cache(maxsize=cache_size)(self._align)
+
+    def _split_run(self, run: str, reading: str) -> List[Segment]:
+        """Per-kanji segments for a kanji run, or the whole run when the table can't explain it."""
+        if len(run) == 1:
+            return [(run, reading)]
+
+        def split(i: int, rest: str, previous: str) -> List[Segment] | None:
+            if i == len(run):
+                return [] if not rest else None
+            char = run[i] if run[i] != "々" else previous
+            for candidate in self.kanji_readings.get(char, ()):
+                if rest.startswith(candidate):
+                    tail = split(i + 1, rest[len(candidate):], char)
+                    if tail is not None:
+                        return [(run[i], candidate)] + tail
+            return None
+
+        return split(0, reading, "") or [(run, reading)]
+
+    def _align(self, surface: str, reading: str) -> Tuple[Segment, ...]:
+        reading = to_hiragana(reading)
+        runs = list(_KANJI_RUN.finditer(surface))
+        if not runs or not reading or reading == "*" or reading == to_hiragana(surface):
+            return ((surface, ""),)
+
+        # kana between kanji runs must appear verbatim in the reading
+        parts: List[Tuple[str, bool]] = []
+        position = 0
+        for run in runs:
+            if run.start() > position:
+                parts.append((surface[position:run.start()], False))
+            parts.append((run.group(), True))
+            position = run.end()
+        if position < len(surface):
+            parts.append((surface[position:], False))
+        pattern = "".join("(.+?)" if is_kanji else f"({re.escape(to_hiragana(text))})" for text, is_kanji in parts)
+        match = re.fullmatch(pattern, reading)
+        if match is None:
+            return ((surface, reading),)
+
+        segments: List[Segment] = []
+        for (text, is_kanji), part in zip(parts, match.groups()):
+            if is_kanji:
+                segments.extend(self._split_run(text, part))
+            else:
+                segments.append((text, ""))
+        return tuple(segments)
+
+    def align_line(self, tokenized_line: Sequence[Tuple[str, Any]], lyric_line: Sequence[str]) -> List[List[Segment]]:
+        """Ruby segments for each word of ``lyric_line`` from the tokens it was built from."""
+        # segments of the whole line with their start offsets
+        located: List[Tuple[int, Segment]] = []
+        offset = 0
+        for surface, token in tokenized_line:
+            reading = getattr(token, "reading", "*") if token is not None else "*"
+            for segment in self.align(surface, reading):
+                located.append((offset, segment))
+                offset += len(segment[0])
+        line = "".join(surface for surface, _ in tokenized_line)
+
+        ruby: List[List[Segment]] = []
+        index = 0
+        position = 0
+        for word in lyric_line:
+            start = line.find(word, position)
+            if start < 0:
+                ruby.append([(word, "")])
+                continue
+            end = start + len(word)
+            while index < len(located) and located[index][0] < start:
+                index += 1
+            segments: List[Segment] = []
+            while index < len(located) and located[index][0] < end:
+                text, reading = located[index][1]
+                if not reading and segments and not segments[-1][1]:
+                    # adjacent kana-only segments read as one
+                    segments[-1] = (segments[-1][0] + text, "")
+                else:
+                    segments.append((text, reading))
+                index += 1
+            ruby.append(segments or [(word, "")])
+            position = end
+        return ruby
@@ -0,0 +1,67 @@
+"""Garbage collector policy for the server process.
+
+Request handling allocates many short-lived containers, so with CPython's
+default thresholds (700, 10, 10) young collections run constantly and every
+full collection walks the large, long-lived startup state (tokenizer tables,
+dictionary index, kanji table). ``apply_gc_policy`` sets the generation
+thresholds from settings and can ``gc.freeze()`` everything allocated during
+startup, moving it to a permanent generation the collector no longer scans
+(this also keeps forked workers from dirtying those pages). ``gc_stats``
+reports collections and the time spent in them.
+"""
+import gc
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_started: Optional[float] = None
+_pause = [0.0, 0.0, 0.0]
+_max_pause = [0.0, 0.0, 0.0]
+
+
+def _track(phase: str, info: Dict[str, Any]) -> None:
+    global _started
+    if phase == "start":
+        _started = time.perf_counter()
+    elif _started is not None:
+        elapsed = time.perf_counter() - _started
+        generation = info["generation"]
+        with _lock:
+            _pause[generation] += elapsed
+            _max_pause[generation] = max(_max_pause[generation], elapsed)
+        _started = None
+
+
+def parse_thresholds(value: str) -> Optional[Tuple[int, ...]]:
+    """``"50000,20,100"`` -> ``(50000, 20, 100)``; empty keeps the interpreter defaults."""
+    if not value.strip():
+        return None
+    thresholds = tuple(int(part) for part in value.split(","))
+    if not 1 <= len(thresholds) <= 3:
+        raise ValueError(f"GC thresholds need one to three integers, got {value!r}")
+    return thresholds
+
+
+def apply_gc_policy(thresholds: str = "", freeze: bool = False) -> None:
+    if _track not in gc.callbacks:
+        gc.callbacks.append(_track)
+    parsed = parse_thresholds(thresholds)
+    if parsed is not None:
+        gc.set_threshold(*parsed)
+    if freeze:
+        gc.collect()
+        gc.freeze()
+    logger.info(f"GC policy: thresholds {gc.get_threshold()}, {gc.get_freeze_count()} objects frozen")
+
+
+def gc_stats() -> Dict[str, Any]:
+    with _lock:
+        pauses: List[Dict[str, float]] = [
+            {"collections": stats["collections"], "seconds": round(total, 3), "max_ms": round(peak * 1000, 2)}
+            for stats, total, peak in zip(gc.get_stats(), _pause, _max_pause)
+        ]
+    return {"thresholds": gc.get_threshold(), "frozen": gc.get_freeze_count(), "generations": pauses}
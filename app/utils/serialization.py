@@ -0,0 +1,27 @@
+from typing import Any, Type
+
+import msgspec
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from app.config import settings
+
+_encoder = msgspec.json.Encoder()
+
+
+def dump_json(content: Any) -> bytes:
+    """Encode result structs (or plain containers of them) straight to JSON bytes."""
+    return _encoder.encode(content)
+
+
+def result_response(content: Any, model: Type[BaseModel], status_code: int = 200) -> Response:
+    """Encode ``content`` once with msgspec, skipping FastAPI's response_model pass.
+
+    Routes keep declaring ``response_model`` for the OpenAPI schema. With
+    ``strict_response_validation`` enabled the encoded body is checked against
+    ``model`` before it is sent, so schema drift still surfaces while debugging.
+    """
+    body = dump_json(content)
+    if settings.strict_response_validation:
+        model.model_validate_json(body)
+    return Response(content=body, status_code=status_code, media_type="application/json")
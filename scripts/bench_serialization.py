@@ -0,0 +1,104 @@
+"""Benchmark response serialization for large /process-lyrics payloads.
+
+Compares the previous path (FastAPI validating plain dicts against
+``LyricsResponse`` and re-serializing them) with the result-dataclass path
+(msgspec structs encoded straight to bytes by ``dump_json``). Uses a synthetic song so it runs without
+jamdict, DeepL or Supabase.
+
+    python -m scripts.bench_serialization --lines 400 --repeat 20
+    python -m scripts.bench_serialization --profile
+"""
+import argparse
+import cProfile
+import os
+import pstats
+import time
+from typing import Any, Callable, Dict, List
+
+os.environ.setdefault("DEEPL_KEY", "bench")
+
+import msgspec  # noqa: E402
+
+from app.models.results import DefinitionResult, KanjiResult, LyricsResult, WordEntryResult  # noqa: E402
+from app.models.schemas import LyricsResponse  # noqa: E402
+from app.utils.serialization import dump_json  # noqa: E402
+
+
+def build_song(lines: int, words_per_line: int) -> LyricsResult:
+    lyrics_lines: List[List[str]] = []
+    word_map: Dict[str, List[WordEntryResult]] = {}
+    translated_lines = []
+    ruby_lines = []
+    for i in range(lines):
+        line = [f"語{i}_{j}" for j in range(words_per_line)]
+        lyrics_lines.append(line)
+        translated_lines.append(("".join(line), f"translation of line {i}"))
+        ruby_lines.append([[(word[0], "ご"), (word[1:], "")] for word in line])
+        for word in line:
+            word_map[word] = [
+                WordEntryResult(
+                    idseq=1000000 + k,
+                    word=word,
+                    furigana="よみ",
+                    definitions=[
+                        DefinitionResult(pos=["noun (common) (futsuumeishi)"], definition=["meaning", "sense", "gloss"])
+                        for _ in range(3)
+                    ],
+                )
+                for k in range(4)
+            ]
+    kanji_data = {
+        chr(0x4E00 + k): KanjiResult(
+            jlpt_new=k % 5 + 1,
+            meanings=("meaning a", "meaning b"),
+            readings_on=("オン",),
+            readings_kun=("くん",),
+            radicals=("一", "口"),
+        )
+        for k in range(min(lines * 2, 2000))
+    }
+    return LyricsResult("0" * 16, lyrics_lines, word_map, kanji_data, translated_lines, ruby_lines)
+
+
+def fastapi_path(payload: Dict[str, Any]) -> bytes:
+    """What FastAPI did per request with ``response_model=LyricsResponse``."""
+    return LyricsResponse.model_validate(payload).model_dump_json().encode()
+
+
+def timeit(fn: Callable[[], Any], repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=400)
+    parser.add_argument("--words-per-line", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--profile", action="store_true", help="print cProfile stats for both paths")
+    args = parser.parse_args()
+
+    result = build_song(args.lines, args.words_per_line)
+    payload = msgspec.to_builtins(result)
+    size = len(dump_json(result))
+    print(f"payload: {args.lines} lines, {len(result.word_map)} words, {len(result.kanji_data)} kanji, {size / 1024:.0f} KiB")
+
+    before = timeit(lambda: fastapi_path(payload), args.repeat)
+    after = timeit(lambda: dump_json(result), args.repeat)
+    print(f"validate + re-serialize (before): {before * 1000:8.2f} ms")
+    print(f"dump_json structs       (after):  {after * 1000:8.2f} ms")
+    print(f"speedup: {before / after:.1f}x")
+
+    if args.profile:
+        for name, fn in (("before", lambda: fastapi_path(payload)), ("after", lambda: dump_json(result))):
+            profiler = cProfile.Profile()
+            profiler.runcall(fn)
+            print(f"\n--- {name} ---")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(8)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Local stand-ins shared by the profiling and load-testing scripts.
+
+``FakeDeepL`` replaces ``lyrics_service.deepl_client`` (optionally slow or
+failing); the lines table is stood in for by ``scripts/postgrest_stub.py``.
+``build_song`` makes deterministic Japanese lyrics from ``SAMPLE_LINES``.
+"""
+import random
+import time
+
+import deepl
+
+SAMPLE_LINES = [
+    "朝目が覚めたら",
+    "置いてきぼりになった",
+    "君に会いたい",
+    "今日は勉強した",
+    "夢を見ていた",
+    "高い空を見て",
+    "こんな気持ちになるなんて",
+    "月が好きだった",
+    "行ってしまう",
+    "来なかった日",
+]
+
+
+class FakeDeepL:
+    """``translate_text`` after ``latency`` seconds, raising ``DeepLException`` at ``error_rate``."""
+
+    class Result:
+        def __init__(self, text: str):
+            self.text = text
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+
+    def translate_text(self, text: str, **kwargs: object) -> "FakeDeepL.Result":
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise deepl.DeepLException("fake DeepL: injected failure")
+        return self.Result(f"translation of {text}")
+
+
+def build_song(lines: int, seed: int) -> str:
+    """``lines`` distinct lines made of pairs of sample lines; ``seed`` shifts the pairing."""
+    pairs = [a + b for a in SAMPLE_LINES for b in SAMPLE_LINES]
+    return "\n".join(pairs[(seed + i) % len(pairs)] for i in range(lines))
@@ -0,0 +1,82 @@
+"""Memory footprint of the kanji table: plain parsed ``kanji.json`` vs ``KanjiTable``.
+
+Measures what each representation keeps allocated (tracemalloc) and how many
+objects it adds for the garbage collector to track, plus the cost of one
+``/kanji`` lookup: building a ``KanjiResult`` from the dict per call (before)
+vs returning the prebuilt one (after).
+
+    python -m scripts.kanji_memory --path kanji.json
+    python -m scripts.kanji_memory --path kanji.json --radicals   # include jamdict's krad radicals
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Optional, Sequence, Tuple
+
+from app.models.results import KanjiResult
+from app.services.kanji_table import KanjiTable
+
+
+def measure(build: Callable[[], Any]) -> Tuple[Any, int, int]:
+    """(object, bytes still allocated, GC-tracked objects added) for ``build()``."""
+    gc.collect()
+    tracked = len(gc.get_objects())
+    tracemalloc.start()
+    obj = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size, len(gc.get_objects()) - tracked
+
+
+def timeit(fn: Callable[[], Any], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default="kanji.json")
+    parser.add_argument("--radicals", action="store_true", help="load radicals from jamdict's kradfile")
+    parser.add_argument("--repeat", type=int, default=100000)
+    args = parser.parse_args()
+
+    radicals: Callable[[str], Optional[Sequence[str]]] = lambda kanji: None
+    if args.radicals:
+        from jamdict.krad import KRad
+        radicals = KRad().krad.get
+
+    def load_dict() -> Any:
+        with open(args.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    kanji_data, dict_size, dict_objects = measure(load_dict)
+    table, table_size, table_objects = measure(lambda: KanjiTable.load(args.path, radicals))
+    print(f"{len(table)} kanji from {args.path}")
+    print(f"dict (before):       {dict_size / 1e6:7.2f} MB, {dict_objects:8d} GC-tracked objects")
+    print(f"KanjiTable (after):  {table_size / 1e6:7.2f} MB, {table_objects:8d} GC-tracked objects")
+    print(f"saved: {(1 - table_size / dict_size) * 100:.0f}% memory")
+
+    kanji = next(iter(table))
+
+    def build_result() -> KanjiResult:
+        data = kanji_data[kanji]
+        return KanjiResult(
+            jlpt_new=data["jlpt_new"],
+            meanings=data["meanings"],
+            readings_on=data["readings_on"],
+            readings_kun=data["readings_kun"],
+            radicals=radicals(kanji),
+        )
+
+    before = timeit(build_result, args.repeat)
+    after = timeit(lambda: table.get(kanji), args.repeat)
+    print(f"lookup: {before * 1e9:.0f} ns (build per call) -> {after * 1e9:.0f} ns (prebuilt)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Export, append and import snapshots of the ``lines`` cache.
+
+    python -m scripts.lines_snapshot export lines.snap           # full export from Supabase
+    python -m scripts.lines_snapshot export lines.snap --append  # add rows not in the file yet
+    python -m scripts.lines_snapshot import lines.snap           # upload rows (existing lines are kept)
+    python -m scripts.lines_snapshot info lines.snap
+
+Set ``LINES_SNAPSHOT_PATH`` to serve a snapshot as a read-only warm cache in
+front of the remote table (no network needed for lines it contains).
+"""
+import argparse
+import os
+import time
+from typing import Any, Dict, List
+
+from app.services.lines_repository import LinesRepository
+from app.services.lines_snapshot import LinesSnapshot, index_path, iter_snapshot, write_snapshot
+
+
+def export(args: argparse.Namespace) -> None:
+    repository = LinesRepository.from_settings()
+    try:
+        written = write_snapshot(args.path, repository.iter_lines(args.page_size), append=args.append)
+    finally:
+        repository.close()
+    print(f"Wrote {written} lines to {args.path} ({os.path.getsize(args.path) / 1e6:.1f} MB)")
+
+
+def import_(args: argparse.Namespace) -> None:
+    repository = LinesRepository.from_settings()
+    batch: List[Dict[str, Any]] = []
+    total = 0
+    try:
+        for row in iter_snapshot(args.path):
+            batch.append(row)
+            if len(batch) >= args.batch:
+                repository.insert_lines(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            repository.insert_lines(batch)
+            total += len(batch)
+    finally:
+        repository.close()
+    print(f"Uploaded {total} lines from {args.path} (lines already cached were left as they are)")
+
+
+def info(args: argparse.Namespace) -> None:
+    started = time.perf_counter()
+    snapshot = LinesSnapshot(args.path)
+    opened = time.perf_counter() - started
+    print(f"{args.path}: {len(snapshot)} lines, {os.path.getsize(args.path) / 1e6:.1f} MB data, "
+          f"{os.path.getsize(index_path(args.path)) / 1e6:.1f} MB index, mapped in {opened * 1000:.1f} ms")
+    snapshot.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write the lines table to a snapshot")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--append", action="store_true", help="keep the file and add missing lines")
+    export_parser.add_argument("--page-size", type=int, default=1000)
+    export_parser.set_defaults(run=export)
+    import_parser = commands.add_parser("import", help="upload a snapshot into the lines table")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--batch", type=int, default=500)
+    import_parser.set_defaults(run=import_)
+    info_parser = commands.add_parser("info", help="show snapshot size and line count")
+    info_parser.add_argument("path")
+    info_parser.set_defaults(run=info)
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""Load test the API against local stand-ins for DeepL and Supabase.
+
+Starts ``app.main:app`` under uvicorn in a child process (through the
+``create_app`` factory below) with:
+
+- the lines table served by ``scripts/postgrest_stub.py`` from this process,
+  slowed down / failing per ``--supabase-latency-ms`` and ``--supabase-error-rate``;
+- ``FakeDeepL`` as the translator, per ``--deepl-latency-ms`` and ``--deepl-error-rate``;
+- an event-loop lag probe in each worker, read back from ``/loadtest/lag``.
+
+It then sends an open-loop mix of ``/process-lyrics``, ``/sync-lyrics``,
+``/kanji`` and ``/word`` requests at ``--rps`` for ``--duration`` seconds.
+Requests are spread over ``--clients`` simulated clients (``X-Forwarded-For``)
+so the per-client rate limits apply as they would in production, and latency
+is measured from each request's scheduled start, so time spent queued behind
+a saturated server is not hidden. Reported: throughput, latency percentiles
+and status codes per endpoint, event-loop lag, and the admission gates' peak
+active/queued requests sampled from ``/health``.
+
+    python -m scripts.loadtest --rps 20 --duration 30
+    python -m scripts.loadtest --rps 50 --workers 2 --mix process=1,kanji=6,word=3 --deepl-latency-ms 300
+    python -m scripts.loadtest --url http://localhost:8000 --rps 10   # a running server, no stand-ins
+
+A server given with ``--url`` only sees the simulated clients when it runs with
+``TRUST_FORWARDED_FOR=true``; otherwise all requests share one rate limit.
+"""
+import argparse
+import asyncio
+import collections
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import httpx
+
+from scripts.fake_backends import SAMPLE_LINES, build_song
+from scripts.postgrest_stub import PostgrestStub
+
+ENDPOINTS = ("process", "sync", "kanji", "word")
+
+
+class LagProbe:
+    """Sleeps ``interval`` seconds in a loop on the event loop and records how late it wakes up."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.lags: Deque[float] = collections.deque(maxlen=100000)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - started - self.interval))
+
+    async def drain(self) -> Dict[str, Any]:
+        """Lags (ms) recorded since the previous call, for this worker."""
+        lags = [round(self.lags.popleft() * 1000, 3) for _ in range(len(self.lags))]
+        return {"pid": os.getpid(), "lag_ms": lags}
+
+
+def create_app() -> Any:
+    """uvicorn factory: the real app with the fake DeepL and a lag probe (configured through env)."""
+    from app.main import app
+    from app.services import lyrics_service
+    from scripts.fake_backends import FakeDeepL
+
+    lyrics_service.deepl_client = FakeDeepL(
+        float(os.environ.get("LOADTEST_DEEPL_LATENCY", "0")), float(os.environ.get("LOADTEST_DEEPL_ERROR_RATE", "0"))
+    )
+    probe = LagProbe(float(os.environ.get("LOADTEST_LAG_INTERVAL", "0.05")))
+    app_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app: Any) -> AsyncIterator[None]:
+        async with app_lifespan(app):
+            task = asyncio.create_task(probe.run())
+            yield
+            task.cancel()
+
+    app.router.lifespan_context = lifespan
+    app.add_api_route("/loadtest/lag", probe.drain, methods=["GET"], include_in_schema=False)
+    return app
+
+
+class Sample(NamedTuple):
+    endpoint: str
+    status: int  # 0 for timeouts and connection errors
+    latency: float
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """``"process=3,sync=1,kanji=4,word=2"`` -> endpoint weights."""
+    mix: Dict[str, float] = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r} (expected one of {', '.join(ENDPOINTS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Traffic:
+    """Builds request arguments; the idseqs asked from /word are harvested from processed songs."""
+
+    def __init__(self, songs: int, lines: int, clients: int):
+        self.songs = songs
+        self.lines = lines
+        self.clients = [f"10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}" for n in range(clients)]
+        self.kanji = sorted(set(re.findall(r"[一-鿿]", "".join(SAMPLE_LINES))))
+        self.idseqs: List[int] = []
+
+    def harvest(self, result: Dict[str, Any]) -> None:
+        seen = set(self.idseqs)
+        for entries in result.get("word_map", {}).values():
+            for entry in entries:
+                idseq = entry.get("idseq")
+                if isinstance(idseq, int) and idseq not in seen:
+                    seen.add(idseq)
+                    self.idseqs.append(idseq)
+
+    def request(self, endpoint: str) -> Tuple[str, str, Optional[Dict[str, str]], Dict[str, str]]:
+        """(method, path, json body, headers) for one request to ``endpoint``."""
+        headers = {"x-forwarded-for": random.choice(self.clients)}
+        seed = random.randrange(self.songs)
+        if endpoint == "process":
+            return "POST", "/process-lyrics", {"lyrics": build_song(self.lines, seed)}, headers
+        if endpoint == "sync":
+            # one line dropped at the top, one added at the bottom
+            body = {"original_lyrics": build_song(self.lines, seed), "modified_lyrics": build_song(self.lines, seed + 1)}
+            return "POST", "/sync-lyrics", body, headers
+        if endpoint == "kanji":
+            return "GET", f"/kanji/{random.choice(self.kanji)}", None, headers
+        return "GET", f"/word/{random.choice(self.idseqs) if self.idseqs else 0}", None, headers
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float, server: Optional[subprocess.Popen]) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise SystemExit(f"server exited with status {server.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise SystemExit(f"server not ready after {timeout:.0f}s")
+
+
+class Monitor:
+    """Polls ``/health`` (admission gates) and ``/loadtest/lag`` while the load runs."""
+
+    def __init__(self, client: httpx.AsyncClient, interval: float):
+        self.client = client
+        self.interval = interval
+        self.health: List[Dict[str, Any]] = []
+        self.lags: List[float] = []
+        self.has_lag = True
+
+    async def sample(self) -> None:
+        try:
+            self.health.append((await self.client.get("/health")).json())
+            if self.has_lag:
+                response = await self.client.get("/loadtest/lag")
+                if response.status_code == 404:
+                    self.has_lag = False
+                else:
+                    self.lags.extend(response.json()["lag_ms"])
+        except httpx.HTTPError:
+            pass
+
+    async def run(self) -> None:
+        while True:
+            await self.sample()
+            await asyncio.sleep(self.interval)
+
+
+async def run_load(args: argparse.Namespace, client: httpx.AsyncClient, traffic: Traffic) -> Tuple[List[Sample], int, float]:
+    """Open-loop load: (samples, requests skipped because ``--max-in-flight`` was reached, elapsed seconds)."""
+    mix = args.mix
+    names, weights = list(mix), list(mix.values())
+    samples: List[Sample] = []
+    in_flight: Set["asyncio.Task[None]"] = set()
+    skipped = 0
+    loop = asyncio.get_running_loop()
+
+    async def send(endpoint: str, scheduled: float) -> None:
+        method, path, body, headers = traffic.request(endpoint)
+        try:
+            response = await client.request(method, path, json=body, headers=headers)
+            status = response.status_code
+            if endpoint == "process" and status == 200 and len(traffic.idseqs) < 1000:
+                traffic.harvest(response.json())
+        except httpx.HTTPError:
+            status = 0
+        samples.append(Sample(endpoint, status, loop.time() - scheduled))
+
+    started = loop.time()
+    scheduled = started
+    while scheduled - started < args.duration:
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= args.max_in_flight:
+            skipped += 1
+        else:
+            task = asyncio.create_task(send(random.choices(names, weights)[0], scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        scheduled += random.expovariate(args.rps) if args.poisson else 1 / args.rps
+    if in_flight:
+        await asyncio.wait(in_flight)
+    return samples, skipped, loop.time() - started
+
+
+def report(args: argparse.Namespace, samples: List[Sample], skipped: int, elapsed: float, monitor: Monitor) -> None:
+    completed = [s for s in samples if s.status]
+    print(
+        f"\ntarget {args.rps:g} rps for {args.duration:g}s: sent {len(samples)}, skipped {skipped} "
+        f"(over --max-in-flight), {len(completed)} responses in {elapsed:.1f}s -> {len(completed) / elapsed:.1f} rps"
+    )
+    print(f"{'endpoint':<9} {'sent':>6} {'2xx':>6} {'rps':>7} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}  statuses (latency ms)")
+    for endpoint in (*ENDPOINTS, "all"):
+        group = [s for s in samples if endpoint in ("all", s.endpoint)]
+        if not group:
+            continue
+        latencies = [s.latency * 1000 for s in group]
+        ok = sum(1 for s in group if 200 <= s.status < 300)
+        statuses = collections.Counter(s.status or "error" for s in group)
+        print(
+            f"{endpoint:<9} {len(group):>6} {ok:>6} {ok / elapsed:>7.1f} {percentile(latencies, 0.5):>8.1f} "
+            f"{percentile(latencies, 0.9):>8.1f} {percentile(latencies, 0.99):>8.1f} {max(latencies):>8.1f}  "
+            f"{dict(sorted(statuses.items(), key=str))}"
+        )
+
+    if monitor.lags:
+        lags = monitor.lags
+        print(
+            f"\nevent-loop lag ms ({len(lags)} samples): p50 {percentile(lags, 0.5):.1f}  p90 {percentile(lags, 0.9):.1f}  "
+            f"p99 {percentile(lags, 0.99):.1f}  max {max(lags):.1f}"
+        )
+    if len(monitor.health) >= 2:
+        print(f"\nsaturation over {len(monitor.health)} /health samples:")
+        first, last = monitor.health[0]["admission"], monitor.health[-1]["admission"]
+        for gate, stats in last.items():
+            samples_for_gate = [health["admission"][gate] for health in monitor.health]
+            at_capacity = sum(1 for s in samples_for_gate if s["active"] >= s["max_concurrency"]) / len(samples_for_gate)
+            print(
+                f"  {gate:<6} peak active {max(s['active'] for s in samples_for_gate)}/{stats['max_concurrency']}, "
+                f"peak queued {max(s['waiting'] for s in samples_for_gate)}/{stats['max_queue']}, "
+                f"at capacity {at_capacity:.0%} of samples, rejected {stats['rejected'] - first[gate]['rejected']}"
+            )
+        if args.workers > 1:
+            print("  (each sample comes from whichever worker answered it)")
+
+
+def start_server(args: argparse.Namespace, stub_url: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "SUPABASE_URL": stub_url,
+        "SUPABASE_KEY": "loadtest",
+        "DEEPL_KEY": "loadtest",
+        "TRANSLATION_MEMORY_PATH": ":memory:",
+        "LINE_INDEX_PATH": ":memory:",
+        "JOB_QUEUE_PATH": ":memory:",
+        # this process stands in for the one proxy that sets X-Forwarded-For
+        "TRUST_FORWARDED_FOR": "true",
+        "TRUSTED_PROXY_COUNT": "1",
+        "LOADTEST_DEEPL_LATENCY": str(args.deepl_latency_ms / 1000),
+        "LOADTEST_DEEPL_ERROR_RATE": str(args.deepl_error_rate),
+        "LOADTEST_LAG_INTERVAL": str(args.lag_interval),
+    }
+    command = [
+        sys.executable, "-m", "uvicorn", "scripts.loadtest:create_app", "--factory",
+        "--host", "127.0.0.1", "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, env=env)
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    server: Optional[subprocess.Popen] = None
+    stub_server = None
+    base_url = args.url
+    if base_url is None:
+        stub = PostgrestStub(latency=args.supabase_latency_ms / 1000, error_rate=args.supabase_error_rate)
+        stub_server = stub.serve("127.0.0.1", 0)
+        threading.Thread(target=stub_server.serve_forever, daemon=True).start()
+        server = start_server(args, f"http://127.0.0.1:{stub_server.server_address[1]}")
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client, \
+                httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as monitor_client:
+            await wait_until_ready(client, args.startup_timeout, server)
+            traffic = Traffic(args.songs, args.lines, args.clients)
+            # one song up front so /word has real idseqs to ask for
+            warmup = await client.post("/process-lyrics", json={"lyrics": build_song(args.lines, 0)})
+            if warmup.status_code == 200:
+                traffic.harvest(warmup.json())
+
+            monitor = Monitor(monitor_client, args.sample_interval)
+            await monitor.sample()
+            monitor.lags.clear()
+            monitor_task = asyncio.create_task(monitor.run())
+            samples, skipped, elapsed = await run_load(args, client, traffic)
+            monitor_task.cancel()
+            await monitor.sample()
+            report(args, samples, skipped, elapsed, monitor)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if stub_server is not None:
+            stub_server.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="load an already running server instead of starting one with stand-ins")
+    parser.add_argument("--port", type=int, default=8765, help="port for the started server")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes for the started server")
+    parser.add_argument("--rps", type=float, default=20.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--poisson", action="store_true", help="exponential inter-arrival times instead of a fixed rate")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("process=3,sync=1,kanji=4,word=2"))
+    parser.add_argument("--songs", type=int, default=50, help="distinct songs (fewer means more cached lines)")
+    parser.add_argument("--lines", type=int, default=30, help="lines per song")
+    parser.add_argument("--clients", type=int, default=100, help="simulated client addresses")
+    parser.add_argument("--max-in-flight", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="seconds between /health samples")
+    parser.add_argument("--lag-interval", type=float, default=0.05, help="event-loop lag probe period (seconds)")
+    parser.add_argument("--deepl-latency-ms", type=float, default=0.0)
+    parser.add_argument("--deepl-error-rate", type=float, default=0.0)
+    parser.add_argument("--supabase-latency-ms", type=float, default=0.0)
+    parser.add_argument("--supabase-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""In-memory PostgREST-compatible stub for the ``lines`` table.
+
+Supports the subset of PostgREST that ``LinesRepository`` uses: ``select``,
+``eq.``/``neq.``/``is.null``/``in.(...)``/``gt.`` filters, ``order``/``limit``/``offset``,
+upsert with ``on_conflict`` and ``resolution=ignore-duplicates`` or
+``merge-duplicates``, and delete with ``return=representation``. Latency and
+error rate are configurable so retry and concurrency behaviour can be exercised
+locally, and ``columns`` restricts the table to a schema (unknown columns are
+rejected the way Postgres does) so unmigrated tables can be reproduced.
+
+Use it in-process as an httpx transport::
+
+    stub = PostgrestStub()
+    repo = LinesRepository("http://stub", "key", transport=stub.transport())
+
+or run it as a server and point ``SUPABASE_URL`` at it::
+
+    python -m scripts.postgrest_stub --port 54321 --latency-ms 20 --error-rate 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+
+
+def parse_in_list(value: str) -> List[str]:
+    """Parse the body of an ``in.(...)`` filter, honouring double quotes and backslash escapes."""
+    items: List[str] = []
+    current: List[str] = []
+    quoted = False
+    i = 0
+    while i < len(value):
+        char = value[i]
+        if quoted:
+            if char == "\\" and i + 1 < len(value):
+                current.append(value[i + 1])
+                i += 1
+            elif char == '"':
+                quoted = False
+            else:
+                current.append(char)
+        elif char == '"':
+            quoted = True
+        elif char == ",":
+            items.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    items.append("".join(current))
+    return items
+
+
+@lru_cache(maxsize=256)
+def in_set(value: str) -> FrozenSet[str]:
+    """``parse_in_list`` as a set, parsed once per filter rather than once per row."""
+    return frozenset(parse_in_list(value))
+
+
+class PostgrestStub:
+    def __init__(
+        self, key: str = "line", latency: float = 0.0, error_rate: float = 0.0, columns: Optional[FrozenSet[str]] = None
+    ):
+        self.key = key
+        self.latency = latency
+        self.error_rate = error_rate
+        self.columns = columns
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _matches(self, row: Dict[str, Any], filters: List[Tuple[str, str]]) -> bool:
+        for column, expr in filters:
+            op, _, operand = expr.partition(".")
+            value = row.get(column)
+            if op == "eq" and str(value) != operand:
+                return False
+            # like SQL, neq never matches NULL
+            if op == "neq" and (value is None or str(value) == operand):
+                return False
+            if op == "in" and str(value) not in in_set(operand[1:-1]):
+                return False
+            if op == "is" and operand == "null" and value is not None:
+                return False
+            if op == "gt" and not str(value) > operand:
+                return False
+        return True
+
+    def handle(self, method: str, path: str, query: str, body: bytes, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            return 503, {}, b'{"message": "stub: injected failure"}'
+
+        params = parse_qsl(query, keep_blank_values=True)
+        control = {"select", "order", "limit", "offset", "on_conflict"}
+        filters = [(k, v) for k, v in params if k not in control]
+        options = dict(params)
+        prefer = headers.get("prefer", "")
+        unknown = self._unknown_columns([k for k, _ in filters] + (options.get("select") or "").split(","))
+        if method in ("POST", "PATCH") and not unknown:
+            payload = json.loads(body or b"[]")
+            payload = payload if isinstance(payload, list) else [payload]
+            unknown = self._unknown_columns([column for row in payload for column in row])
+        if unknown:
+            message = f"column {unknown} does not exist"
+            return 400, {}, json.dumps({"code": "42703", "message": message}).encode()
+
+        with self._lock:
+            if method == "GET":
+                rows = [row for row in self.rows.values() if self._matches(row, filters)]
+                if "order" in options:
+                    column = options["order"].split(".")[0]
+                    rows.sort(key=lambda row: str(row.get(column)))
+                offset = int(options.get("offset", 0))
+                limit = int(options["limit"]) if "limit" in options else None
+                rows = rows[offset:offset + limit if limit is not None else None]
+                return 200, {}, self._project(rows, options.get("select"))
+            if method in ("POST", "PATCH"):
+                payload = json.loads(body or b"[]")
+                payload = payload if isinstance(payload, list) else [payload]
+                if method == "PATCH":
+                    for row in self.rows.values():
+                        if self._matches(row, filters):
+                            row.update(payload[0])
+                    return 204, {}, b""
+                for row in payload:
+                    key = row[self.key]
+                    if key in self.rows:
+                        if "ignore-duplicates" in prefer:
+                            continue
+                        if "merge-duplicates" not in prefer:
+                            return 409, {}, json.dumps({"code": "23505", "message": f"duplicate key {key}"}).encode()
+                    self.rows[key] = {**self.rows.get(key, {}), **row}
+                return 201, {}, b""
+            if method == "DELETE":
+                doomed = [row for row in self.rows.values() if self._matches(row, filters)]
+                for row in doomed:
+                    del self.rows[row[self.key]]
+                if "return=representation" in prefer:
+                    return 200, {}, self._project(doomed, options.get("select"))
+                return 204, {}, b""
+        return 405, {}, b'{"message": "stub: unsupported method"}'
+
+    def _unknown_columns(self, columns: List[str]) -> Optional[str]:
+        if self.columns is None:
+            return None
+        return next((column for column in columns if column not in ("", "*") and column not in self.columns), None)
+
+    @staticmethod
+    def _project(rows: List[Dict[str, Any]], select: Optional[str]) -> bytes:
+        if select and select != "*":
+            columns = select.split(",")
+            rows = [{c: row.get(c) for c in columns} for row in rows]
+        return json.dumps(rows, ensure_ascii=False).encode()
+
+    def transport(self) -> httpx.MockTransport:
+        def handler(request: httpx.Request) -> httpx.Response:
+            status, headers, content = self.handle(
+                request.method, request.url.path, request.url.query.decode(), request.content, dict(request.headers)
+            )
+            return httpx.Response(status, headers={"content-type": "application/json", **headers}, content=content)
+
+        return httpx.MockTransport(handler)
+
+    def serve(self, host: str, port: int) -> ThreadingHTTPServer:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _dispatch(self) -> None:
+                url = urlsplit(self.path)
+                length = int(self.headers.get("content-length") or 0)
+                body = self.rfile.read(length) if length else b""
+                headers = {k.lower(): v for k, v in self.headers.items()}
+                status, extra, content = stub.handle(self.command, url.path, url.query, body, headers)
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(content)))
+                for name, value in extra.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _dispatch
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return ThreadingHTTPServer((host, port), Handler)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    stub = PostgrestStub(latency=args.latency_ms / 1000, error_rate=args.error_rate)
+    server = stub.serve(args.host, args.port)
+    print(f"PostgREST stub listening on http://{args.host}:{args.port}/rest/v1/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Allocation and latency profile of the /process-lyrics request path.
+
+Runs ``process_lyrics`` in-process against an in-memory PostgREST stub and an
+instant fake DeepL, so only our own processing is measured:
+
+- latency percentiles over ``--requests`` songs, all lines served from the
+  lines cache (``cached``) or all lines processed from scratch (``uncached``);
+- garbage collections per generation during the run;
+- the source lines holding the most memory at the end of one request, when
+  everything it built is still alive (tracemalloc snapshot in ``finish_lyrics``).
+
+Pass the same GC settings as the server to compare policies:
+
+    python -m scripts.profile_request --mode cached --requests 500
+    python -m scripts.profile_request --mode cached --requests 500 --gc-threshold 50000,20,100 --gc-freeze
+"""
+import argparse
+import gc
+import os
+import statistics
+import time
+import tracemalloc
+from typing import List
+
+os.environ.setdefault("DEEPL_KEY", "profile")
+os.environ.setdefault("TRANSLATION_MEMORY_PATH", ":memory:")
+os.environ.setdefault("LINE_INDEX_PATH", ":memory:")
+os.environ.setdefault("JOB_QUEUE_PATH", ":memory:")
+os.environ.setdefault("REPROCESS_RATE", "0")
+
+from app.services import lyrics_service  # noqa: E402
+from app.services.lines_repository import LinesRepository  # noqa: E402
+from app.utils.gc_policy import apply_gc_policy  # noqa: E402
+from scripts.fake_backends import SAMPLE_LINES, FakeDeepL, build_song  # noqa: E402
+from scripts.postgrest_stub import PostgrestStub  # noqa: E402
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("cached", "uncached"), default="cached")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--lines", type=int, default=40)
+    parser.add_argument("--gc-threshold", default="", help="e.g. 50000,20,100 (default: interpreter defaults)")
+    parser.add_argument("--gc-freeze", action="store_true", help="gc.freeze() after warmup")
+    parser.add_argument("--top", type=int, default=15, help="allocation sites to list")
+    args = parser.parse_args()
+
+    stub = PostgrestStub()
+    lyrics_service.lines_repository = LinesRepository("http://stub", "key", transport=stub.transport())
+    lyrics_service.deepl_client = FakeDeepL()
+
+    def request(n: int) -> None:
+        if args.mode == "uncached":
+            stub.rows.clear()
+        # bypass the song-level single-flight; distinct songs per request
+        lyrics_service._process_lyrics(build_song(args.lines, n))
+
+    # warm caches (and fill the lines table for the cached mode)
+    for n in range(len(SAMPLE_LINES) ** 2):
+        lyrics_service._process_lyrics(build_song(1, n))
+    apply_gc_policy(args.gc_threshold, args.gc_freeze)
+
+    before = [stats["collections"] for stats in gc.get_stats()]
+    latencies: List[float] = []
+    for n in range(args.requests):
+        started = time.perf_counter()
+        request(n)
+        latencies.append(time.perf_counter() - started)
+    collections = [stats["collections"] - count for stats, count in zip(gc.get_stats(), before)]
+
+    print(f"{args.requests} {args.mode} requests of {args.lines} lines, GC thresholds {gc.get_threshold()}, "
+          f"{gc.get_freeze_count()} frozen objects")
+    print(
+        "latency ms: "
+        f"p50 {percentile(latencies, 0.5) * 1000:.2f}  p90 {percentile(latencies, 0.9) * 1000:.2f}  "
+        f"p99 {percentile(latencies, 0.99) * 1000:.2f}  max {max(latencies) * 1000:.2f}  "
+        f"mean {statistics.fmean(latencies) * 1000:.2f}"
+    )
+    print(f"collections per generation: {collections}")
+
+    snapshots: List[tracemalloc.Snapshot] = []
+    finish_lyrics = lyrics_service.finish_lyrics
+
+    def snapshot_then_finish(result, index_rows):  # type: ignore[no-untyped-def]
+        snapshots.append(tracemalloc.take_snapshot())
+        return finish_lyrics(result, index_rows)
+
+    lyrics_service.finish_lyrics = snapshot_then_finish
+    tracemalloc.start(1)
+    request(args.requests)
+    tracemalloc.stop()
+    lyrics_service.finish_lyrics = finish_lyrics
+    stats = snapshots[0].filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]).statistics("lineno")
+    print(f"\ntop {args.top} allocation sites at the end of one request:")
+    for stat in stats[:args.top]:
+        frame = stat.traceback[0]
+        print(f"{stat.size / 1024:9.1f} KiB {stat.count:7d} blocks  {frame.filename}:{frame.lineno}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Rebuild the local idseq/kanji -> lines index from the ``lines`` table.
+
+Pages through every cached row with ``LinesRepository.iter_lines``, writes a
+fresh compacted index next to ``LINE_INDEX_PATH`` and swaps it into place.
+Song membership is not stored in Supabase, so it starts empty and refills as
+songs are processed. Restart the server afterwards to load the new index::
+
+    python -m scripts.rebuild_line_index
+"""
+import argparse
+import os
+import time
+
+from app.config import settings
+from app.services.line_index import LineIndex
+from app.services.lines_repository import LinesRepository
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=settings.line_index_path)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=5000, help="rows indexed per commit")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    tmp_path = args.path + ".rebuild"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    index = LineIndex(tmp_path)
+    repository = LinesRepository.from_settings()
+    batch = []
+    try:
+        for row in repository.iter_lines(args.page_size):
+            batch.append(row)
+            if len(batch) >= args.batch:
+                index.add_lines(batch)
+                batch = []
+        index.add_lines(batch)
+        index.compact()
+        stats = index.stats()
+    finally:
+        index.close()
+        repository.close()
+    os.replace(tmp_path, args.path)
+    print(f"Indexed {stats['lines']} lines, {stats['terms']} terms into {args.path} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
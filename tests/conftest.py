@@ -0,0 +1,4 @@
+import os
+
+# app.config requires a DeepL key; tests never call DeepL
+os.environ.setdefault("DEEPL_KEY", "test")
@@ -0,0 +1,120 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.utils.admission import AdmissionGate, RateLimiter, TokenBucket, admit, admit_stream, client_id
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=1.0, burst=2)
+    now = bucket.updated
+    assert bucket.take(now) == 0 and bucket.take(now) == 0
+    assert bucket.take(now) == pytest.approx(1.0)
+    assert bucket.take(now + 1.0) == 0
+
+
+def test_rate_limiter_is_per_client():
+    limiter = RateLimiter(per_minute=60, burst=1)
+    assert limiter.check("a") == 0
+    assert limiter.check("a") > 0
+    assert limiter.check("b") == 0
+
+
+def test_zero_rate_is_unlimited():
+    limiter = RateLimiter(per_minute=0, burst=0)
+    assert all(limiter.check("a") == 0 for _ in range(100))
+
+
+def test_gate_queues_then_rejects():
+    async def main():
+        gate = AdmissionGate("test", max_concurrency=1, max_queue=1, queue_timeout=0.05)
+        order = []
+
+        async def hold(name, seconds):
+            async with gate.slot():
+                order.append(name)
+                await asyncio.sleep(seconds)
+
+        first = asyncio.create_task(hold("first", 0.02))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(hold("second", 0))
+        await asyncio.sleep(0)
+        assert gate.waiting == 1
+        # the queue is full
+        with pytest.raises(HTTPException) as rejected:
+            async with gate.slot():
+                pass
+        assert rejected.value.status_code == 503 and "Retry-After" in rejected.value.headers
+        await asyncio.gather(first, second)
+        assert order == ["first", "second"]
+        # a holder outlasting queue_timeout rejects the waiter
+        blocker = asyncio.create_task(hold("blocker", 0.2))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException, match="timeout"):
+            async with gate.slot():
+                pass
+        await blocker
+        assert gate.stats()["rejected"] == 2 and gate.active == 0
+
+    run(main())
+
+
+def request_from(host, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (host, 1234)})
+
+
+def test_client_id(monkeypatch):
+    assert client_id(request_from("10.0.0.1", "1.2.3.4")) == "10.0.0.1"
+    monkeypatch.setattr(settings, "trust_forwarded_for", True)
+    monkeypatch.setattr(settings, "trusted_proxy_count", 1)
+    assert client_id(request_from("10.0.0.1", "6.6.6.6, 1.2.3.4")) == "1.2.3.4"
+    monkeypatch.setattr(settings, "trusted_proxy_count", 2)
+    assert client_id(request_from("10.0.0.1", "6.6.6.6, 1.2.3.4, 10.0.0.9")) == "1.2.3.4"
+    assert client_id(request_from("10.0.0.1", "1.2.3.4")) == "10.0.0.1"
+
+
+def test_stream_slot_is_held_while_streaming(monkeypatch):
+    from app.utils import admission
+
+    gate = AdmissionGate("stream", max_concurrency=1, max_queue=0, queue_timeout=0)
+    monkeypatch.setitem(admission.ENDPOINT_CLASSES, "stream", (gate, RateLimiter(0, 0)))
+    monkeypatch.setitem(admission.ENDPOINT_CLASSES, "light", (AdmissionGate("light", 1, 0, 0), RateLimiter(60, 1)))
+    seen = []
+    app = FastAPI()
+
+    @app.get("/stream")
+    async def stream(gate: AdmissionGate = Depends(admit_stream)):
+        async def body():
+            async with gate.slot():
+                for i in range(3):
+                    seen.append(gate.active)
+                    yield f"{i}\n".encode()
+                    await asyncio.sleep(0)
+
+        return StreamingResponse(body())
+
+    @app.get("/light", dependencies=[Depends(admit("light"))])
+    async def light():
+        return {}
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+            assert (await client.get("/stream")).text == "0\n1\n2\n"
+            assert seen == [1, 1, 1] and gate.active == 0
+            async with gate.slot():
+                assert (await client.get("/stream")).status_code == 503
+            assert (await client.get("/stream")).status_code == 200
+            assert (await client.get("/light")).status_code == 200
+            limited = await client.get("/light")
+            assert limited.status_code == 429 and "retry-after" in limited.headers
+
+    run(main())
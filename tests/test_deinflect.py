@@ -0,0 +1,94 @@
+import pytest
+
+from app.services.dictionary_index import DictionaryIndex
+from app.utils.deinflect import ADJ_I, V1, V5, VK, VS, deinflect, pos_class
+
+TABERU, KAKU, IKU, IU, OYOGU, SHINU, YOMU, MATSU, KAU, HANASU, KURU, SURU, BENKYOU, TAKAI, MIRU = range(1, 16)
+
+INDEX = DictionaryIndex.from_spellings(
+    {
+        "食べる": [TABERU], "書く": [KAKU], "行く": [IKU], "言う": [IU], "泳ぐ": [OYOGU], "死ぬ": [SHINU],
+        "読む": [YOMU], "待つ": [MATSU], "買う": [KAU], "話す": [HANASU], "来る": [KURU], "する": [SURU],
+        "勉強": [BENKYOU], "高い": [TAKAI], "見る": [MIRU],
+    },
+    entry_classes={
+        TABERU: V1, MIRU: V1, KAKU: V5, IKU: V5, IU: V5, OYOGU: V5, SHINU: V5, YOMU: V5, MATSU: V5, KAU: V5,
+        HANASU: V5, KURU: VK, SURU: VS, BENKYOU: VS, TAKAI: ADJ_I,
+    },
+)
+
+
+@pytest.mark.parametrize("surface, expected", [
+    # ichidan
+    ("食べた", "食べる"),
+    ("食べない", "食べる"),
+    ("食べず", "食べる"),
+    ("食べずに", "食べる"),
+    ("食べられる", "食べる"),
+    ("食べさせられなかった", "食べる"),
+    ("食べています", "食べる"),
+    ("食べちゃった", "食べる"),
+    ("見ろ", "見る"),
+    ("見よう", "見る"),
+    # godan, one per ending
+    ("書いて", "書く"),
+    ("書かず", "書く"),
+    ("泳いだ", "泳ぐ"),
+    ("死んだら", "死ぬ"),
+    ("読みたい", "読む"),
+    ("待って", "待つ"),
+    ("買わない", "買う"),
+    ("話せば", "話す"),
+    ("話さずに", "話す"),
+    ("書けない", "書く"),
+    ("行って", "行く"),
+    ("行ったら", "行く"),
+    ("読みながら", "読む"),
+    ("書きましょう", "書く"),
+    # kuru and suru
+    ("来なかった", "来る"),
+    ("来ず", "来る"),
+    ("来られる", "来る"),
+    ("した", "する"),
+    ("しない", "する"),
+    ("せず", "する"),
+    ("せずに", "する"),
+    ("勉強した", "勉強"),
+    ("勉強せず", "勉強"),
+    ("勉強せずに", "勉強"),
+    ("勉強させられた", "勉強"),
+    ("勉強しています", "勉強"),
+    # i-adjectives
+    ("高かった", "高い"),
+    ("高くない", "高い"),
+    ("高くなかった", "高い"),
+    ("高くて", "高い"),
+    ("高ければ", "高い"),
+    ("高さ", "高い"),
+    # not inflections of anything indexed
+    ("食べ物", None),
+    ("勉強しず", None),
+    ("高", None),
+])
+def test_resolve_inflection(surface, expected):
+    assert INDEX.resolve_inflection(surface) == expected
+
+
+def test_preferred_base_form_breaks_ties():
+    assert {INDEX.resolve_inflection("いった", preferred=p) for p in ("言う", "行く")} == {None}
+    assert INDEX.resolve_inflection("行った", preferred="行く") == "行く"
+
+
+def test_deinflect_reasons():
+    chains = {(d.word, d.reasons) for d in deinflect("食べなかった")}
+    assert ("食べる", ("past", "negative")) in chains
+    assert deinflect("食べる")[0].reasons == ()
+    assert not any(d.word == "しずる" or d.word.endswith("しする") for d in deinflect("勉強しず"))
+
+
+def test_pos_class():
+    assert pos_class("Ichidan verb") == V1
+    assert pos_class("Godan verb with 'ku' ending") == V5
+    assert pos_class("noun or participle which takes the aux. verb suru") == VS
+    assert pos_class("adjective (keiyoushi)") == ADJ_I
+    assert pos_class("noun (common) (futsuumeishi)") == 0
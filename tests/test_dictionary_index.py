@@ -0,0 +1,74 @@
+import pytest
+
+from app.services.dictionary_index import DictionaryIndex, fold_script, is_elongation, normalize_variant
+
+KO, KOUKOU, I, II, TORI, TOORI, SUKI, KOOHII, KYOU, KIYO = range(1, 11)
+
+INDEX = DictionaryIndex.from_spellings({
+    "子": [KO], "こ": [KO],
+    "高校": [KOUKOU], "こうこう": [KOUKOU],
+    "胃": [I], "い": [I],
+    "いい": [II],
+    "鳥": [TORI], "とり": [TORI],
+    "通り": [TOORI], "とおり": [TOORI],
+    "好き": [SUKI], "すき": [SUKI],
+    "コーヒー": [KOOHII],
+    "今日": [KYOU], "きょう": [KYOU],
+    "清": [KIYO], "きよ": [KIYO],
+})
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("コウコウ", (KOUKOU,)),
+    ("イイ", (II,)),
+    ("トオリ", (TOORI,)),
+    ("ｲｲ", (II,)),
+    ("キョウ", (KYOU,)),
+    ("スキ", (SUKI,)),
+    ("すきーー", (SUKI,)),
+    ("スキ〜", (SUKI,)),
+    ("すきぃ", (SUKI,)),
+    ("すきぃぃ", (SUKI,)),
+    ("すきーいい", (SUKI,)),
+    ("すきっ", (SUKI,)),
+    ("こーひー", (KOOHII,)),
+    ("コーーヒー", (KOOHII,)),
+    ("とおりー", (TOORI,)),
+    ("すきい", ()),
+])
+def test_lookup_variant(text, expected):
+    assert INDEX.lookup_variant(text) == expected
+
+
+@pytest.mark.parametrize("text, script, elongation", [
+    ("コウコウ", "こうこう", "こうこう"),
+    ("イイ", "いい", "いい"),
+    ("トオリ", "とおり", "とおり"),
+    ("キョウ", "きよう", "きよう"),
+    ("スキーー", "すきーー", "すき"),
+    ("すきぃ", "すきい", "すき"),
+    ("すきっ", "すきっ", "すき"),
+    ("ＳＵＫＩ", "suki", "suki"),
+])
+def test_folds(text, script, elongation):
+    assert fold_script(text) == script
+    assert normalize_variant(text) == elongation
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("ー", True),
+    ("ーー", True),
+    ("〜", True),
+    ("～", True),
+    ("~", True),
+    ("ぃ", True),
+    ("ッ", True),
+    ("っー", True),
+    ("う", False),
+    ("い", False),
+    ("き", False),
+    ("ーう", False),
+    ("", False),
+])
+def test_is_elongation(text, expected):
+    assert is_elongation(text) is expected
@@ -0,0 +1,67 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from app.services.job_queue import DONE, FAILED, JobQueue
+
+
+def wait_for(queue, job_id, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job.status == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}")
+
+
+def test_chunks_and_result(tmp_path):
+    release = threading.Event()
+
+    def process(payload, report):
+        report(1, 2, b'"a"')
+        release.wait(5)
+        report(2, 2, b'"b"')
+        return b'"ab"'
+
+    queue = JobQueue(str(tmp_path / "jobs.db"), process, workers=1)
+    queue.start()
+    job = queue.submit("x")
+    deadline = time.monotonic() + 5
+    while not queue.get(job.id).chunks and time.monotonic() < deadline:
+        time.sleep(0.01)
+    running = queue.get(job.id)
+    assert (running.done, running.total, running.result, running.chunks) == (1, 2, None, ((1, b'"a"'),))
+    release.set()
+    done = wait_for(queue, job.id, DONE)
+    assert (done.done, done.result, done.chunks) == (2, b'"ab"', ())
+    queue.close()
+
+
+def test_jobs_hold_a_slot(tmp_path):
+    held = []
+    active = []
+
+    @contextmanager
+    def slot():
+        active.append(1)
+        try:
+            yield
+        finally:
+            active.pop()
+
+    def process(payload, report):
+        held.append(len(active))
+        if payload == "fail":
+            raise ValueError("boom")
+        return b"null"
+
+    queue = JobQueue(str(tmp_path / "jobs.db"), process, workers=1, slot=slot)
+    queue.start()
+    failed = queue.submit("fail")
+    ok = queue.submit("ok")
+    assert wait_for(queue, failed.id, FAILED).error == "boom"
+    wait_for(queue, ok.id, DONE)
+    assert held == [1, 1] and active == []
+    assert queue.stats()["failed"] == 1 and queue.stats()["completed"] == 1
+    queue.close()
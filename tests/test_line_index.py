@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from app.services.line_index import LineIndex
+
+
+def row(line, *idseqs):
+    return {"line": line, "tokens": [{"token": line, "idseqs": [str(i) for i in idseqs]}]}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "index.db")
+
+
+def test_search(path):
+    index = LineIndex(path)
+    index.add_lines([row("朝の空", 1, 2), row("青い空", 2, 3)], song_id="s1")
+    index.add_lines([row("夜の海", 4)], song_id="s2")
+    assert index.search([2]) == (2, ["青い空", "朝の空"], ["s1"])
+    assert index.search([2], "朝") == (1, ["朝の空"], ["s1"])
+    assert index.search([2], limit=1, offset=1) == (2, ["朝の空"], ["s1"])
+    assert index.search([5]) == (0, [], [])
+
+
+def test_removed_lines_are_filtered_and_compacted(path):
+    index = LineIndex(path, compact_threshold=3)
+    index.add_lines([row(f"空{i}", 1) for i in range(5)])
+    index.remove_lines(["空1", "空3"])
+    assert index.search([1])[1] == ["空4", "空2", "空0"]
+    assert index.stats()["deleted"] == 2
+    index.remove_lines(["空0"])
+    # the third tombstone triggers compaction at runtime
+    assert index.stats()["deleted"] == 0
+    assert index.search([1])[1] == ["空4", "空2"]
+    index.add_lines([row("空1", 1)])
+    assert index.search([1])[1] == ["空1", "空4", "空2"]
+
+
+def test_reindex_keeps_ids_and_songs(path):
+    index = LineIndex(path)
+    index.add_lines([row("朝の空", 1, 2), row("青い空", 2)], song_id="s1")
+    index.add_lines([row("夜の空", 2)])
+    assert index.reindex_lines([row("朝の空", 2, 3), row("新しい", 7)], {"朝の空": row("朝の空", 1, 2)["tokens"]}) == 2
+    assert index.search([1]) == (0, [], [])
+    assert index.search([3]) == (1, ["朝の空"], ["s1"])
+    # still ordered by its original ID, and the other lists stay sorted
+    assert index.search([2])[1] == ["夜の空", "青い空", "朝の空"]
+    assert index.stats()["deleted"] == 0
+    assert index.search([7])[1] == ["新しい"]
+    index.close()
+
+    reloaded = LineIndex(path)
+    assert reloaded.search([3]) == (1, ["朝の空"], ["s1"])
+    assert reloaded.search([2])[1] == ["夜の空", "青い空", "朝の空"]
+    assert reloaded.search([1]) == (0, [], [])
+    reloaded.add_lines([row("最後", 3)])
+    assert reloaded.search([3])[1] == ["最後", "朝の空"]
+
+
+def test_commits_are_batched(path):
+    index = LineIndex(path, commit_interval=3600)
+    index.add_lines([row("朝の空", 1)])
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT count(*) FROM lines").fetchone() == (0,)
+    index.close()
+    assert LineIndex(path).search([1])[1] == ["朝の空"]
+
+
+def test_reload_after_compaction(path):
+    index = LineIndex(path)
+    index.add_lines([row(f"空{i}", i % 3) for i in range(10)], song_id="s")
+    index.remove_lines(["空3"])
+    index.compact()
+    index.add_lines([row("空10", 0)])
+    index.close()
+    reloaded = LineIndex(path)
+    assert reloaded.search([0])[1] == ["空10", "空9", "空6", "空0"]
+    assert reloaded.search([1], limit=2) == (3, ["空7", "空4"], ["s"])
@@ -0,0 +1,173 @@
+import threading
+from typing import List
+from urllib.parse import unquote
+
+import httpx
+import pytest
+
+from app.exceptions import DataAccessError
+from app.services.lines_repository import LinesRepository, chunked_filter, in_filter
+from scripts.postgrest_stub import PostgrestStub
+
+
+class Recorder(httpx.BaseTransport):
+    """Passes requests to the stub, failing the first ``failures`` with ``status`` and recording every URL."""
+
+    def __init__(self, stub: PostgrestStub, failures: int = 0, status: int = 503):
+        self.inner = stub.transport()
+        self.failures = failures
+        self.status = status
+        self.urls: List[str] = []
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.urls.append(str(request.url))
+        if self.failures:
+            self.failures -= 1
+            return httpx.Response(self.status, json={"message": "injected"})
+        return self.inner.handle_request(request)
+
+
+def repository(transport: httpx.BaseTransport, **kwargs) -> LinesRepository:
+    kwargs.setdefault("backoff_base", 0.0)
+    return LinesRepository("http://stub", "key", transport=transport, **kwargs)
+
+
+def row(line: str, version: str = "1") -> dict:
+    return {"line": line, "translation": f"EN {line}", "tokens": [{"token": line, "idseqs": []}], "pipeline_version": version}
+
+
+@pytest.fixture
+def stub() -> PostgrestStub:
+    return PostgrestStub()
+
+
+def test_round_trip(stub):
+    repo = repository(stub.transport())
+    repo.insert_lines([row("君に会いたい"), row("夢を見た")])
+    assert repo.get_lines(["夢を見た", "無い", "夢を見た"]) == {"夢を見た": row("夢を見た")}
+    assert repo.get_line("君に会いたい") == row("君に会いたい")
+    # ignore-duplicates keeps the first row, upsert replaces it
+    repo.insert_lines([row("夢を見た", "2")])
+    assert repo.get_line("夢を見た")["pipeline_version"] == "1"
+    repo.upsert_lines([row("夢を見た", "2")])
+    assert repo.get_line("夢を見た")["pipeline_version"] == "2"
+    assert repo.delete_lines(["夢を見た", "無い"]) == 1
+    assert repo.get_lines(["夢を見た"]) == {}
+
+
+@pytest.mark.parametrize("line", [
+    'say "hi"',
+    "a,b,c",
+    "back\\slash",
+    "(parens)",
+    "trailing\\",
+    "&amp;=?#",
+    "",
+])
+def test_filter_values_are_quoted(stub, line):
+    repo = repository(stub.transport())
+    repo.insert_lines([row(line), row("other")])
+    assert list(repo.get_lines([line, "x"])) == [line]
+    assert repo.delete_lines([line]) == 1
+    assert list(stub.rows) == ["other"]
+
+
+def test_retries_transient_failures(stub):
+    transport = Recorder(stub, failures=2)
+    repo = repository(transport, max_retries=3)
+    repo.insert_lines([row("a")])
+    assert len(transport.urls) == 3
+    assert "a" in stub.rows
+
+
+def test_gives_up_after_max_retries(stub):
+    transport = Recorder(stub, failures=10)
+    repo = repository(transport, max_retries=2)
+    with pytest.raises(DataAccessError, match="after 3 attempts"):
+        repo.get_lines(["a"])
+    assert len(transport.urls) == 3
+
+
+def test_client_errors_are_not_retried(stub):
+    transport = Recorder(stub, failures=1, status=400)
+    with pytest.raises(DataAccessError, match="HTTP 400"):
+        repository(transport).get_lines(["a"])
+    assert len(transport.urls) == 1
+
+
+def test_backoff_is_capped():
+    repo = repository(httpx.MockTransport(lambda request: httpx.Response(200)), backoff_base=0.1, backoff_max=0.5)
+    delays = [repo._backoff(attempt) for attempt in range(10) for _ in range(20)]
+    assert all(0 <= delay <= 0.5 for delay in delays)
+    assert max(repo._backoff(0) for _ in range(50)) <= 0.1
+
+
+def test_filters_are_batched_by_url_length(stub):
+    lines = [f"{i:04d}" + "長い歌詞の行" * 20 for i in range(60)]
+    stub.rows.update({line: row(line) for line in lines})
+    transport = Recorder(stub)
+    repo = repository(transport, max_filter_bytes=2000, batch_size=1000)
+    assert set(repo.get_lines(lines)) == set(lines)
+    assert len(transport.urls) > 1
+    assert all(len(url) < 2000 + 200 for url in transport.urls)
+    transport.urls.clear()
+    assert repo.delete_lines(lines) == len(lines)
+    assert len(transport.urls) > 1 and not stub.rows
+
+
+def test_filters_are_batched_by_count(stub):
+    transport = Recorder(stub)
+    repository(transport, batch_size=10).get_lines([str(i) for i in range(25)])
+    assert len(transport.urls) == 3
+
+
+def test_chunked_filter():
+    values = ["あ" * 100] * 10
+    batches = chunked_filter(values, 2000, 100)
+    assert [v for batch in batches for v in batch] == values
+    assert all(len(httpx.URL("http://x", params={"line": in_filter(batch)}).query) <= 2000 for batch in batches)
+    # an over-long value still gets a batch of its own
+    assert chunked_filter(["x" * 5000, "y"], 100, 100) == [["x" * 5000], ["y"]]
+    assert chunked_filter(["a"] * 5, 1000, 2) == [["a", "a"], ["a", "a"], ["a"]]
+    assert chunked_filter([], 1000, 2) == []
+
+
+def test_iter_lines_pages(stub):
+    lines = [f"line {i:03d}" for i in range(25)]
+    stub.rows.update({line: row(line, "1" if i % 2 else "2") for i, line in enumerate(lines)})
+    transport = Recorder(stub)
+    repo = repository(transport)
+    assert [r["line"] for r in repo.iter_lines(page_size=10)] == lines
+    assert len(transport.urls) == 3
+    assert "line=gt." in unquote(transport.urls[1])
+    stale = [r["line"] for r in repo.iter_lines(page_size=4, filters={"pipeline_version": "neq.2"})]
+    assert stale == lines[1::2]
+
+
+def test_unversioned_table():
+    stub = PostgrestStub(columns=frozenset({"line", "translation", "tokens"}))
+    repo = repository(stub.transport())
+    with pytest.raises(DataAccessError, match="42703"):
+        repo.get_lines(["a"])
+    assert repo.detect_versioning() is False
+    repo.insert_lines([row("a")])
+    repo.upsert_lines([row("b")])
+    assert repo.get_lines(["a", "b"]) == {
+        "a": {"line": "a", "translation": "EN a", "tokens": [{"token": "a", "idseqs": []}]},
+        "b": {"line": "b", "translation": "EN b", "tokens": [{"token": "b", "idseqs": []}]},
+    }
+    assert repository(PostgrestStub().transport()).detect_versioning() is True
+
+
+def test_against_served_stub():
+    stub = PostgrestStub()
+    server = stub.serve("127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    repo = LinesRepository(f"http://127.0.0.1:{server.server_address[1]}", "key")
+    try:
+        repo.insert_lines([row("君に会いたい")])
+        assert repo.get_lines(["君に会いたい", "a,b"]) == {"君に会いたい": row("君に会いたい")}
+    finally:
+        repo.close()
+        server.shutdown()
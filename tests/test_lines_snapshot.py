@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+from app.services import lines_snapshot
+from app.services.lines_snapshot import LinesSnapshot, index_path, invalidated_path, write_snapshot
+
+
+def rows(n, start=0):
+    return [
+        {"line": f"行{i}", "translation": f"line {i}", "tokens": [{"token": f"行{i}", "idseqs": [str(i)]}], "pipeline_version": "2-x"}
+        for i in range(start, start + n)
+    ]
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "lines.snap")
+    write_snapshot(path, rows(200), block_rows=16)
+    return path
+
+
+@pytest.fixture
+def rebuilds(monkeypatch):
+    calls = []
+    real = lines_snapshot.write_index
+    monkeypatch.setattr(lines_snapshot, "write_index", lambda path: calls.append(path) or real(path))
+    return calls
+
+
+def test_lookup(path):
+    snapshot = LinesSnapshot(path)
+    found = snapshot.get_lines(["行3", "行150", "無い", "行3"])
+    assert sorted(found) == ["行150", "行3"]
+    assert found["行3"] == rows(1, 3)[0]
+    snapshot.close()
+
+
+def test_invalidations_survive_restart_and_reach_other_readers(path):
+    first, second = LinesSnapshot(path), LinesSnapshot(path)
+    first.invalidate(["行3", "行4"])
+    assert sorted(first.get_lines(["行3", "行4", "行5"])) == ["行5"]
+    assert sorted(second.get_lines(["行3", "行4", "行5"])) == ["行5"]
+    first.close()
+    second.close()
+    reopened = LinesSnapshot(path)
+    assert sorted(reopened.get_lines(["行3", "行4", "行5"])) == ["行5"]
+    assert reopened.stats()["invalidated"] == 2
+    reopened.close()
+    # a fresh export starts clean; an append keeps them
+    write_snapshot(path, rows(10))
+    assert not os.path.exists(invalidated_path(path))
+    snapshot = LinesSnapshot(path)
+    snapshot.invalidate(["行3"])
+    snapshot.close()
+    write_snapshot(path, rows(5, 10), append=True)
+    snapshot = LinesSnapshot(path)
+    assert sorted(snapshot.get_lines(["行3", "行12"])) == ["行12"]
+    snapshot.close()
+
+
+def test_current_index_is_trusted(path, rebuilds):
+    LinesSnapshot(path).close()
+    assert rebuilds == []
+
+
+def test_appended_data_is_reindexed(path, rebuilds):
+    # append without updating the index, as if interrupted
+    extra = str(path) + ".extra"
+    write_snapshot(extra, rows(3, 500))
+    with open(extra, "rb") as f:
+        blocks = f.read()[len(lines_snapshot.HEADER.pack(lines_snapshot.MAGIC, lines_snapshot.VERSION)):]
+    with open(path, "ab") as f:
+        f.write(blocks)
+    rebuilds.clear()
+    snapshot = LinesSnapshot(path)
+    assert rebuilds == [path]
+    assert sorted(snapshot.get_lines(["行501", "行1"])) == ["行1", "行501"]
+    snapshot.close()
+
+
+def test_damaged_tail_and_truncation(path, rebuilds):
+    with open(path, "ab") as f:
+        f.write(b"\x10\x00\x00\x00garbage")
+    snapshot = LinesSnapshot(path)
+    assert rebuilds == []
+    assert len(snapshot) == 200
+    snapshot.close()
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        f.truncate(size - 200)
+    snapshot = LinesSnapshot(path)
+    assert rebuilds == [path]
+    assert 0 < len(snapshot) < 200
+    assert snapshot.get_lines(["行0"])
+    snapshot.close()
+
+
+def test_stale_index_from_other_file(path, tmp_path, rebuilds):
+    other = str(tmp_path / "other.snap")
+    write_snapshot(other, rows(7))
+    os.replace(index_path(other), index_path(path))
+    rebuilds.clear()
+    snapshot = LinesSnapshot(path)
+    assert rebuilds == [path]
+    assert len(snapshot) == 200
+    snapshot.close()
@@ -0,0 +1,63 @@
+from itertools import combinations
+
+import pytest
+
+from app.services.radical_index import RadicalIndex
+
+KRAD = {
+    "休": ["亻", "木"],
+    "体": ["亻", "木", "一"],
+    "本": ["木", "一"],
+    "林": ["木"],
+    "森": ["木"],
+    "村": ["木", "寸"],
+    "付": ["亻", "寸"],
+    "何": ["亻", "口", "一", "亅"],
+    "可": ["口", "一", "亅"],
+    "口": ["口"],
+    "日": ["日"],
+    "明": ["日", "月"],
+}
+STROKES = {"口": 3, "日": 4, "本": 5, "可": 5, "付": 5, "休": 6, "何": 7, "体": 7, "村": 7, "林": 8, "明": 8, "森": 12}
+ORDER = lambda kanji: (STROKES[kanji], kanji)  # noqa: E731
+
+
+def brute_force(radicals, limit=None):
+    found = sorted((kanji for kanji, parts in KRAD.items() if set(radicals) <= set(parts)), key=ORDER)
+    compatible = sorted({radical for kanji in found for radical in KRAD[kanji]})
+    return len(found), found[:limit], compatible
+
+
+SELECTIONS = [
+    selection
+    for size in (1, 2, 3)
+    for selection in combinations(sorted({radical for parts in KRAD.values() for radical in parts}), size)
+]
+
+
+@pytest.mark.parametrize("mask_or_limit", [512, 0])
+def test_search_matches_brute_force(mask_or_limit):
+    # 0 sends every non-empty result down the radical-row path
+    index = RadicalIndex(KRAD, ORDER)
+    index.mask_or_limit = mask_or_limit
+    for selection in SELECTIONS:
+        assert index.search(selection) == brute_force(selection), selection
+        assert index.search(selection, limit=2) == brute_force(selection, limit=2), selection
+
+
+def test_search_more_kanji_than_one_word():
+    krad = {chr(0x4E00 + n): ["木", "一"] if n % 3 else ["木"] for n in range(200)}
+    index = RadicalIndex(krad)
+    count, kanji, compatible = index.search(["一", "木"], limit=5)
+    assert count == sum(1 for parts in krad.values() if "一" in parts)
+    assert kanji == sorted(k for k, parts in krad.items() if "一" in parts)[:5]
+    assert compatible == ["一", "木"]
+
+
+def test_repeated_and_unknown_radicals():
+    index = RadicalIndex(KRAD, ORDER)
+    assert index.search(["木", "木"]) == brute_force(["木"])
+    assert index.unknown(["木", "龍", "x"]) == ["龍", "x"]
+    with pytest.raises(ValueError):
+        index.search([])
+    assert len(index) == len(KRAD)
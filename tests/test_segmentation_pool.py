@@ -0,0 +1,29 @@
+import multiprocessing
+import os
+import signal
+
+import pytest
+
+from app.services import segmentation_pool
+from app.services.segmentation_pool import SegmentationPool
+
+pytestmark = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+
+
+def _die(lines):
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def test_broken_pool_is_not_reforked(monkeypatch):
+    monkeypatch.setattr(segmentation_pool, "_init_worker", lambda: None)
+    monkeypatch.setattr(os, "cpu_count", lambda: 2)
+    pool = SegmentationPool(2, threshold=1)
+    assert not pool.should_use(10)  # not started
+    pool.start()
+    assert pool.should_use(10)
+    monkeypatch.setattr(segmentation_pool, "_segment_chunk", _die)
+    assert pool.segment(["a", "b"]) is None
+    assert not pool.should_use(10)
+    assert pool.segment(["a", "b"]) is None
+    assert pool._executor is None
+    assert pool.stats()["broken"] == 1 and pool.stats()["failures"] == 1
@@ -0,0 +1,90 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def run_concurrently(flight, key, fn, callers):
+    """Start ``callers`` calls of ``key``; ``fn`` must block until the test releases it."""
+    pool = ThreadPoolExecutor(callers)
+    futures = [pool.submit(flight.do, key, fn)]
+    wait_for(lambda: key in flight._calls)
+    futures += [pool.submit(flight.do, key, fn) for _ in range(callers - 1)]
+    wait_for(lambda: flight.coalesced == callers - 1)
+    return pool, futures
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return object()
+
+    pool, futures = run_concurrently(flight, "song", fn, 8)
+    release.set()
+    results = [future.result(5) for future in futures]
+    pool.shutdown()
+
+    assert len(calls) == 1
+    assert len({id(result) for result, _ in results}) == 1
+    assert [leader for _, leader in results] == [True] + [False] * 7
+    assert flight.coalesced == 7
+    assert not flight._calls
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        raise KeyError("boom")
+
+    pool, futures = run_concurrently(flight, "song", fn, 5)
+    release.set()
+    for future in futures:
+        with pytest.raises(KeyError, match="boom"):
+            future.result(5)
+    pool.shutdown()
+
+    assert len(calls) == 1
+    assert not flight._calls
+    # a failed call is not cached: the next caller runs again
+    assert flight.do("song", lambda: 1) == (1, True)
+
+
+def test_keys_and_sequential_calls_are_independent():
+    flight = SingleFlight()
+    release = threading.Event()
+    started = []
+
+    def fn(key):
+        started.append(key)
+        release.wait(5)
+        return key
+
+    with ThreadPoolExecutor(2) as pool:
+        a = pool.submit(flight.do, "a", lambda: fn("a"))
+        b = pool.submit(flight.do, "b", lambda: fn("b"))
+        wait_for(lambda: len(started) == 2)
+        release.set()
+        assert (a.result(5), b.result(5)) == (("a", True), ("b", True))
+
+    assert flight.do("a", lambda: "again") == ("again", True)
+    assert flight.coalesced == 0
@@ -0,0 +1,38 @@
+import sqlite3
+
+from app.services.translation_memory import TranslationMemory, normalize_line
+
+
+class LockedConnection:
+    def execute(self, *args):
+        raise sqlite3.OperationalError("database is locked")
+
+    commit = execute
+
+
+def test_translate_reuses_and_persists(tmp_path):
+    path = str(tmp_path / "tm.db")
+    calls = []
+    memory = TranslationMemory(path)
+    translate = lambda line: calls.append(line) or f"EN {line}"
+    assert memory.translate("君に会いたい!", translate) == "EN 君に会いたい!"
+    assert memory.translate("君に 会いたい", translate) == "EN 君に会いたい!"
+    assert calls == ["君に会いたい!"]
+    memory.close()
+    assert TranslationMemory(path).lookup("君に会いたい") == "EN 君に会いたい!"
+
+
+def test_storage_errors_keep_the_paid_translation(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "tm.db"))
+    memory._conn = LockedConnection()
+    calls = []
+    translate = lambda line: calls.append(line) or f"EN {line}"
+    assert memory.translate("夢を見た", translate) == "EN 夢を見た"
+    assert memory.translate("夢を見た", translate) == "EN 夢を見た"
+    assert calls == ["夢を見た"]
+    assert memory.stats()["store_errors"] == 1
+
+
+def test_normalize_line():
+    assert normalize_line("ああああ、ＡＢＣ!!") == normalize_line("ああ abc")
+    assert normalize_line("…") == ""